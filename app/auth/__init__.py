@@ -6,6 +6,7 @@ from app.auth.security import (
     verify_token,
 )
 from app.auth.dependencies import (
+    get_access_token_data,
     get_current_user,
     get_current_admin,
     get_current_fleet_manager,
@@ -18,6 +19,7 @@ __all__ = [
     "create_access_token",
     "create_refresh_token",
     "verify_token",
+    "get_access_token_data",
     "get_current_user",
     "get_current_admin",
     "get_current_fleet_manager",
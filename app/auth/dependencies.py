@@ -4,13 +4,16 @@ from app.auth.security import verify_token, TokenData
 from app.database import get_db
 from app.models import User
 from sqlalchemy.orm import Session
+import uuid
 
 
-async def get_current_user(
-    authorization: str = Header(None),
-    db: Session = Depends(get_db)
-) -> User:
-    """Extract and validate the current user from JWT token"""
+def get_access_token_data(authorization: str = Header(None)) -> dict:
+    """
+    Verify the bearer access token without touching the database.
+    
+    Lets a route resolve work that does not need the user row (such as
+    booking leases) before get_current_user checks out a connection.
+    """
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -36,8 +39,30 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    return token_data
+
+
+def get_current_user(
+    token_data: dict = Depends(get_access_token_data),
+    db: Session = Depends(get_db)
+) -> User:
+    """
+    Extract and validate the current user from JWT token.
+    
+    A plain function so the blocking user lookup runs in the threadpool
+    instead of stalling the event loop while it waits for a connection.
+    """
+    try:
+        user_id = uuid.UUID(str(token_data["user_id"]))
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid token subject",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    
     # Fetch user from database
-    user = db.query(User).filter(User.id == token_data["user_id"]).first()
+    user = db.query(User).filter(User.id == user_id).first()
     if user is None or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
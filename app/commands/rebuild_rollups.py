@@ -0,0 +1,50 @@
+"""
+Backfill or rebuild the usage rollup tables from trips and bookings.
+
+Bookings and trips created before vehicle_location was stored are first
+stamped with their vehicle's current location.
+
+Usage:
+    python -m app.commands.rebuild_rollups                      # everything
+    python -m app.commands.rebuild_rollups --start 2026-01-01 --end 2026-02-01
+"""
+import argparse
+import sys
+from datetime import datetime
+from app.database import SessionLocal, init_db
+from app.services import RollupService
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the usage rollup tables")
+    parser.add_argument("--start", help="First day to rebuild (ISO date, default: beginning of data)")
+    parser.add_argument("--end", help="Day after the last one to rebuild (ISO date, default: end of data)")
+    args = parser.parse_args(argv)
+
+    try:
+        start = datetime.fromisoformat(args.start) if args.start else None
+        end = datetime.fromisoformat(args.end) if args.end else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    init_db()
+    db = SessionLocal()
+    try:
+        counts = RollupService.rebuild(db, start, end)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    stamped = counts.pop("locations_backfilled")
+    if stamped:
+        print(f"✅ {stamped} booking(s)/trip(s) stamped with their vehicle location")
+    for table, rows in counts.items():
+        print(f"✅ {table}: {rows} row(s) rebuilt")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
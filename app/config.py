@@ -22,6 +22,59 @@ class Settings:
     # Redis (for caching and distributed locking)
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     
+    # Booking interval index (in-memory, only safe with a single booking writer process)
+    BOOKING_INDEX_ENABLED: bool = os.getenv("BOOKING_INDEX_ENABLED", "False").lower() == "true"
+    
+    # Booking concurrency: "pessimistic" (vehicle row lock) or "optimistic" (version compare-and-swap)
+    BOOKING_CONCURRENCY_MODE: str = os.getenv("BOOKING_CONCURRENCY_MODE", "pessimistic").lower()
+    OPTIMISTIC_BOOKING_MAX_RETRIES: int = int(os.getenv("OPTIMISTIC_BOOKING_MAX_RETRIES", 5))
+    OPTIMISTIC_BOOKING_BACKOFF_SECONDS: float = float(os.getenv("OPTIMISTIC_BOOKING_BACKOFF_SECONDS", 0.01))
+    OPTIMISTIC_BOOKING_BACKOFF_MAX_SECONDS: float = float(os.getenv("OPTIMISTIC_BOOKING_BACKOFF_MAX_SECONDS", 0.2))
+    
+    # In-process striped vehicle locks used to serialize bookings on SQLite
+    BOOKING_LOCK_STRIPES: int = int(os.getenv("BOOKING_LOCK_STRIPES", 64))
+    BOOKING_LOCK_TIMEOUT_SECONDS: float = float(os.getenv("BOOKING_LOCK_TIMEOUT_SECONDS", 10))
+    
+    # Slot-bitmap occupancy calendar (in-memory, only safe with a single booking writer process)
+    OCCUPANCY_CALENDAR_ENABLED: bool = os.getenv("OCCUPANCY_CALENDAR_ENABLED", "False").lower() == "true"
+    OCCUPANCY_SLOT_MINUTES: int = int(os.getenv("OCCUPANCY_SLOT_MINUTES", 15))
+    OCCUPANCY_HORIZON_DAYS: int = int(os.getenv("OCCUPANCY_HORIZON_DAYS", 30))
+    
+    # Distributed vehicle locks: "none", "memory" (single process) or "redis" (uses REDIS_URL)
+    LOCK_BACKEND: str = os.getenv("LOCK_BACKEND", "none").lower()
+    LOCK_TTL_SECONDS: float = float(os.getenv("LOCK_TTL_SECONDS", 10))
+    LOCK_WAIT_TIMEOUT_SECONDS: float = float(os.getenv("LOCK_WAIT_TIMEOUT_SECONDS", 5))
+    
+    # Two-phase bookings: PENDING holds expire after the TTL and are swept in batches
+    BOOKING_HOLD_TTL_SECONDS: int = int(os.getenv("BOOKING_HOLD_TTL_SECONDS", 600))
+    HOLD_SWEEPER_ENABLED: bool = os.getenv("HOLD_SWEEPER_ENABLED", "True").lower() == "true"
+    HOLD_SWEEP_INTERVAL_SECONDS: float = float(os.getenv("HOLD_SWEEP_INTERVAL_SECONDS", 30))
+    HOLD_SWEEP_BATCH_SIZE: int = int(os.getenv("HOLD_SWEEP_BATCH_SIZE", 500))
+    
+    # Analytics: maintain the usage rollup tables and answer bucket-aligned windows from them
+    # (nothing is written while disabled; run `python -m app.commands.rebuild_rollups` when enabling)
+    ANALYTICS_ROLLUPS_ENABLED: bool = os.getenv("ANALYTICS_ROLLUPS_ENABLED", "False").lower() == "true"
+    # Booking counter deltas are queued in rollup_outbox and folded into the rollups in batches
+    ROLLUP_APPLY_INTERVAL_SECONDS: float = float(os.getenv("ROLLUP_APPLY_INTERVAL_SECONDS", 5))
+    ROLLUP_APPLY_BATCH_SIZE: int = int(os.getenv("ROLLUP_APPLY_BATCH_SIZE", 1000))
+    
+    # Analytics result cache (in-process; other workers see writes once entries expire)
+    ANALYTICS_CACHE_ENABLED: bool = os.getenv("ANALYTICS_CACHE_ENABLED", "False").lower() == "true"
+    ANALYTICS_CACHE_TTL_SECONDS: float = float(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", 30))
+    ANALYTICS_CACHE_MAX_ENTRIES: int = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", 256))
+    
+    # Background analytics jobs (in-process thread pool; results kept for the retention period)
+    ANALYTICS_JOB_WORKERS: int = int(os.getenv("ANALYTICS_JOB_WORKERS", 2))
+    ANALYTICS_JOB_MAX_QUEUED: int = int(os.getenv("ANALYTICS_JOB_MAX_QUEUED", 32))
+    ANALYTICS_JOB_RETENTION_SECONDS: float = float(os.getenv("ANALYTICS_JOB_RETENTION_SECONDS", 900))
+    ANALYTICS_JOB_MAX_RETAINED: int = int(os.getenv("ANALYTICS_JOB_MAX_RETAINED", 500))
+    
+    # List endpoints ("vehicles", "bookings", "trips") that select plain columns and encode JSON
+    # directly instead of loading ORM objects and validating response models
+    LIST_PROJECTIONS: set = {
+        name.strip() for name in os.getenv("LIST_PROJECTIONS", "").lower().split(",") if name.strip()
+    }
+    
     # CORS
     CORS_ORIGINS: list = os.getenv(
         "CORS_ORIGINS",
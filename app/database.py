@@ -21,6 +21,8 @@ if "sqlite" in DATABASE_URL:
     def set_sqlite_pragma(dbapi_conn, connection_record):
         cursor = dbapi_conn.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        # WAL lets readers proceed while a booking transaction holds the write lock
+        cursor.execute("PRAGMA journal_mode=WAL")
         cursor.close()
 else:
     # PostgreSQL configuration
@@ -48,7 +50,7 @@ def get_db():
 def init_db():
     """Initialize database tables"""
     try:
-        from app.models import User, Vehicle, Booking, Trip
+        from app.models import User, Vehicle, Booking, Trip, VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch
         Base.metadata.create_all(bind=engine)
         print("✅ Database initialized successfully")
     except Exception as e:
@@ -1,10 +1,42 @@
-from fastapi import FastAPI, HTTPException, status
+from fastapi import FastAPI, status
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import init_db
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.database import init_db, SessionLocal
 from app.routes import auth_router, vehicle_router, booking_router, trip_router, analytics_router
 import os
 
 
+def warm_booking_index():
+    """Load active bookings into the in-memory booking index"""
+    from app.services import booking_index
+    
+    db = SessionLocal()
+    try:
+        count = booking_index.warm(db)
+        print(f"✅ Booking index warmed with {count} active booking(s)")
+    except Exception as e:
+        booking_index.reset()
+        print(f"⚠️  Booking index disabled: {e}")
+    finally:
+        db.close()
+
+
+def warm_occupancy_calendar():
+    """Build the slot-bitmap occupancy calendar from active bookings"""
+    from app.services import occupancy_calendar
+    
+    db = SessionLocal()
+    try:
+        count = occupancy_calendar.warm(db)
+        print(f"✅ Occupancy calendar warmed with {count} active booking(s)")
+    except Exception as e:
+        occupancy_calendar.reset()
+        print(f"⚠️  Occupancy calendar disabled: {e}")
+    finally:
+        db.close()
+
+
 def create_app():
     """Create and configure the FastAPI application"""
     app = FastAPI(
@@ -22,6 +54,42 @@ def create_app():
         print(f"⚠️  Warning: Database initialization failed: {e}")
         # Continue anyway - app will still work for non-DB operations
     
+    # Warm the in-memory booking index and occupancy calendar (optional)
+    if settings.BOOKING_INDEX_ENABLED:
+        warm_booking_index()
+    
+    if settings.OCCUPANCY_CALENDAR_ENABLED:
+        warm_occupancy_calendar()
+    
+    # Expire stale PENDING booking holds in the background
+    if settings.HOLD_SWEEPER_ENABLED:
+        from app.services import HoldSweeper
+        
+        sweeper = HoldSweeper(
+            SessionLocal,
+            interval_seconds=settings.HOLD_SWEEP_INTERVAL_SECONDS,
+            batch_size=settings.HOLD_SWEEP_BATCH_SIZE
+        )
+        app.add_event_handler("startup", sweeper.start)
+        app.add_event_handler("shutdown", sweeper.stop)
+    
+    # Fold queued booking deltas into the usage rollups in the background
+    if settings.ANALYTICS_ROLLUPS_ENABLED:
+        from app.services import RollupApplier
+        
+        applier = RollupApplier(
+            SessionLocal,
+            interval_seconds=settings.ROLLUP_APPLY_INTERVAL_SECONDS,
+            batch_size=settings.ROLLUP_APPLY_BATCH_SIZE
+        )
+        app.add_event_handler("startup", applier.start)
+        app.add_event_handler("shutdown", applier.stop)
+    
+    # Stop background analytics jobs with the app
+    from app.services import shutdown_analytics_jobs
+    
+    app.add_event_handler("shutdown", shutdown_analytics_jobs)
+    
     # Add CORS middleware
     origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:8000").split(",")
     app.add_middleware(
@@ -61,9 +129,9 @@ def create_app():
     # Global exception handler
     @app.exception_handler(Exception)
     async def global_exception_handler(request, exc):
-        return HTTPException(
+        return JSONResponse(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Internal server error"
+            content={"detail": "Internal server error"}
         )
     
     return app
@@ -2,5 +2,7 @@ from app.models.user import User
 from app.models.vehicle import Vehicle
 from app.models.booking import Booking
 from app.models.trip import Trip
+from app.models.usage_rollup import VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch, RollupOutbox
 
-__all__ = ["User", "Vehicle", "Booking", "Trip"]
+__all__ = ["User", "Vehicle", "Booking", "Trip", "VehicleDailyUsage", "LocationHourlyUsage", "TripMetricSketch",
+           "RollupOutbox"]
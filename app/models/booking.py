@@ -1,5 +1,4 @@
-from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Index, TIMESTAMP
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, DateTime, Enum, ForeignKey, Index, TIMESTAMP, Uuid
 from sqlalchemy.orm import relationship
 from datetime import datetime
 import enum
@@ -17,20 +16,25 @@ class BookingStatus(str, enum.Enum):
 class Booking(Base):
     __tablename__ = "bookings"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    vehicle_id = Column(UUID(as_uuid=True), ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False, index=True)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    user_id = Column(Uuid(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    vehicle_id = Column(Uuid(as_uuid=True), ForeignKey("vehicles.id", ondelete="CASCADE"), nullable=False, index=True)
     start_time = Column(DateTime, nullable=False, index=True)
     end_time = Column(DateTime, nullable=False, index=True)
     status = Column(Enum(BookingStatus), default=BookingStatus.PENDING, nullable=False, index=True)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     version = Column(TIMESTAMP(timezone=True), nullable=False, default=datetime.utcnow)  # For optimistic locking
+    # Vehicle location when the booking was created; keys the location rollups
+    vehicle_location = Column(String(255), nullable=True)
 
     # Composite indexes for efficient conflict detection
     __table_args__ = (
         Index('idx_booking_vehicle_time', 'vehicle_id', 'start_time', 'end_time'),
         Index('idx_booking_user_status', 'user_id', 'status'),
+        # Booking lists page on (start_time DESC, id DESC)
+        Index('idx_booking_start_time', 'start_time', 'id'),
+        Index('idx_booking_user_start', 'user_id', 'start_time', 'id'),
     )
 
     def __repr__(self):
@@ -0,0 +1,95 @@
+from sqlalchemy import Column, String, Date, DateTime, Float, ForeignKey, Integer, Index, Uuid
+from datetime import datetime
+import uuid
+from app.database import Base
+
+
+class VehicleDailyUsage(Base):
+    """Per-vehicle, per-day totals maintained incrementally (see RollupService)"""
+    __tablename__ = "vehicle_daily_usage"
+
+    vehicle_id = Column(Uuid(as_uuid=True), ForeignKey("vehicles.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    # Completed trips, bucketed by trip start time
+    trip_count = Column(Integer, default=0, nullable=False)
+    distance_km = Column(Float, default=0.0, nullable=False)
+    in_use_seconds = Column(Integer, default=0, nullable=False)
+    # Bookings by current status, bucketed by booking creation time
+    pending_bookings = Column(Integer, default=0, nullable=False)
+    confirmed_bookings = Column(Integer, default=0, nullable=False)
+    completed_bookings = Column(Integer, default=0, nullable=False)
+    cancelled_bookings = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index('idx_vehicle_daily_usage_day', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<VehicleDailyUsage(vehicle_id={self.vehicle_id}, day={self.day}, trips={self.trip_count})>"
+
+
+class LocationHourlyUsage(Base):
+    """Per-location, per-hour totals maintained incrementally (see RollupService)"""
+    __tablename__ = "location_hourly_usage"
+
+    location = Column(String(255), primary_key=True)  # "" for vehicles without a location
+    hour = Column(DateTime, primary_key=True)
+    trip_count = Column(Integer, default=0, nullable=False)
+    distance_km = Column(Float, default=0.0, nullable=False)
+    in_use_seconds = Column(Integer, default=0, nullable=False)
+    pending_bookings = Column(Integer, default=0, nullable=False)
+    confirmed_bookings = Column(Integer, default=0, nullable=False)
+    completed_bookings = Column(Integer, default=0, nullable=False)
+    cancelled_bookings = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index('idx_location_hourly_usage_hour', 'hour'),
+    )
+
+    def __repr__(self):
+        return f"<LocationHourlyUsage(location={self.location}, hour={self.hour}, trips={self.trip_count})>"
+
+
+class TripMetricSketch(Base):
+    """
+    Per-day quantile sketch bins of trip duration and distance (see
+    RollupService and QuantileSketch). Each row is one bin's count, so a
+    range of days merges with SUM(count) GROUP BY bin.
+    """
+    __tablename__ = "trip_metric_sketches"
+
+    scope = Column(String(16), primary_key=True)  # "vehicle" or "location"
+    key = Column(String(255), primary_key=True)  # vehicle ID, or location ("" when unset)
+    metric = Column(String(32), primary_key=True)  # "duration_hours" or "distance_km"
+    day = Column(Date, primary_key=True)  # trip start day
+    bin = Column(Integer, primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        Index('idx_trip_metric_sketches_scope_day', 'scope', 'metric', 'day'),
+    )
+
+    def __repr__(self):
+        return f"<TripMetricSketch(scope={self.scope}, key={self.key}, metric={self.metric}, day={self.day})>"
+
+
+class RollupOutbox(Base):
+    """
+    Booking counter deltas waiting to be folded into the rollups (see
+    RollupService.apply_outbox). Booking transactions only insert here, so
+    they never wait on each other's locks on a shared rollup row.
+    """
+    __tablename__ = "rollup_outbox"
+
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    vehicle_id = Column(Uuid(as_uuid=True), nullable=False)
+    location = Column(String(255), nullable=False)  # the booking's vehicle_location, "" when unset
+    moment = Column(DateTime, nullable=False)  # booking creation time
+    pending_bookings = Column(Integer, default=0, nullable=False)
+    confirmed_bookings = Column(Integer, default=0, nullable=False)
+    completed_bookings = Column(Integer, default=0, nullable=False)
+    cancelled_bookings = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<RollupOutbox(id={self.id}, vehicle_id={self.vehicle_id}, moment={self.moment})>"
@@ -1,5 +1,4 @@
-from sqlalchemy import Column, String, Float, Integer, Enum, DateTime, Boolean, Index
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Float, Integer, BigInteger, Enum, DateTime, Boolean, Index, Uuid
 from datetime import datetime
 import enum
 import uuid
@@ -16,7 +15,7 @@ class VehicleStatus(str, enum.Enum):
 class Vehicle(Base):
     __tablename__ = "vehicles"
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    id = Column(Uuid(as_uuid=True), primary_key=True, default=uuid.uuid4)
     license_plate = Column(String(50), unique=True, nullable=False, index=True)
     make = Column(String(100), nullable=False)
     model = Column(String(100), nullable=False)
@@ -28,10 +27,18 @@ class Vehicle(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    # Fencing token of the newest lock-manager lease that wrote a booking for this vehicle
+    lease_token = Column(BigInteger, nullable=True)
 
     # Composite index for querying available vehicles by location
     __table_args__ = (
         Index('idx_vehicle_status_active', 'status', 'is_active'),
+        Index('idx_vehicle_location_status', 'location', 'status', 'is_active'),
+        # Vehicle search: equality filters first, then the (created_at, id) page key
+        Index('idx_vehicle_active_created', 'is_active', 'created_at', 'id'),
+        Index('idx_vehicle_active_status_created', 'is_active', 'status', 'created_at', 'id'),
+        Index('idx_vehicle_active_location_created', 'is_active', 'location', 'created_at', 'id'),
+        Index('idx_vehicle_active_make_model_created', 'is_active', 'make', 'model', 'created_at', 'id'),
     )
 
     def __repr__(self):
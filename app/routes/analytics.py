@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_user, get_current_fleet_manager
 from app.models import User
-from app.services import AnalyticsService
+from app.schemas import AnalyticsJobRequest, AnalyticsJobStatus, VehicleUtilizationBatchRequest
+from app.services import AnalyticsJobError, AnalyticsJobQueueFull, analytics_cache, get_analytics_jobs
 from datetime import datetime
 from typing import Optional
 import uuid
@@ -41,7 +42,26 @@ def get_vehicle_utilization(
     if start >= end:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
     
-    metrics = AnalyticsService.get_vehicle_utilization(db, vid, start, end)
+    metrics = analytics_cache.get_vehicle_utilization(db, vid, start, end)
+    return metrics
+
+
+@router.post("/vehicles/utilization", response_model=dict)
+def get_vehicles_utilization(
+    batch: VehicleUtilizationBatchRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Get utilization metrics for up to 500 vehicles over one date range.
+    
+    Returns a map from vehicle ID to the same metrics as
+    /vehicle/{vehicle_id}/utilization, computed in a single grouped query.
+    """
+    if batch.start_date >= batch.end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
+    
+    metrics = analytics_cache.get_vehicles_utilization(db, batch.vehicle_ids, batch.start_date, batch.end_date)
     return metrics
 
 
@@ -72,22 +92,85 @@ def get_fleet_utilization(
     if start >= end:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
     
-    metrics = AnalyticsService.get_fleet_utilization(db, start, end, location)
+    metrics = analytics_cache.get_fleet_utilization(db, start, end, location)
     return metrics
 
 
+@router.get("/fleet/usage-heatmap", response_model=dict)
+def get_usage_heatmap(
+    start_date: str,
+    end_date: str,
+    location: Optional[str] = None,
+    by_location: bool = False,
+    top_k: int = Query(5, ge=1, le=168),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Get a 7x24 (weekday x hour) fleet usage heatmap.
+    
+    Trips count toward every hour they span, not only their start hour.
+    Returns vehicle-hours and average vehicles in use per cell, the top_k
+    peak cells, and optionally the same breakdown per location.
+    """
+    try:
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid parameters")
+    
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
+    
+    heatmap = analytics_cache.get_usage_heatmap(db, start, end, location, by_location, top_k)
+    return heatmap
+
+
+@router.get("/trips/distribution", response_model=dict)
+def get_trip_distribution(
+    start_date: str,
+    end_date: str,
+    vehicle_id: Optional[str] = None,
+    location: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Get p50/p95/p99 trip duration (hours) and distance (km) for a date range.
+    
+    Fleet-wide by default, or for one vehicle and/or vehicles at a location.
+    Percentiles are sketch estimates within relative_accuracy of the exact
+    values.
+    """
+    try:
+        vid = uuid.UUID(vehicle_id) if vehicle_id else None
+        start = datetime.fromisoformat(start_date)
+        end = datetime.fromisoformat(end_date)
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid parameters")
+    
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
+    
+    distribution = analytics_cache.get_trip_distribution(db, start, end, vid, location)
+    return distribution
+
+
 @router.get("/fleet/underutilized-vehicles", response_model=list)
 def get_underutilized_vehicles(
     start_date: str,
     end_date: str,
     threshold_percentage: float = 20.0,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_fleet_manager)
 ):
     """
     Identify underutilized vehicles for optimization.
     
-    Returns vehicles with utilization below threshold percentage.
+    Returns vehicles with utilization below threshold percentage, least
+    utilized first, one page (limit/offset) at a time.
     Useful for asset reallocation and operational decisions.
     """
     try:
@@ -102,7 +185,7 @@ def get_underutilized_vehicles(
     if not (0 <= threshold_percentage <= 100):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Threshold must be between 0-100")
     
-    vehicles = AnalyticsService.get_underutilized_vehicles(db, start, end, threshold_percentage)
+    vehicles = analytics_cache.get_underutilized_vehicles(db, start, end, threshold_percentage, limit, offset)
     return vehicles
 
 
@@ -110,6 +193,7 @@ def get_underutilized_vehicles(
 def get_booking_statistics(
     start_date: str,
     end_date: str,
+    bucket: Optional[str] = Query(None, pattern="^(hour|day|week)$"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_fleet_manager)
 ):
@@ -119,8 +203,12 @@ def get_booking_statistics(
     Metrics:
     - Total bookings
     - Completed bookings
+    - Confirmed bookings
     - Cancelled bookings
     - Completion rate
+    
+    With bucket=hour|day|week, also returns a per-bucket time series
+    (at most 10,000 buckets).
     """
     try:
         start = datetime.fromisoformat(start_date)
@@ -131,5 +219,84 @@ def get_booking_statistics(
     if start >= end:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
     
-    stats = AnalyticsService.get_booking_statistics(db, start, end)
+    try:
+        stats = analytics_cache.get_booking_statistics(db, start, end, bucket)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     return stats
+
+
+def _get_job(job_id: str, current_user: User):
+    """A retained job submitted by the current user (admins see every job), or 404"""
+    try:
+        jid = uuid.UUID(job_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid job ID")
+    
+    job = get_analytics_jobs().get(jid)
+    if job is None or (job.owner_id != current_user.id and current_user.role.value != "admin"):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    return job
+
+
+@router.post("/jobs", response_model=dict, status_code=status.HTTP_202_ACCEPTED)
+def submit_analytics_job(
+    job_request: AnalyticsJobRequest,
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Run an analytics report in the background.
+    
+    report is one of underutilized_vehicles, fleet_utilization,
+    usage_heatmap, trip_distribution, booking_statistics or
+    vehicles_utilization; parameters are the matching endpoint's query
+    parameters (for vehicles_utilization, any number of vehicle_ids).
+    Returns the job immediately; poll /jobs/{job_id} and fetch
+    /jobs/{job_id}/result once it has succeeded.
+    """
+    if job_request.start_date >= job_request.end_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start date must be before end date")
+    
+    try:
+        job = get_analytics_jobs().submit(
+            job_request.report,
+            job_request.start_date,
+            job_request.end_date,
+            job_request.parameters,
+            owner_id=current_user.id
+        )
+    except AnalyticsJobQueueFull as e:
+        raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail=str(e))
+    except AnalyticsJobError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return job.to_dict()
+
+
+@router.get("/jobs", response_model=list)
+def list_analytics_jobs(current_user: User = Depends(get_current_fleet_manager)):
+    """List retained jobs, newest first (admins see every user's jobs)"""
+    owner_id = None if current_user.role.value == "admin" else current_user.id
+    return [job.to_dict() for job in get_analytics_jobs().list(owner_id)]
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+def get_analytics_job(job_id: str, current_user: User = Depends(get_current_fleet_manager)):
+    """Get a job's status and progress (0.0 - 1.0)"""
+    return _get_job(job_id, current_user).to_dict()
+
+
+@router.get("/jobs/{job_id}/result", response_model=dict)
+def get_analytics_job_result(job_id: str, current_user: User = Depends(get_current_fleet_manager)):
+    """Get a succeeded job's report; 409 while it is queued or running, or if it failed or was cancelled"""
+    job = _get_job(job_id, current_user)
+    if job.status != AnalyticsJobStatus.SUCCEEDED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=f"Job is {job.status.value}")
+    return job.to_dict(include_result=True)
+
+
+@router.delete("/jobs/{job_id}", response_model=dict)
+def cancel_analytics_job(job_id: str, current_user: User = Depends(get_current_fleet_manager)):
+    """Cancel a queued or running job; finished jobs are returned unchanged"""
+    job = _get_job(job_id, current_user)
+    return get_analytics_jobs().cancel(job.id).to_dict()
@@ -82,7 +82,15 @@ def refresh(refresh_token: str, db: Session = Depends(get_db)):
             detail="Invalid or expired refresh token"
         )
     
-    user = db.query(User).filter(User.id == token_data["user_id"]).first()
+    try:
+        user_id = uuid.UUID(str(token_data["user_id"]))
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token"
+        )
+    
+    user = db.query(User).filter(User.id == user_id).first()
     if not user or not user.is_active:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
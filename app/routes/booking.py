@@ -1,21 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.auth import get_current_user
+from app.auth import get_access_token_data, get_current_user, get_current_admin
 from app.models import User, Booking, Vehicle
-from app.services import BookingService, BookingConflictError
-from app.schemas import BookingCreate, BookingUpdate, BookingResponse, BookingStatus
-from datetime import datetime
-from typing import List, Optional
+from app.services import BookingService, BookingConflictError, ExportService, InvalidCursorError, booking_index
+from app.services.lock_manager import release_leases
+from app.services.export_service import BOOKING_EXPORT_COLUMNS, EXPORT_FORMATS
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.projections import BOOKING_LIST_COLUMNS, encode_page, projection_enabled
+from app.schemas import (
+    BookingCreate,
+    BookingUpdate,
+    BookingResponse,
+    BookingStatus,
+    BookingHoldResponse,
+    BookingBulkCreate,
+    BookingBulkResponse,
+    FreeSlotResponse,
+    Page,
+    VehicleResponse,
+)
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
 import uuid
 
 
 router = APIRouter(prefix="/api/bookings", tags=["bookings"])
 
+MAX_SLOT_HORIZON_DAYS = 90
+
+
+def _parse_horizon(horizon_start: Optional[str], horizon_end: Optional[str]) -> Tuple[datetime, datetime]:
+    """Parse a free-slot search horizon, defaulting to the next 7 days"""
+    try:
+        start = datetime.fromisoformat(horizon_start) if horizon_start else datetime.utcnow()
+        end = datetime.fromisoformat(horizon_end) if horizon_end else start + timedelta(days=7)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format")
+    
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Horizon start must be before horizon end")
+    
+    if end - start > timedelta(days=MAX_SLOT_HORIZON_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Search horizon cannot exceed {MAX_SLOT_HORIZON_DAYS} days"
+        )
+    
+    return start, end
+
+
+def _lease_vehicles(db: Session, vehicle_ids):
+    """Take the vehicle leases for the request, held until its transaction ends"""
+    try:
+        BookingService.acquire_vehicle_leases(db, vehicle_ids)
+    except BookingConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    try:
+        yield
+    finally:
+        # Normally released when the transaction ends; covers requests that never started one
+        release_leases(db)
+
+
+def lease_booking_vehicle(
+    booking_data: BookingCreate,
+    token_data: dict = Depends(get_access_token_data),
+    db: Session = Depends(get_db)
+):
+    """
+    Lease the requested vehicle before the user lookup takes a connection.
+    
+    Declared ahead of get_current_user, so requests contending for the
+    same vehicle queue on the lock manager without holding a pooled
+    database connection. The token is verified first, so only
+    authenticated callers can take leases.
+    """
+    yield from _lease_vehicles(db, [booking_data.vehicle_id])
+
+
+def lease_bulk_vehicles(
+    bulk_data: BookingBulkCreate,
+    token_data: dict = Depends(get_access_token_data),
+    db: Session = Depends(get_db)
+):
+    """lease_booking_vehicle for every vehicle of a bulk request"""
+    yield from _lease_vehicles(db, [item.vehicle_id for item in bulk_data.bookings])
+
 
 @router.post("", response_model=BookingResponse, status_code=status.HTTP_201_CREATED)
 def create_booking(
     booking_data: BookingCreate,
+    leases: None = Depends(lease_booking_vehicle),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -61,6 +138,219 @@ def create_booking(
         )
 
 
+@router.post("/holds", response_model=BookingHoldResponse, status_code=status.HTTP_201_CREATED)
+def create_booking_hold(
+    booking_data: BookingCreate,
+    leases: None = Depends(lease_booking_vehicle),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Reserve a slot with a short-lived PENDING hold during checkout.
+    
+    The hold blocks the slot until it is confirmed via
+    POST /api/bookings/{booking_id}/confirm or expires.
+    """
+    try:
+        if booking_data.start_time >= booking_data.end_time:
+            raise ValueError("Start time must be before end time")
+        
+        if booking_data.start_time <= datetime.utcnow():
+            raise ValueError("Booking start time must be in the future")
+        
+        booking = BookingService.create_hold(
+            db,
+            user_id=current_user.id,
+            vehicle_id=booking_data.vehicle_id,
+            start_time=booking_data.start_time,
+            end_time=booking_data.end_time
+        )
+        
+        db.commit()
+        db.refresh(booking)
+        
+        return {
+            **BookingResponse.model_validate(booking).model_dump(),
+            "hold_expires_at": BookingService.hold_expires_at(booking)
+        }
+    
+    except BookingConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+
+@router.post("/{booking_id}/confirm", response_model=BookingResponse)
+def confirm_booking_hold(
+    booking_id: str,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Confirm a PENDING booking hold before it expires"""
+    try:
+        bid = uuid.UUID(booking_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid booking ID")
+    
+    booking = db.query(Booking).filter(Booking.id == bid).first()
+    if not booking:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Booking not found")
+    
+    if current_user.id != booking.user_id and current_user.role.value not in ["admin", "fleet_manager"]:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized")
+    
+    try:
+        booking = BookingService.confirm_hold(db, bid)
+        db.commit()
+        db.refresh(booking)
+        
+        return booking
+    
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+
+
+@router.post("/bulk", response_model=BookingBulkResponse)
+def create_bookings_bulk(
+    bulk_data: BookingBulkCreate,
+    leases: None = Depends(lease_bulk_vehicles),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Create up to 500 bookings in a single transaction.
+    
+    Vehicles are locked in a deterministic order, conflicts are checked
+    against existing bookings and within the batch, and each item gets
+    its own created/conflict/invalid result.
+    """
+    try:
+        results = BookingService.create_bookings_bulk(
+            db,
+            user_id=current_user.id,
+            items=[(item.vehicle_id, item.start_time, item.end_time) for item in bulk_data.bookings]
+        )
+        
+        # Serialize before commit so expired instances are not reloaded one by one
+        for result in results:
+            if result["booking"] is not None:
+                result["booking"] = BookingResponse.model_validate(result["booking"])
+        
+        db.commit()
+    
+    except BookingConflictError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    created = sum(1 for result in results if result["status"] == "created")
+    return {
+        "created": created,
+        "failed": len(results) - created,
+        "results": results
+    }
+
+
+@router.get("/available-vehicles", response_model=List[VehicleResponse])
+def find_available_vehicles(
+    start_time: str,  # ISO 8601 format
+    end_time: str,    # ISO 8601 format
+    location: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Find vehicles that can be booked for the given time range.
+    
+    Returns available vehicles with no overlapping active bookings,
+    optionally filtered by location, in a single query.
+    """
+    try:
+        start = datetime.fromisoformat(start_time)
+        end = datetime.fromisoformat(end_time)
+    except (ValueError, AttributeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid parameters")
+    
+    if start >= end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Start time must be before end time")
+    
+    return BookingService.find_available_vehicles(db, start, end, location, limit)
+
+
+@router.get("/free-slots", response_model=List[FreeSlotResponse])
+def find_free_slots(
+    location: str,
+    duration_minutes: int = Query(..., ge=1),
+    horizon_start: Optional[str] = None,  # ISO 8601 format, defaults to now
+    horizon_end: Optional[str] = None,    # ISO 8601 format, defaults to start + 7 days
+    limit: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Find the earliest free windows across the available vehicles at a location"""
+    start, end = _parse_horizon(horizon_start, horizon_end)
+    
+    return BookingService.find_free_slots(
+        db,
+        duration=timedelta(minutes=duration_minutes),
+        horizon_start=start,
+        horizon_end=end,
+        location=location,
+        limit=limit
+    )
+
+
+@router.get("/export")
+def export_bookings(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    status_filter: Optional[BookingStatus] = Query(None, alias="status"),
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream bookings as NDJSON or CSV, oldest start first.
+    
+    Rows are read through a streaming cursor and written as they arrive, so
+    memory stays bounded for any number of bookings. Fleet Managers and
+    Admins export all bookings; other users only their own.
+    """
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format")
+    
+    user_id = None if current_user.role.value in ["admin", "fleet_manager"] else current_user.id
+    rows = ExportService.booking_rows(db, user_id, status_filter, start, end)
+    
+    return StreamingResponse(
+        ExportService.encode(rows, ExportService.column_names(BOOKING_EXPORT_COLUMNS), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="bookings.{format}"'}
+    )
+
+
 @router.get("/{booking_id}", response_model=BookingResponse)
 def get_booking(
     booking_id: str,
@@ -84,24 +374,34 @@ def get_booking(
     return booking
 
 
-@router.get("", response_model=List[BookingResponse])
+@router.get("", response_model=Page[BookingResponse])
 def list_bookings(
-    status: Optional[BookingStatus] = None,
+    status_filter: Optional[BookingStatus] = Query(None, alias="status"),
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     """
-    List bookings for current user.
+    List bookings for current user, latest start first, one page at a time.
     Fleet Managers and Admins can see all bookings.
+    Pass the returned next_cursor as cursor to get the next page.
     """
-    if current_user.role.value in ["admin", "fleet_manager"]:
-        query = db.query(Booking)
-        if status:
-            query = query.filter(Booking.status == status)
-        return query.order_by(Booking.start_time.desc()).all()
-    else:
-        # Regular users only see their own bookings
-        return BookingService.get_user_bookings(db, current_user.id, status)
+    columns = BOOKING_LIST_COLUMNS if projection_enabled("bookings") else None
+    try:
+        if current_user.role.value in ["admin", "fleet_manager"]:
+            bookings, next_cursor = BookingService.get_bookings(db, status_filter, cursor, limit, columns)
+        else:
+            # Regular users only see their own bookings
+            bookings, next_cursor = BookingService.get_user_bookings(
+                db, current_user.id, status_filter, cursor, limit, columns
+            )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if columns:
+        return Response(encode_page(bookings, columns, next_cursor), media_type="application/json")
+    return {"items": bookings, "next_cursor": next_cursor}
 
 
 @router.put("/{booking_id}", response_model=BookingResponse)
@@ -136,6 +436,11 @@ def update_booking(
         
         return booking
     
+    except BookingConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -173,3 +478,52 @@ def check_availability(
         "start_time": start_time,
         "end_time": end_time
     }
+
+
+@router.get("/vehicle/{vehicle_id}/free-slots", response_model=List[FreeSlotResponse])
+def find_vehicle_free_slots(
+    vehicle_id: str,
+    duration_minutes: int = Query(..., ge=1),
+    horizon_start: Optional[str] = None,  # ISO 8601 format, defaults to now
+    horizon_end: Optional[str] = None,    # ISO 8601 format, defaults to start + 7 days
+    limit: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Find the earliest free windows of a vehicle that fit the requested duration"""
+    try:
+        vid = uuid.UUID(vehicle_id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid vehicle ID")
+    
+    start, end = _parse_horizon(horizon_start, horizon_end)
+    
+    vehicle = db.query(Vehicle).filter(Vehicle.id == vid).first()
+    if not vehicle or not vehicle.is_active:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Vehicle not found")
+    
+    return BookingService.find_free_slots(
+        db,
+        duration=timedelta(minutes=duration_minutes),
+        horizon_start=start,
+        horizon_end=end,
+        vehicle_id=vid,
+        limit=limit
+    )
+
+
+@router.get("/index/consistency", response_model=dict)
+def check_booking_index_consistency(
+    repair: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin)
+):
+    """
+    Compare the in-memory booking index with the database (Admin only).
+    
+    Pass repair=true to rebuild the index when drift is detected.
+    """
+    if not booking_index.is_ready:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Booking index is not enabled")
+    
+    return booking_index.verify(db, repair=repair)
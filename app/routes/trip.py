@@ -1,12 +1,16 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User, Trip, Booking
-from app.services import TripService, BookingService
-from app.schemas import TripCreate, TripUpdate, TripResponse, BookingStatus
+from app.services import TripService, BookingService, BookingConflictError, ExportService, InvalidCursorError
+from app.services.export_service import EXPORT_FORMATS, TRIP_EXPORT_COLUMNS
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.projections import TRIP_LIST_COLUMNS, encode_page, projection_enabled
+from app.schemas import Page, TripCreate, TripUpdate, TripResponse, BookingStatus
 from datetime import datetime
-from typing import List, Optional
+from typing import Optional
 import uuid
 
 
@@ -61,6 +65,39 @@ def start_trip(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.get("/export")
+def export_trips(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    vehicle_id: Optional[uuid.UUID] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    completed_only: bool = False,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream trips as NDJSON or CSV, oldest start first.
+    
+    Rows are read through a streaming cursor and written as they arrive, so
+    memory stays bounded for any number of trips. Fleet Managers and Admins
+    export all trips; other users only their own.
+    """
+    try:
+        start = datetime.fromisoformat(start_date) if start_date else None
+        end = datetime.fromisoformat(end_date) if end_date else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format")
+    
+    user_id = None if current_user.role.value in ["admin", "fleet_manager"] else current_user.id
+    rows = ExportService.trip_rows(db, vehicle_id, user_id, start, end, completed_only)
+    
+    return StreamingResponse(
+        ExportService.encode(rows, ExportService.column_names(TRIP_EXPORT_COLUMNS), format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="trips.{format}"'}
+    )
+
+
 @router.get("/{trip_id}", response_model=TripResponse)
 def get_trip(
     trip_id: str,
@@ -132,19 +169,23 @@ def end_trip(
         
         return trip
     
+    except BookingConflictError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
-@router.get("/user/{user_id}", response_model=List[TripResponse])
+@router.get("/user/{user_id}", response_model=Page[TripResponse])
 def get_user_trips(
     user_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all trips for a user within date range"""
+    """Get a user's trips within a date range, latest first, one page (limit/cursor) at a time"""
     try:
         uid = uuid.UUID(user_id)
     except ValueError:
@@ -160,19 +201,28 @@ def get_user_trips(
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format")
     
-    trips = TripService.get_user_trips(db, uid, start, end)
-    return trips
+    columns = TRIP_LIST_COLUMNS if projection_enabled("trips") else None
+    try:
+        trips, next_cursor = TripService.get_user_trips(db, uid, start, end, cursor, limit, columns)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if columns:
+        return Response(encode_page(trips, columns, next_cursor), media_type="application/json")
+    return {"items": trips, "next_cursor": next_cursor}
 
 
-@router.get("/vehicle/{vehicle_id}", response_model=List[TripResponse])
+@router.get("/vehicle/{vehicle_id}", response_model=Page[TripResponse])
 def get_vehicle_trips(
     vehicle_id: str,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all trips for a vehicle within date range (Fleet Manager only)"""
+    """Get a vehicle's trips within a date range, latest first, one page (limit/cursor) at a time (Fleet Manager only)"""
     try:
         vid = uuid.UUID(vehicle_id)
     except ValueError:
@@ -187,5 +237,12 @@ def get_vehicle_trips(
     except ValueError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date format")
     
-    trips = TripService.get_vehicle_trips(db, vid, start, end)
-    return trips
+    columns = TRIP_LIST_COLUMNS if projection_enabled("trips") else None
+    try:
+        trips, next_cursor = TripService.get_vehicle_trips(db, vid, start, end, cursor, limit, columns)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if columns:
+        return Response(encode_page(trips, columns, next_cursor), media_type="application/json")
+    return {"items": trips, "next_cursor": next_cursor}
@@ -1,38 +1,72 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Response, UploadFile, status, Query
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_user, get_current_fleet_manager, get_current_admin
 from app.models import User, Vehicle
-from app.services import VehicleService
-from app.schemas import VehicleCreate, VehicleUpdate, VehicleResponse, VehicleStatus
+from app.services import InvalidCursorError, VehicleImportService, VehicleService
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from app.services.projections import VEHICLE_LIST_COLUMNS, encode_page, projection_enabled
+from app.services.vehicle_import import IMPORT_FORMATS
+from app.schemas import (
+    Page,
+    VehicleCreate,
+    VehicleUpdate,
+    VehicleResponse,
+    VehicleStatus,
+    VehicleImportResponse,
+    TelemetryBatch,
+    TelemetryIngestResponse,
+)
 from datetime import datetime
 from typing import List, Optional
+import csv
+import os
 import uuid
 
 
 router = APIRouter(prefix="/api/vehicles", tags=["vehicles"])
 
 
-@router.get("", response_model=List[VehicleResponse])
+@router.get("", response_model=Page[VehicleResponse])
 def list_vehicles(
-    status: Optional[VehicleStatus] = Query(None),
+    status_filter: Optional[VehicleStatus] = Query(None, alias="status"),
     location: Optional[str] = Query(None),
+    make: Optional[str] = Query(None),
+    model: Optional[str] = Query(None),
+    min_health_score: Optional[float] = Query(None, ge=0, le=100),
+    max_health_score: Optional[float] = Query(None, ge=0, le=100),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """List all vehicles, optionally filtered by status or location"""
-    if status:
-        vehicles = db.query(Vehicle).filter(
-            Vehicle.is_active == True,
-            Vehicle.status == status
-        ).all()
-    else:
-        vehicles = VehicleService.get_all_vehicles(db)
+    """
+    List active vehicles, newest first, one page at a time.
     
-    if location:
-        vehicles = [v for v in vehicles if v.location == location]
+    Optionally filtered by status, location, make, model and health score
+    range. Pass the returned next_cursor as cursor to get the next page.
+    """
+    columns = VEHICLE_LIST_COLUMNS if projection_enabled("vehicles") else None
+    try:
+        vehicles, next_cursor = VehicleService.search_vehicles(
+            db,
+            status=status_filter,
+            location=location,
+            make=make,
+            model=model,
+            min_health_score=min_health_score,
+            max_health_score=max_health_score,
+            cursor=cursor,
+            limit=limit,
+            columns=columns
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     
-    return vehicles
+    if columns:
+        return Response(encode_page(vehicles, columns, next_cursor), media_type="application/json")
+    return {"items": vehicles, "next_cursor": next_cursor}
 
 
 @router.post("", response_model=VehicleResponse, status_code=status.HTTP_201_CREATED)
@@ -66,6 +100,67 @@ def create_vehicle(
     return vehicle
 
 
+@router.post("/import", response_model=VehicleImportResponse)
+def import_vehicles(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Create vehicles in bulk from a CSV or NDJSON upload (Fleet Manager only).
+
+    Each row carries the VehicleCreate fields. The format is taken from the
+    format parameter or the file extension. Valid rows are inserted in one
+    transaction; invalid rows and duplicate license plates are reported
+    per line and skipped.
+    """
+    fmt = format or os.path.splitext(file.filename or "")[1].lstrip(".").lower()
+    if fmt not in IMPORT_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unsupported import format")
+
+    try:
+        summary = VehicleImportService.import_vehicles(db, VehicleImportService.read_records(file.file, fmt))
+        db.commit()
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="File must be UTF-8 encoded")
+    except csv.Error as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Malformed CSV: {e}")
+    except IntegrityError:
+        # A plate was created concurrently after the duplicate check
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Vehicle with this license plate already exists"
+        )
+
+    return summary
+
+
+
+@router.post("/telemetry", response_model=TelemetryIngestResponse)
+def ingest_telemetry(
+    batch: TelemetryBatch,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_fleet_manager)
+):
+    """
+    Apply up to 5,000 mileage/location readings in one transaction (Fleet Manager only).
+    
+    Readings are coalesced to the latest value per vehicle. Mileage may
+    not decrease; such readings and unknown vehicles are reported in
+    rejected while the rest of the batch is applied.
+    """
+    summary = VehicleService.ingest_telemetry(
+        db,
+        [(reading.vehicle_id, reading.recorded_at, reading.mileage, reading.location) for reading in batch.readings]
+    )
+    db.commit()
+    
+    return summary
+
 @router.get("/{vehicle_id}", response_model=VehicleResponse)
 def get_vehicle(
     vehicle_id: str,
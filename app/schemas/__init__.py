@@ -1,8 +1,38 @@
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, TokenResponse, UserRole
-from app.schemas.vehicle import VehicleCreate, VehicleUpdate, VehicleResponse, VehicleStatus
-from app.schemas.booking import BookingCreate, BookingUpdate, BookingResponse, BookingDetail, BookingStatus
+from app.schemas.vehicle import (
+    VehicleCreate,
+    VehicleUpdate,
+    VehicleResponse,
+    VehicleStatus,
+    VehicleImportError,
+    VehicleImportResponse,
+    TelemetryReading,
+    TelemetryBatch,
+    TelemetryRejection,
+    TelemetryIngestResponse,
+)
+from app.schemas.booking import (
+    BookingCreate,
+    BookingUpdate,
+    BookingResponse,
+    BookingDetail,
+    BookingHoldResponse,
+    BookingStatus,
+    BookingBulkCreate,
+    BookingBulkItemResult,
+    BookingBulkResponse,
+    FreeSlotResponse,
+)
 from app.schemas.trip import TripCreate, TripUpdate, TripResponse
-from app.schemas.common import AvailabilityCheckRequest, AvailabilityCheckResponse, FleetUtilizationRequest
+from app.schemas.common import (
+    Page,
+    AvailabilityCheckRequest,
+    AvailabilityCheckResponse,
+    FleetUtilizationRequest,
+    VehicleUtilizationBatchRequest,
+    AnalyticsJobStatus,
+    AnalyticsJobRequest,
+)
 
 __all__ = [
     "UserCreate",
@@ -14,15 +44,30 @@ __all__ = [
     "VehicleUpdate",
     "VehicleResponse",
     "VehicleStatus",
+    "VehicleImportError",
+    "VehicleImportResponse",
+    "TelemetryReading",
+    "TelemetryBatch",
+    "TelemetryRejection",
+    "TelemetryIngestResponse",
     "BookingCreate",
     "BookingUpdate",
     "BookingResponse",
     "BookingDetail",
+    "BookingHoldResponse",
     "BookingStatus",
+    "BookingBulkCreate",
+    "BookingBulkItemResult",
+    "BookingBulkResponse",
+    "FreeSlotResponse",
     "TripCreate",
     "TripUpdate",
     "TripResponse",
+    "Page",
     "AvailabilityCheckRequest",
     "AvailabilityCheckResponse",
     "FleetUtilizationRequest",
+    "VehicleUtilizationBatchRequest",
+    "AnalyticsJobStatus",
+    "AnalyticsJobRequest",
 ]
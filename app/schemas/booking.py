@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 import uuid
 
@@ -45,8 +45,38 @@ class BookingResponse(BaseModel):
         from_attributes = True
 
 
+class BookingHoldResponse(BookingResponse):
+    """A PENDING booking hold and when it lapses unless confirmed"""
+    hold_expires_at: datetime
+
+
 class BookingDetail(BookingResponse):
     """Extended booking details with vehicle info"""
     vehicle_license_plate: Optional[str] = None
     vehicle_make: Optional[str] = None
     vehicle_model: Optional[str] = None
+
+
+class BookingBulkCreate(BaseModel):
+    bookings: List[BookingCreate] = Field(..., min_length=1, max_length=500)
+
+
+class BookingBulkItemResult(BaseModel):
+    """Outcome of a single item of a bulk booking request"""
+    index: int
+    status: str  # "created", "conflict" or "invalid"
+    booking: Optional[BookingResponse] = None
+    detail: Optional[str] = None
+
+
+class BookingBulkResponse(BaseModel):
+    created: int
+    failed: int
+    results: List[BookingBulkItemResult]
+
+
+class FreeSlotResponse(BaseModel):
+    """A free window on a vehicle's booking timeline"""
+    vehicle_id: uuid.UUID
+    start_time: datetime
+    end_time: datetime
@@ -1,5 +1,17 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, Field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+import uuid
+
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated list; pass next_cursor back as cursor for the next page"""
+    items: List[T]
+    next_cursor: Optional[str] = None
 
 
 class AvailabilityCheckRequest(BaseModel):
@@ -21,3 +33,26 @@ class FleetUtilizationRequest(BaseModel):
     start_date: str  # ISO 8601 format
     end_date: str    # ISO 8601 format
     location: Optional[str] = None
+
+
+class VehicleUtilizationBatchRequest(BaseModel):
+    """Request for utilization metrics of several vehicles over one window"""
+    vehicle_ids: List[uuid.UUID] = Field(..., min_length=1, max_length=500)
+    start_date: datetime
+    end_date: datetime
+
+
+class AnalyticsJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class AnalyticsJobRequest(BaseModel):
+    """Request to run an analytics report in the background"""
+    report: str = Field(..., min_length=1, max_length=100)
+    start_date: datetime
+    end_date: datetime
+    parameters: Dict[str, Any] = Field(default_factory=dict)
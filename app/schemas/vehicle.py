@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 from enum import Enum
 import uuid
 
@@ -45,3 +45,41 @@ class VehicleResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class VehicleImportError(BaseModel):
+    """A rejected row of a bulk vehicle import"""
+    line: int
+    license_plate: Optional[str] = None
+    detail: str
+
+
+class VehicleImportResponse(BaseModel):
+    created: int
+    failed: int
+    errors: List[VehicleImportError]
+    errors_truncated: bool = False
+
+
+class TelemetryReading(BaseModel):
+    """One device report; either value may be omitted"""
+    vehicle_id: uuid.UUID
+    recorded_at: datetime
+    mileage: Optional[float] = Field(None, ge=0)
+    location: Optional[str] = Field(None, min_length=1, max_length=255)
+
+
+class TelemetryBatch(BaseModel):
+    readings: List[TelemetryReading] = Field(..., min_length=1, max_length=5000)
+
+
+class TelemetryRejection(BaseModel):
+    vehicle_id: uuid.UUID
+    detail: str
+
+
+class TelemetryIngestResponse(BaseModel):
+    received: int
+    vehicles: int
+    updated: int
+    rejected: List[TelemetryRejection]
@@ -1,12 +1,65 @@
-from app.services.booking_service import BookingService, BookingConflictError
+from app.services.booking_service import BookingService, BookingConflictError, BookingConcurrencyError
+from app.services.hold_sweeper import HoldSweeper
+from app.services.booking_index import BookingIntervalIndex, BookingTimeline, booking_index
+from app.services.occupancy_calendar import OccupancyCalendar, occupancy_calendar
+from app.services.lock_manager import (
+    Lease,
+    LockManager,
+    InProcessLockManager,
+    RedisLockManager,
+    get_lock_manager,
+    set_lock_manager,
+)
+from app.services.pagination import InvalidCursorError
 from app.services.vehicle_service import VehicleService
+from app.services.vehicle_import import VehicleImportService
 from app.services.trip_service import TripService
 from app.services.analytics_service import AnalyticsService
+from app.services.rollup_service import RollupService
+from app.services.rollup_applier import RollupApplier
+from app.services.analytics_cache import AnalyticsCache, analytics_cache
+from app.services.export_service import ExportService
+from app.services.analytics_jobs import (
+    AnalyticsJob,
+    AnalyticsJobError,
+    AnalyticsJobQueueFull,
+    AnalyticsJobManager,
+    get_analytics_jobs,
+    set_analytics_jobs,
+    shutdown_analytics_jobs,
+)
 
 __all__ = [
     "BookingService",
     "BookingConflictError",
+    "BookingConcurrencyError",
+    "HoldSweeper",
+    "BookingIntervalIndex",
+    "BookingTimeline",
+    "booking_index",
+    "OccupancyCalendar",
+    "occupancy_calendar",
+    "Lease",
+    "LockManager",
+    "InProcessLockManager",
+    "RedisLockManager",
+    "get_lock_manager",
+    "set_lock_manager",
+    "InvalidCursorError",
     "VehicleService",
+    "VehicleImportService",
     "TripService",
     "AnalyticsService",
+    "RollupService",
+    "RollupApplier",
+    "AnalyticsCache",
+    "analytics_cache",
+    "ExportService",
+    "AnalyticsJob",
+    "AnalyticsJobError",
+    "AnalyticsJobQueueFull",
+    "AnalyticsJobManager",
+    "get_analytics_jobs",
+    "set_analytics_jobs",
+    "shutdown_analytics_jobs",
 ]
@@ -0,0 +1,370 @@
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.services.analytics_service import AnalyticsService
+import copy
+import threading
+import time
+import uuid
+
+
+# Facts a cached result is computed from; writes report which of them they changed
+TRIP_FACTS = "trips"
+BOOKING_FACTS = "bookings"
+VEHICLE_FACTS = "vehicles"
+
+# Key used to stash per-transaction invalidations in Session.info
+_PENDING_INVALIDATIONS_KEY = "analytics_cache_pending_invalidations"
+
+
+class CacheScope(NamedTuple):
+    """What a cached result depends on; None means "everything" for that dimension"""
+    facts: FrozenSet[str]
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
+    location: Optional[str] = None
+    vehicle_ids: Optional[FrozenSet[uuid.UUID]] = None
+
+
+class DataChange(NamedTuple):
+    """
+    A committed write, summarized for invalidation.
+
+    Fact timestamps fall in [lower, upper]; locations and vehicle_ids list
+    what was touched. None means unknown, which matches every entry.
+    """
+    facts: str
+    lower: Optional[datetime] = None
+    upper: Optional[datetime] = None
+    locations: Optional[FrozenSet[Optional[str]]] = None
+    vehicle_ids: Optional[FrozenSet[uuid.UUID]] = None
+
+    def affects(self, scope: CacheScope) -> bool:
+        if self.facts not in scope.facts:
+            return False
+        if self.lower is not None and scope.end is not None and self.lower > scope.end:
+            return False
+        if self.upper is not None and scope.start is not None and self.upper < scope.start:
+            return False
+        if scope.location is not None and self.locations is not None and scope.location not in self.locations:
+            return False
+        if scope.vehicle_ids is not None and self.vehicle_ids is not None and scope.vehicle_ids.isdisjoint(self.vehicle_ids):
+            return False
+        return True
+
+
+class _Entry:
+    __slots__ = ("value", "scope", "expires_at")
+
+    def __init__(self, value, scope: CacheScope, expires_at: float):
+        self.value = value
+        self.scope = scope
+        self.expires_at = expires_at
+
+
+class _Flight:
+    """One in-progress computation that identical concurrent requests wait on"""
+    __slots__ = ("scope", "done", "value", "error", "stale")
+
+    def __init__(self, scope: CacheScope):
+        self.scope = scope
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+        self.stale = False
+
+
+class AnalyticsCache:
+    """
+    In-process cache of AnalyticsService results.
+
+    Keys are the method name plus normalized parameters (UTC-naive
+    datetimes, UUIDs, "" locations treated as no filter). Entries expire
+    after a TTL and the least recently used ones are evicted beyond
+    max_entries. Concurrent identical requests are coalesced: the first
+    computes, the rest wait for its result (single-flight).
+
+    Writes stage a DataChange through stage_analytics_change; once their
+    transaction commits, entries whose window, location and vehicle overlap
+    the change are dropped. A computation that overlaps a change while in
+    flight is returned to its callers but not stored.
+
+    Invalidation is process-local, so with several workers other processes
+    only see a write once their entries expire; keep the TTL short.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 256):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._flights: Dict[Tuple, _Flight] = {}
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "evictions": 0, "invalidations": 0}
+
+    @property
+    def is_enabled(self) -> bool:
+        return settings.ANALYTICS_CACHE_ENABLED
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss/coalesce/eviction/invalidation counters and the current size"""
+        with self._lock:
+            return {**self._stats, "size": len(self._entries)}
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._stats = dict.fromkeys(self._stats, 0)
+
+    def get_or_compute(self, key: Tuple, scope: CacheScope, compute: Callable):
+        """Return the cached value for key, computing it at most once across concurrent callers"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats["hits"] += 1
+                    return copy.deepcopy(entry.value)
+                del self._entries[key]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight(scope)
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.value)
+
+        try:
+            flight.value = compute()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+                if flight.error is None and not flight.stale:
+                    self._store(key, flight.value, scope)
+            flight.done.set()
+
+        return copy.deepcopy(flight.value)
+
+    def _store(self, key: Tuple, value, scope: CacheScope):
+        self._entries[key] = _Entry(value, scope, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, changes: Iterable[DataChange]) -> int:
+        """Drop entries (and mark in-flight computations stale) affected by changes. Returns entries dropped."""
+        changes = list(changes)
+        if not changes:
+            return 0
+
+        with self._lock:
+            dropped = [
+                key for key, entry in self._entries.items()
+                if any(change.affects(entry.scope) for change in changes)
+            ]
+            for key in dropped:
+                del self._entries[key]
+            for flight in self._flights.values():
+                if any(change.affects(flight.scope) for change in changes):
+                    flight.stale = True
+            self._stats["invalidations"] += len(dropped)
+
+        return len(dropped)
+
+    # Cached AnalyticsService methods
+
+    def _cached(self, name: str, params: Tuple, scope: CacheScope, compute: Callable):
+        if not self.is_enabled:
+            return compute()
+        return self.get_or_compute((name,) + params, scope, compute)
+
+    def get_vehicle_utilization(self, db: Session, vehicle_id: uuid.UUID, start_date: datetime, end_date: datetime) -> Dict:
+        vehicle_id = uuid.UUID(str(vehicle_id))
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        return self._cached(
+            "vehicle_utilization",
+            (vehicle_id, start_date, end_date),
+            CacheScope(frozenset({TRIP_FACTS}), start_date, end_date, vehicle_ids=frozenset({vehicle_id})),
+            lambda: AnalyticsService.get_vehicle_utilization(db, vehicle_id, start_date, end_date)
+        )
+
+    def get_vehicles_utilization(
+        self,
+        db: Session,
+        vehicle_ids: List[uuid.UUID],
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Dict]:
+        vehicle_ids = [uuid.UUID(str(vehicle_id)) for vehicle_id in vehicle_ids]
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        return self._cached(
+            "vehicles_utilization",
+            (tuple(sorted(set(vehicle_ids))), start_date, end_date),
+            CacheScope(frozenset({TRIP_FACTS}), start_date, end_date, vehicle_ids=frozenset(vehicle_ids)),
+            lambda: AnalyticsService.get_vehicles_utilization(db, vehicle_ids, start_date, end_date)
+        )
+
+    def get_fleet_utilization(
+        self,
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str] = None
+    ) -> Dict:
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        location = location or None
+        return self._cached(
+            "fleet_utilization",
+            (start_date, end_date, location),
+            CacheScope(frozenset({TRIP_FACTS, VEHICLE_FACTS}), start_date, end_date, location=location),
+            lambda: AnalyticsService.get_fleet_utilization(db, start_date, end_date, location)
+        )
+
+    def get_usage_heatmap(
+        self,
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str] = None,
+        by_location: bool = False,
+        top_k: int = 5
+    ) -> Dict:
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        location = location or None
+        # Trips that started before the window still overlap it, so any earlier change counts
+        return self._cached(
+            "usage_heatmap",
+            (start_date, end_date, location, bool(by_location), top_k),
+            CacheScope(frozenset({TRIP_FACTS, VEHICLE_FACTS}), None, end_date, location=location),
+            lambda: AnalyticsService.get_usage_heatmap(db, start_date, end_date, location, by_location, top_k)
+        )
+
+    def get_trip_distribution(
+        self,
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        vehicle_id: Optional[uuid.UUID] = None,
+        location: Optional[str] = None
+    ) -> Dict:
+        vehicle_id = uuid.UUID(str(vehicle_id)) if vehicle_id else None
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        location = location or None
+        return self._cached(
+            "trip_distribution",
+            (start_date, end_date, vehicle_id, location),
+            CacheScope(
+                frozenset({TRIP_FACTS, VEHICLE_FACTS}) if location else frozenset({TRIP_FACTS}),
+                start_date, end_date, location=location,
+                vehicle_ids=frozenset({vehicle_id}) if vehicle_id else None
+            ),
+            lambda: AnalyticsService.get_trip_distribution(db, start_date, end_date, vehicle_id, location)
+        )
+
+    def get_underutilized_vehicles(
+        self,
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        threshold_percentage: float = 20.0,
+        limit: Optional[int] = None,
+        offset: int = 0
+    ) -> List[Dict]:
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        threshold_percentage = float(threshold_percentage)
+        return self._cached(
+            "underutilized_vehicles",
+            (start_date, end_date, threshold_percentage, limit, offset),
+            CacheScope(frozenset({TRIP_FACTS, VEHICLE_FACTS}), start_date, end_date),
+            lambda: AnalyticsService.get_underutilized_vehicles(
+                db, start_date, end_date, threshold_percentage, limit, offset
+            )
+        )
+
+    def get_booking_statistics(
+        self,
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        bucket: Optional[str] = None
+    ) -> Dict:
+        start_date, end_date = _normalize_datetime(start_date), _normalize_datetime(end_date)
+        return self._cached(
+            "booking_statistics",
+            (start_date, end_date, bucket),
+            CacheScope(frozenset({BOOKING_FACTS}), start_date, end_date),
+            lambda: AnalyticsService.get_booking_statistics(db, start_date, end_date, bucket)
+        )
+
+
+def _normalize_datetime(moment: datetime) -> datetime:
+    """Naive UTC, the form timestamps are stored in"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+analytics_cache = AnalyticsCache(
+    ttl_seconds=settings.ANALYTICS_CACHE_TTL_SECONDS,
+    max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES
+)
+
+
+def stage_analytics_change(
+    db: Session,
+    facts: str,
+    moments: Optional[Iterable[datetime]] = None,
+    locations: Optional[Iterable[Optional[str]]] = None,
+    vehicle_ids: Optional[Iterable[uuid.UUID]] = None
+):
+    """
+    Invalidate cached analytics touched by a write once its transaction commits.
+
+    moments are the fact timestamps that changed (trip start, booking
+    creation); None means every window.
+    """
+    if not analytics_cache.is_enabled:
+        return
+
+    lower = upper = None
+    if moments is not None:
+        moments = list(moments)
+        if not moments:
+            return
+        lower, upper = min(moments), max(moments)
+
+    db.info.setdefault(_PENDING_INVALIDATIONS_KEY, []).append(DataChange(
+        facts,
+        lower,
+        upper,
+        frozenset(locations) if locations is not None else None,
+        frozenset(vehicle_ids) if vehicle_ids is not None else None
+    ))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_invalidations(session):
+    analytics_cache.invalidate(session.info.pop(_PENDING_INVALIDATIONS_KEY, []))
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_invalidations(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_PENDING_INVALIDATIONS_KEY, None)
@@ -0,0 +1,382 @@
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Vehicle
+from app.schemas import AnalyticsJobStatus
+from app.services.analytics_cache import analytics_cache
+from app.services.analytics_service import AnalyticsService
+import inspect
+import threading
+import time
+import uuid
+
+
+class AnalyticsJobError(Exception):
+    """Raised when a job cannot be submitted"""
+    pass
+
+
+class AnalyticsJobQueueFull(AnalyticsJobError):
+    """Raised when the queue of not-yet-started jobs is at its cap"""
+    pass
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once cancellation was requested"""
+    pass
+
+
+class JobContext:
+    """Handed to report runners to publish progress and stop early when cancelled"""
+
+    def __init__(self, job: "AnalyticsJob"):
+        self._job = job
+
+    def progress(self, done: int, total: int):
+        """Record that done of total steps finished; raises JobCancelled if the job was cancelled"""
+        self._job.progress = round(done / total, 4) if total else 1.0
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._job.cancel_requested.is_set():
+            raise JobCancelled()
+
+
+def _time_chunks(start_date: datetime, end_date: datetime, chunk_days: float) -> List[Tuple[datetime, datetime]]:
+    """Consecutive [lower, upper) windows of chunk_days covering [start_date, end_date]"""
+    step = timedelta(days=chunk_days)
+    if step <= timedelta(0):
+        raise ValueError("chunk_days must be positive")
+    chunks = []
+    lower = start_date
+    while lower + step < end_date:
+        chunks.append((lower, lower + step))
+        lower += step
+    chunks.append((lower, end_date))
+    return chunks
+
+
+def _underutilized_vehicles(db: Session, context: JobContext, start_date, end_date, threshold_percentage=20.0,
+                            limit=None, offset=0, chunk_size=500):
+    """Underutilized vehicles, one grouped query per chunk of active vehicles, sorted and paged at the end"""
+    vehicle_ids = [vehicle_id for (vehicle_id,) in db.query(Vehicle.id).filter(Vehicle.is_active == True)]
+    rows = []
+    for done in range(0, len(vehicle_ids), chunk_size):
+        chunk = vehicle_ids[done:done + chunk_size]
+        rows.extend(AnalyticsService._underutilized_query(db, start_date, end_date, threshold_percentage, chunk))
+        context.progress(done + len(chunk), len(vehicle_ids))
+
+    rows.sort(key=lambda row: (row[4], row[1]))
+    rows = rows[offset:] if limit is None else rows[offset:offset + limit]
+    total_hours = (end_date - start_date).total_seconds() / 3600.0
+    return [AnalyticsService._underutilized_entry(row, total_hours) for row in rows]
+
+
+def _fleet_utilization(db: Session, context: JobContext, start_date, end_date, location=None, chunk_days=7):
+    """Fleet utilization, summing the hour-of-day trip totals of each chunk_days slice of trip start times"""
+    total_vehicles, active_vehicles = AnalyticsService._fleet_vehicle_counts(db, location)
+    totals: Dict[int, List] = {}
+    if total_vehicles:
+        chunks = _time_chunks(start_date, end_date, chunk_days)
+        for done, (lower, upper) in enumerate(chunks, 1):
+            for hour, trips, distance, seconds in AnalyticsService._fleet_hourly_totals(
+                db, lower, upper, location, include_end=done == len(chunks)
+            ):
+                total = totals.setdefault(hour, [0, 0.0, 0])
+                total[0] += trips
+                total[1] += distance
+                total[2] += seconds
+            context.progress(done, len(chunks))
+
+    by_hour = [(hour, *total) for hour, total in sorted(totals.items())]
+    return AnalyticsService._fleet_metrics(start_date, end_date, location, total_vehicles, active_vehicles, by_hour)
+
+
+def _usage_heatmap(db: Session, context: JobContext, start_date, end_date, location=None, by_location=False,
+                   top_k=5, chunk_days=7):
+    """Usage heatmap, fetching trips one chunk_days slice of start times at a time"""
+    now = datetime.utcnow()
+    chunks = _time_chunks(start_date, end_date, chunk_days)
+    rows = []
+    for done, (lower, upper) in enumerate(chunks, 1):
+        # Trips starting before the window fall in the first slice, the rest by start time
+        rows.extend(AnalyticsService._heatmap_rows(
+            db, start_date, end_date, now, location, by_location,
+            started_from=lower if done > 1 else None,
+            started_before=upper if done < len(chunks) else None
+        ))
+        context.progress(done, len(chunks))
+    return AnalyticsService._heatmap_from_rows(start_date, end_date, location, by_location, top_k, rows)
+
+
+def _trip_distribution(db: Session, context: JobContext, start_date, end_date, vehicle_id=None, location=None):
+    return analytics_cache.get_trip_distribution(db, start_date, end_date, vehicle_id, location)
+
+
+def _booking_statistics(db: Session, context: JobContext, start_date, end_date, bucket=None):
+    return analytics_cache.get_booking_statistics(db, start_date, end_date, bucket)
+
+
+def _vehicles_utilization(db: Session, context: JobContext, start_date, end_date, vehicle_ids=(), chunk_size=100):
+    """Utilization for any number of vehicles, one grouped query per chunk"""
+    vehicle_ids = list(dict.fromkeys(uuid.UUID(str(vehicle_id)) for vehicle_id in vehicle_ids))
+    if not vehicle_ids:
+        raise ValueError("vehicle_ids must not be empty")
+
+    metrics: Dict[str, Dict] = {}
+    for done in range(0, len(vehicle_ids), chunk_size):
+        chunk = vehicle_ids[done:done + chunk_size]
+        metrics.update(analytics_cache.get_vehicles_utilization(db, chunk, start_date, end_date))
+        context.progress(done + len(chunk), len(vehicle_ids))
+    return metrics
+
+
+# Reports a job can run: name -> runner(db, context, start_date, end_date, **parameters)
+ANALYTICS_JOB_REPORTS: Dict[str, Callable] = {
+    "underutilized_vehicles": _underutilized_vehicles,
+    "fleet_utilization": _fleet_utilization,
+    "usage_heatmap": _usage_heatmap,
+    "trip_distribution": _trip_distribution,
+    "booking_statistics": _booking_statistics,
+    "vehicles_utilization": _vehicles_utilization,
+}
+
+
+class AnalyticsJob:
+    """One submitted report and its outcome"""
+
+    def __init__(self, report: str, parameters: Dict[str, Any], start_date: datetime, end_date: datetime,
+                 owner_id: Optional[uuid.UUID] = None):
+        self.id = uuid.uuid4()
+        self.report = report
+        self.parameters = parameters
+        self.start_date = start_date
+        self.end_date = end_date
+        self.owner_id = owner_id
+        self.status = AnalyticsJobStatus.QUEUED
+        self.progress = 0.0
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.cancel_requested = threading.Event()
+        self.future: Optional[Future] = None
+        self._finished_monotonic: Optional[float] = None
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in (AnalyticsJobStatus.SUCCEEDED, AnalyticsJobStatus.FAILED, AnalyticsJobStatus.CANCELLED)
+
+    def to_dict(self, include_result: bool = False) -> Dict:
+        job = {
+            "job_id": str(self.id),
+            "report": self.report,
+            "status": self.status.value,
+            "progress": self.progress,
+            "start_date": self.start_date,
+            "end_date": self.end_date,
+            "parameters": self.parameters,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            job["result"] = self.result
+        return job
+
+
+class AnalyticsJobManager:
+    """
+    Runs analytics reports in the background on a bounded thread pool.
+
+    At most max_workers reports run at once, each in its own session from
+    session_factory, so a slow report holds one pool thread and one DB
+    connection instead of a request worker. At most max_queued jobs may
+    wait for a thread; submit raises AnalyticsJobQueueFull beyond that.
+
+    Queued jobs are cancelled outright. A running job is cancelled at its
+    next progress report (or discarded when it finishes first). Finished
+    jobs and their results are kept for retention_seconds, and only the
+    newest max_retained finished jobs are kept.
+
+    Jobs live in this process: with several API workers a client must poll
+    the worker that accepted the job.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_workers: int = 2,
+        max_queued: int = 32,
+        retention_seconds: float = 900,
+        max_retained: int = 500
+    ):
+        self._session_factory = session_factory
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.retention_seconds = retention_seconds
+        self.max_retained = max_retained
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analytics-job")
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[uuid.UUID, AnalyticsJob]" = OrderedDict()
+
+    def submit(
+        self,
+        report: str,
+        start_date: datetime,
+        end_date: datetime,
+        parameters: Optional[Dict[str, Any]] = None,
+        owner_id: Optional[uuid.UUID] = None
+    ) -> AnalyticsJob:
+        """Queue a report; raises AnalyticsJobError for unknown reports, AnalyticsJobQueueFull when full"""
+        if report not in ANALYTICS_JOB_REPORTS:
+            raise AnalyticsJobError(f"Unknown report {report!r}")
+        try:
+            inspect.signature(ANALYTICS_JOB_REPORTS[report]).bind(None, None, start_date, end_date, **(parameters or {}))
+        except TypeError as e:
+            raise AnalyticsJobError(f"Invalid parameters for {report}: {e}")
+
+        job = AnalyticsJob(report, dict(parameters or {}), start_date, end_date, owner_id)
+        with self._lock:
+            self._prune()
+            queued = sum(1 for other in self._jobs.values() if other.status == AnalyticsJobStatus.QUEUED)
+            if queued >= self.max_queued:
+                raise AnalyticsJobQueueFull(f"{queued} analytics jobs are already queued")
+            self._jobs[job.id] = job
+            job.future = self._executor.submit(self._run, job)
+        return job
+
+    def get(self, job_id: uuid.UUID) -> Optional[AnalyticsJob]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def list(self, owner_id: Optional[uuid.UUID] = None) -> List[AnalyticsJob]:
+        """Retained jobs, newest first, optionally only those submitted by owner_id"""
+        with self._lock:
+            self._prune()
+            jobs = list(self._jobs.values())
+        return [job for job in reversed(jobs) if owner_id is None or job.owner_id == owner_id]
+
+    def cancel(self, job_id: uuid.UUID) -> Optional[AnalyticsJob]:
+        """Cancel a queued or running job; finished jobs are returned unchanged"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.is_finished:
+                return job
+
+            job.cancel_requested.set()
+            if job.future is not None and job.future.cancel():
+                self._finish(job, AnalyticsJobStatus.CANCELLED)
+        return job
+
+    def wait(self, job_id: uuid.UUID, timeout: Optional[float] = None) -> Optional[AnalyticsJob]:
+        """Block until the job finishes or timeout elapses"""
+        job = self.get(job_id)
+        if job is not None and job.future is not None:
+            try:
+                job.future.exception(timeout)
+            except Exception:
+                pass
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state.value: 0 for state in AnalyticsJobStatus}
+            for job in self._jobs.values():
+                counts[job.status.value] += 1
+        return counts
+
+    def shutdown(self, wait: bool = False):
+        """Cancel queued jobs and stop accepting work"""
+        for job in self.list():
+            if job.status == AnalyticsJobStatus.QUEUED:
+                self.cancel(job.id)
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job: AnalyticsJob):
+        with self._lock:
+            if job.cancel_requested.is_set():
+                self._finish(job, AnalyticsJobStatus.CANCELLED)
+                return
+            job.status = AnalyticsJobStatus.RUNNING
+            job.started_at = datetime.utcnow()
+
+        context = JobContext(job)
+        db = self._session_factory()
+        try:
+            result = ANALYTICS_JOB_REPORTS[job.report](
+                db, context, job.start_date, job.end_date, **job.parameters
+            )
+            context.check_cancelled()
+        except JobCancelled:
+            outcome, result = AnalyticsJobStatus.CANCELLED, None
+        except Exception as e:
+            db.rollback()
+            outcome, result = AnalyticsJobStatus.FAILED, None
+            job.error = str(e) or type(e).__name__
+        else:
+            outcome = AnalyticsJobStatus.SUCCEEDED
+            job.progress = 1.0
+        finally:
+            db.close()
+
+        with self._lock:
+            job.result = result
+            self._finish(job, outcome)
+
+    def _finish(self, job: AnalyticsJob, outcome: AnalyticsJobStatus):
+        """Mark a job finished; caller holds the lock"""
+        job.status = outcome
+        job.finished_at = datetime.utcnow()
+        job._finished_monotonic = time.monotonic()
+
+    def _prune(self):
+        """Drop finished jobs past retention, then the oldest beyond max_retained; caller holds the lock"""
+        now = time.monotonic()
+        finished = [job for job in self._jobs.values() if job.is_finished]
+        expired = {job.id for job in finished if now - job._finished_monotonic >= self.retention_seconds}
+        survivors = [job for job in finished if job.id not in expired]
+        survivors.sort(key=lambda job: job._finished_monotonic)
+        expired.update(job.id for job in survivors[:max(0, len(survivors) - self.max_retained)])
+        for job_id in expired:
+            del self._jobs[job_id]
+
+
+_analytics_jobs: Optional[AnalyticsJobManager] = None
+_analytics_jobs_lock = threading.Lock()
+
+
+def get_analytics_jobs() -> AnalyticsJobManager:
+    """Return the process-wide job manager, created on first use from the ANALYTICS_JOB_* settings"""
+    global _analytics_jobs
+    if _analytics_jobs is None:
+        with _analytics_jobs_lock:
+            if _analytics_jobs is None:
+                from app.database import SessionLocal
+
+                _analytics_jobs = AnalyticsJobManager(
+                    SessionLocal,
+                    max_workers=settings.ANALYTICS_JOB_WORKERS,
+                    max_queued=settings.ANALYTICS_JOB_MAX_QUEUED,
+                    retention_seconds=settings.ANALYTICS_JOB_RETENTION_SECONDS,
+                    max_retained=settings.ANALYTICS_JOB_MAX_RETAINED
+                )
+    return _analytics_jobs
+
+
+def set_analytics_jobs(manager: Optional[AnalyticsJobManager]):
+    """Override the job manager (None creates a new one from settings on next use)"""
+    global _analytics_jobs
+    _analytics_jobs = manager
+
+
+def shutdown_analytics_jobs():
+    """Stop the job manager if one was created"""
+    if _analytics_jobs is not None:
+        _analytics_jobs.shutdown()
@@ -1,12 +1,27 @@
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from app.models import Trip, Booking, Vehicle
-from app.schemas import BookingStatus
+from sqlalchemy import Integer, case, cast, extract, func, literal, select, union_all
+from app.config import settings
+from app.models import Trip, Booking, Vehicle, VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch
+from app.schemas import BookingStatus, VehicleStatus
+from app.services.quantile_sketch import TRIP_METRICS, TRIP_SKETCH_ACCURACY, QuantileSketch, trip_metrics
+from app.services.usage_heatmap import DAY_NAMES, REFERENCE_MONDAY, hours_since_reference, top_cells, weekly_occupancy
+import numpy as np
 import uuid
 
 
+# Bucket widths accepted by get_booking_statistics
+BOOKING_STATISTICS_BUCKETS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
+# Longest series get_booking_statistics returns (about 14 months of hourly buckets)
+MAX_SERIES_BUCKETS = 10000
+
+
 class AnalyticsService:
     """Service for computing fleet utilization and operational metrics"""
     
@@ -26,17 +41,63 @@ class AnalyticsService:
         - Total distance traveled
         - Average trip duration
         """
-        # Get completed trips
-        trips = db.query(Trip).filter(
-            Trip.vehicle_id == vehicle_id,
-            Trip.start_time >= start_date,
-            Trip.start_time <= end_date,
-            Trip.end_time.isnot(None)
-        ).all()
+        facts = AnalyticsService._vehicle_trip_facts(db, start_date, end_date, [vehicle_id])
+        total_trips, total_distance, total_seconds = db.query(
+            func.coalesce(func.sum(facts.c.trip_count), 0),
+            func.coalesce(func.sum(facts.c.distance_km), 0.0),
+            func.coalesce(func.sum(facts.c.in_use_seconds), 0)
+        ).one()
+        
+        return AnalyticsService._utilization_metrics(
+            vehicle_id, start_date, end_date, total_trips, total_distance, total_seconds
+        )
+    
+    @staticmethod
+    def get_vehicles_utilization(
+        db: Session,
+        vehicle_ids: List[uuid.UUID],
+        start_date: datetime,
+        end_date: datetime
+    ) -> Dict[str, Dict]:
+        """
+        Calculate get_vehicle_utilization metrics for several vehicles at once.
         
+        Runs as one query grouped by vehicle_id over trips of the requested
+        vehicles (vehicle_id IN (...)). Returns a map keyed by vehicle ID
+        string; vehicles without trips in the window get zero metrics.
+        """
+        vehicle_ids = list(dict.fromkeys(vehicle_ids))
+        facts = AnalyticsService._vehicle_trip_facts(db, start_date, end_date, vehicle_ids)
+        totals = {
+            vehicle_id: (total_trips, total_distance, total_seconds)
+            for vehicle_id, total_trips, total_distance, total_seconds in db.query(
+                facts.c.vehicle_id,
+                func.sum(facts.c.trip_count),
+                func.sum(facts.c.distance_km),
+                func.sum(facts.c.in_use_seconds)
+            ).group_by(facts.c.vehicle_id)
+        }
+        
+        return {
+            str(vehicle_id): AnalyticsService._utilization_metrics(
+                vehicle_id, start_date, end_date, *totals.get(vehicle_id, (0, 0.0, 0))
+            )
+            for vehicle_id in vehicle_ids
+        }
+    
+    @staticmethod
+    def _utilization_metrics(
+        vehicle_id: uuid.UUID,
+        start_date: datetime,
+        end_date: datetime,
+        total_trips: int,
+        total_distance: float,
+        total_seconds: float
+    ) -> Dict:
+        """Vehicle utilization metrics from a vehicle's completed-trip totals in the window"""
         total_hours = (end_date - start_date).total_seconds() / 3600.0
         
-        if not trips:
+        if not total_trips:
             return {
                 "vehicle_id": str(vehicle_id),
                 "start_date": start_date,
@@ -49,18 +110,17 @@ class AnalyticsService:
                 "idle_hours": total_hours
             }
         
-        total_distance = sum(trip.distance_traveled for trip in trips)
-        total_hours_in_use = sum(trip.get_duration_hours() for trip in trips)
+        total_hours_in_use = total_seconds / 3600.0
         
         return {
             "vehicle_id": str(vehicle_id),
             "start_date": start_date,
             "end_date": end_date,
             "utilization_percentage": round((total_hours_in_use / total_hours) * 100, 2) if total_hours > 0 else 0,
-            "total_trips": len(trips),
+            "total_trips": total_trips,
             "total_distance_km": round(total_distance, 2),
             "total_hours_in_use": round(total_hours_in_use, 2),
-            "average_trip_duration_hours": round(total_hours_in_use / len(trips), 2) if trips else 0,
+            "average_trip_duration_hours": round(total_hours_in_use / total_trips, 2),
             "idle_hours": round(total_hours - total_hours_in_use, 2)
         }
     
@@ -79,15 +139,61 @@ class AnalyticsService:
         - Number of active vehicles
         - Peak usage hours
         - Fleet efficiency score
+        
+        Everything is computed with database aggregates (vehicle counts and
+        an hour-of-day histogram of trips), so memory use does not grow with
+        the width of the window. The location filter applies to vehicles by
+        their current location and to trips by the location their vehicle
+        had when the trip started.
         """
-        # Get vehicles (optionally filtered by location)
-        vehicle_query = db.query(Vehicle).filter(Vehicle.is_active == True)
+        total_vehicles, active_vehicles = AnalyticsService._fleet_vehicle_counts(db, location)
+        by_hour = AnalyticsService._fleet_hourly_totals(db, start_date, end_date, location) if total_vehicles else []
+        return AnalyticsService._fleet_metrics(
+            start_date, end_date, location, total_vehicles, active_vehicles, by_hour
+        )
+    
+    @staticmethod
+    def _fleet_vehicle_counts(db: Session, location: Optional[str] = None) -> Tuple[int, int]:
+        """Active vehicles and how many of them are in use (optionally at a location)"""
+        vehicle_query = db.query(
+            func.count(Vehicle.id),
+            func.coalesce(func.sum(case((Vehicle.status == VehicleStatus.IN_USE, 1), else_=0)), 0)
+        ).filter(Vehicle.is_active == True)
         if location:
             vehicle_query = vehicle_query.filter(Vehicle.location == location)
-        
-        vehicles = vehicle_query.all()
-        
-        if not vehicles:
+        return tuple(vehicle_query.one())
+    
+    @staticmethod
+    def _fleet_hourly_totals(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str] = None,
+        include_end: bool = True
+    ) -> List[Tuple[int, int, float, float]]:
+        """
+        (hour_of_day, trips, distance, seconds) of completed trips starting in
+        [start_date, end_date] (or [start_date, end_date) without include_end)
+        """
+        facts = AnalyticsService._hourly_trip_facts(db, start_date, end_date, location, include_end)
+        return [tuple(row) for row in db.query(
+            facts.c.hour_of_day,
+            func.sum(facts.c.trip_count),
+            func.sum(facts.c.distance_km),
+            func.sum(facts.c.in_use_seconds)
+        ).group_by(facts.c.hour_of_day)]
+    
+    @staticmethod
+    def _fleet_metrics(
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str],
+        total_vehicles: int,
+        active_vehicles: int,
+        by_hour: List[Tuple[int, int, float, float]]
+    ) -> Dict:
+        """get_fleet_utilization's report from vehicle counts and the hour-of-day trip totals"""
+        if not total_vehicles:
             return {
                 "start_date": start_date,
                 "end_date": end_date,
@@ -102,22 +208,18 @@ class AnalyticsService:
             }
         
         total_hours = (end_date - start_date).total_seconds() / 3600.0
-        available_vehicle_hours = len(vehicles) * total_hours
+        available_vehicle_hours = total_vehicles * total_hours
         
-        # Get all trips
-        trips = db.query(Trip).filter(
-            Trip.start_time >= start_date,
-            Trip.start_time <= end_date,
-            Trip.end_time.isnot(None)
-        ).all()
-        
-        total_distance = sum(trip.distance_traveled for trip in trips)
-        total_hours_in_use = sum(trip.get_duration_hours() for trip in trips)
+        total_trips = sum(trips for _, trips, _, _ in by_hour)
+        total_distance = sum(distance for _, _, distance, _ in by_hour)
+        total_hours_in_use = sum(seconds for _, _, _, seconds in by_hour) / 3600.0
         
         utilization_percentage = (total_hours_in_use / available_vehicle_hours * 100) if available_vehicle_hours > 0 else 0
         
         # Calculate peak usage hours
-        peak_hours = AnalyticsService._calculate_peak_hours(trips)
+        peak_hours = AnalyticsService._calculate_peak_hours(
+            {hour: trips for hour, trips, _, _ in by_hour if trips}
+        )
         
         # Fleet efficiency score (0-100)
         # Based on utilization and distance per hour
@@ -128,10 +230,10 @@ class AnalyticsService:
             "start_date": start_date,
             "end_date": end_date,
             "location": location,
-            "total_vehicles": len(vehicles),
-            "active_vehicles": len([v for v in vehicles if v.status.value == "in_use"]),
+            "total_vehicles": total_vehicles,
+            "active_vehicles": active_vehicles,
             "fleet_utilization_percentage": round(utilization_percentage, 2),
-            "total_trips": len(trips),
+            "total_trips": total_trips,
             "total_distance_km": round(total_distance, 2),
             "peak_usage_hours": peak_hours,
             "fleet_efficiency_score": round(efficiency_score, 2)
@@ -142,72 +244,512 @@ class AnalyticsService:
         db: Session,
         start_date: datetime,
         end_date: datetime,
-        threshold_percentage: float = 20.0
+        threshold_percentage: float = 20.0,
+        limit: Optional[int] = None,
+        offset: int = 0
     ) -> List[Dict]:
         """
         Identify vehicles with utilization below threshold.
         Useful for optimization and asset reallocation decisions.
+        
+        Runs as one query: completed trips in the window are aggregated per
+        vehicle (GROUP BY vehicle_id over _vehicle_trip_facts) and left-joined
+        to active vehicles, so vehicles without trips count as 0%.
+        The threshold, sort and pagination are applied in SQL.
         """
-        vehicles = db.query(Vehicle).filter(Vehicle.is_active == True).all()
+        query = AnalyticsService._underutilized_query(db, start_date, end_date, threshold_percentage).offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
         
-        underutilized = []
-        for vehicle in vehicles:
-            metrics = AnalyticsService.get_vehicle_utilization(db, vehicle.id, start_date, end_date)
-            if metrics["utilization_percentage"] < threshold_percentage:
-                underutilized.append({
-                    "vehicle_id": metrics["vehicle_id"],
-                    "license_plate": vehicle.license_plate,
-                    "utilization_percentage": metrics["utilization_percentage"],
-                    "total_trips": metrics["total_trips"],
-                    "health_score": vehicle.health_score
-                })
+        total_hours = (end_date - start_date).total_seconds() / 3600.0
+        return [AnalyticsService._underutilized_entry(row, total_hours) for row in query]
+    
+    @staticmethod
+    def _underutilized_query(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        threshold_percentage: float,
+        vehicle_ids: Optional[List[uuid.UUID]] = None
+    ):
+        """
+        (id, license_plate, health_score, total_trips, seconds_in_use) of
+        active vehicles below the threshold, least used first, optionally
+        only among the given vehicles
+        """
+        total_hours = (end_date - start_date).total_seconds() / 3600.0
+        
+        facts = AnalyticsService._vehicle_trip_facts(db, start_date, end_date, vehicle_ids)
+        trip_stats = db.query(
+            facts.c.vehicle_id.label("vehicle_id"),
+            func.sum(facts.c.trip_count).label("total_trips"),
+            func.sum(facts.c.in_use_seconds).label("seconds_in_use")
+        ).group_by(facts.c.vehicle_id).subquery()
+        
+        seconds_in_use = func.coalesce(trip_stats.c.seconds_in_use, 0)
         
-        return sorted(underutilized, key=lambda x: x["utilization_percentage"])
+        query = db.query(
+            Vehicle.id,
+            Vehicle.license_plate,
+            Vehicle.health_score,
+            func.coalesce(trip_stats.c.total_trips, 0),
+            seconds_in_use
+        ).outerjoin(
+            trip_stats, trip_stats.c.vehicle_id == Vehicle.id
+        ).filter(
+            Vehicle.is_active == True,
+            seconds_in_use < threshold_percentage / 100.0 * total_hours * 3600
+        ).order_by(
+            seconds_in_use, Vehicle.license_plate
+        )
+        if vehicle_ids is not None:
+            query = query.filter(Vehicle.id.in_(vehicle_ids))
+        return query
     
     @staticmethod
-    def _calculate_peak_hours(trips: List[Trip]) -> List[str]:
-        """Calculate peak usage hours from trip data"""
-        if not trips:
-            return []
+    def _underutilized_entry(row: Tuple, total_hours: float) -> Dict:
+        vehicle_id, license_plate, health_score, total_trips, seconds = row
+        return {
+            "vehicle_id": str(vehicle_id),
+            "license_plate": license_plate,
+            "utilization_percentage": round((seconds / 3600.0 / total_hours) * 100, 2) if total_hours > 0 else 0,
+            "total_trips": total_trips,
+            "health_score": health_score
+        }
+    
+    @staticmethod
+    def get_usage_heatmap(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str] = None,
+        by_location: bool = False,
+        top_k: int = 5
+    ) -> Dict:
+        """
+        Weekly (7 days x 24 hours) occupancy heatmap for a date range.
         
-        hour_counts = {}
-        for trip in trips:
-            hour = trip.start_time.hour
-            hour_counts[hour] = hour_counts.get(hour, 0) + 1
+        Every trip overlapping the window counts toward each hour it actually
+        spans, clipped to the window (trips still in progress run until now).
+        Start/end times are read as two float columns and the grid is
+        computed with NumPy (see usage_heatmap.weekly_occupancy), so the cost
+        is one narrow query plus array work proportional to trip-hours.
         
-        # Get top 3 peak hours
-        sorted_hours = sorted(hour_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-        return [f"{hour:02d}:00-{hour+1:02d}:00" for hour, count in sorted_hours]
+        vehicle_hours is the total time in use per cell; average_vehicles_in_use
+        divides it by how many hours of that cell the window contains. peaks
+        lists the top_k cells by average vehicles in use. With by_location,
+        the same breakdown is returned per trip vehicle_location ("" when
+        unset).
+        """
+        rows = AnalyticsService._heatmap_rows(db, start_date, end_date, datetime.utcnow(), location, by_location)
+        return AnalyticsService._heatmap_from_rows(start_date, end_date, location, by_location, top_k, rows)
     
     @staticmethod
-    def get_booking_statistics(
+    def _heatmap_rows(
         db: Session,
         start_date: datetime,
-        end_date: datetime
+        end_date: datetime,
+        now: datetime,
+        location: Optional[str] = None,
+        by_location: bool = False,
+        started_from: Optional[datetime] = None,
+        started_before: Optional[datetime] = None
+    ) -> List[Tuple]:
+        """
+        (start hours, end hours[, vehicle_location]) of trips overlapping the
+        window, optionally only those starting in [started_from, started_before)
+        """
+        trip_end = func.coalesce(Trip.end_time, now)
+        columns = [
+            AnalyticsService._hours_since_reference(db, Trip.start_time),
+            AnalyticsService._hours_since_reference(db, trip_end)
+        ]
+        if by_location:
+            columns.append(func.coalesce(Trip.vehicle_location, ""))
+        
+        query = select(*columns).where(Trip.start_time <= end_date, trip_end > start_date)
+        if location:
+            query = query.where(Trip.vehicle_location == location)
+        if started_from is not None:
+            query = query.where(Trip.start_time >= started_from)
+        if started_before is not None:
+            query = query.where(Trip.start_time < started_before)
+        # Through the connection: plain rows without ORM result processing
+        return db.connection().execute(query).fetchall()
+    
+    @staticmethod
+    def _heatmap_from_rows(
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str],
+        by_location: bool,
+        top_k: int,
+        rows: List[Tuple]
+    ) -> Dict:
+        """get_usage_heatmap's report from _heatmap_rows"""
+        columns = list(zip(*rows)) or [(), (), ()]
+        
+        window = (hours_since_reference(start_date), hours_since_reference(end_date))
+        starts = np.clip(np.array(columns[0], dtype=np.float64), *window)
+        ends = np.clip(np.array(columns[1], dtype=np.float64), *window)
+        
+        # How many hours of each weekly cell the window contains
+        exposure = weekly_occupancy(
+            np.array([hours_since_reference(start_date)]), np.array([hours_since_reference(end_date)])
+        )[0]
+        
+        def breakdown(vehicle_hours):
+            average = np.divide(vehicle_hours, exposure, out=np.zeros_like(vehicle_hours), where=exposure > 0)
+            return {
+                "vehicle_hours": np.round(vehicle_hours, 2).tolist(),
+                "average_vehicles_in_use": np.round(average, 3).tolist(),
+                "peaks": [
+                    {
+                        "day": DAY_NAMES[day],
+                        "hour": hour,
+                        "label": f"{DAY_NAMES[day]} {hour:02d}:00-{hour+1:02d}:00",
+                        "vehicle_hours": round(float(vehicle_hours[day, hour]), 2),
+                        "average_vehicles_in_use": round(float(average[day, hour]), 3)
+                    }
+                    for day, hour in top_cells(average, top_k)
+                ]
+            }
+        
+        heatmap = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "location": location,
+            "days": DAY_NAMES,
+            "total_trips": len(rows),
+            **breakdown(weekly_occupancy(starts, ends)[0])
+        }
+        
+        if by_location:
+            codes: Dict[str, int] = {}
+            groups = np.array([codes.setdefault(name, len(codes)) for name in columns[2]], dtype=np.int64)
+            grids = weekly_occupancy(starts, ends, groups, len(codes))
+            heatmap["locations"] = {name: breakdown(grids[code]) for name, code in sorted(codes.items())}
+        
+        return heatmap
+    
+    @staticmethod
+    def get_trip_distribution(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        vehicle_id: Optional[uuid.UUID] = None,
+        location: Optional[str] = None
     ) -> Dict:
-        """Get booking statistics for a date range"""
-        total_bookings = db.query(Booking).filter(
-            Booking.created_at >= start_date,
-            Booking.created_at <= end_date
-        ).count()
-        
-        completed_bookings = db.query(Booking).filter(
-            Booking.created_at >= start_date,
-            Booking.created_at <= end_date,
-            Booking.status == BookingStatus.COMPLETED
-        ).count()
-        
-        cancelled_bookings = db.query(Booking).filter(
-            Booking.created_at >= start_date,
-            Booking.created_at <= end_date,
-            Booking.status == BookingStatus.CANCELLED
-        ).count()
+        """
+        p50/p95/p99 of trip duration and distance for completed trips that
+        start in [start_date, end_date], fleet-wide, for one vehicle or for
+        trips whose vehicle was at a location when they started.
+        
+        Estimates come from QuantileSketch bins. Whole days are merged from
+        trip_metric_sketches (SUM(count) GROUP BY bin) when rollups are
+        enabled; raw trips only fill in the partial days at either edge, or
+        the whole window otherwise. Values are within relative_accuracy of
+        the exact quantiles.
+        """
+        sketches = {metric: QuantileSketch(TRIP_SKETCH_ACCURACY) for metric in TRIP_METRICS}
+        
+        def add_raw(lower, upper, include_upper):
+            query = AnalyticsService._raw_trip_facts(
+                lower, upper, include_upper, Trip.start_time, Trip.end_time, Trip.distance_traveled
+            )
+            if vehicle_id:
+                query = query.where(Trip.vehicle_id == vehicle_id)
+            if location:
+                query = query.where(Trip.vehicle_location == location)
+            for trip_start, trip_end, distance in db.connection().execute(query):
+                for metric, value in trip_metrics(trip_start, trip_end, distance).items():
+                    sketches[metric].add(value)
+        
+        # Per-vehicle bins do not record where each trip started, so one
+        # vehicle at one location is always read from its raw trips
+        span = None if vehicle_id and location else AnalyticsService._aligned_span(
+            start_date, end_date, timedelta(days=1)
+        )
+        if span is None:
+            add_raw(start_date, end_date, True)
+        else:
+            first, last = span
+            add_raw(start_date, first, False)
+            add_raw(last, end_date, True)
+            
+            # Fleet-wide reads every location's bins; each trip is in exactly one of them
+            rolled = select(
+                TripMetricSketch.metric,
+                TripMetricSketch.bin,
+                func.sum(TripMetricSketch.count)
+            ).where(
+                TripMetricSketch.scope == ("vehicle" if vehicle_id else "location"),
+                TripMetricSketch.day >= first.date(),
+                TripMetricSketch.day < last.date()
+            ).group_by(TripMetricSketch.metric, TripMetricSketch.bin)
+            if vehicle_id:
+                rolled = rolled.where(TripMetricSketch.key == str(vehicle_id))
+            elif location:
+                rolled = rolled.where(TripMetricSketch.key == location)
+            for metric, bin, count in db.execute(rolled):
+                sketches[metric].merge_bins([(bin, count)])
+        
+        def percentiles(sketch):
+            return {
+                name: None if value is None else round(value, 2)
+                for name, value in (
+                    ("p50", sketch.quantile(0.5)),
+                    ("p95", sketch.quantile(0.95)),
+                    ("p99", sketch.quantile(0.99))
+                )
+            }
         
         return {
             "start_date": start_date,
             "end_date": end_date,
-            "total_bookings": total_bookings,
-            "completed_bookings": completed_bookings,
-            "cancelled_bookings": cancelled_bookings,
-            "completion_rate": round((completed_bookings / total_bookings * 100), 2) if total_bookings > 0 else 0
+            "vehicle_id": str(vehicle_id) if vehicle_id else None,
+            "location": location,
+            "total_trips": sketches["duration_hours"].count,
+            "relative_accuracy": TRIP_SKETCH_ACCURACY,
+            **{metric: percentiles(sketch) for metric, sketch in sketches.items()}
         }
+    
+    @staticmethod
+    def _hours_since_reference(db: Session, column):
+        """SQL expression for the float hours between usage_heatmap.REFERENCE_MONDAY and a datetime column"""
+        if db.get_bind().dialect.name == "sqlite":
+            return (func.julianday(column) - func.julianday(REFERENCE_MONDAY.isoformat(" "))) * 24
+        return (extract("epoch", column) - (REFERENCE_MONDAY - datetime(1970, 1, 1)).total_seconds()) / 3600.0
+    
+    @staticmethod
+    def _trip_seconds(db: Session):
+        """SQL expression for the duration of a completed trip in whole seconds"""
+        if db.get_bind().dialect.name == "sqlite":
+            # julianday() is a float; round so exact durations compare exactly
+            return func.round((func.julianday(Trip.end_time) - func.julianday(Trip.start_time)) * 86400)
+        return func.round(extract("epoch", Trip.end_time - Trip.start_time))
+    
+    @staticmethod
+    def _aligned_span(start_date: datetime, end_date: datetime, bucket: timedelta) -> Optional[Tuple[datetime, datetime]]:
+        """
+        Whole buckets [first, last) inside the window, or None.
+        
+        Always None unless ANALYTICS_ROLLUPS_ENABLED, which makes every
+        reader fall back to raw rows.
+        """
+        if not settings.ANALYTICS_ROLLUPS_ENABLED:
+            return None
+        
+        origin = datetime(2000, 1, 1)
+        first = origin - ((origin - start_date) // bucket) * bucket  # round up
+        last = origin + ((end_date - origin) // bucket) * bucket  # round down
+        return (first, last) if first < last else None
+    
+    @staticmethod
+    def _raw_trip_facts(lower: datetime, upper: datetime, include_upper: bool, *columns):
+        """Select columns from completed trips starting in [lower, upper) (or [lower, upper])"""
+        return select(*columns).where(
+            Trip.start_time >= lower,
+            Trip.start_time <= upper if include_upper else Trip.start_time < upper,
+            Trip.end_time.isnot(None)
+        )
+    
+    @staticmethod
+    def _vehicle_trip_facts(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        vehicle_ids: Optional[List[uuid.UUID]] = None
+    ):
+        """
+        Subquery of (vehicle_id, trip_count, distance_km, in_use_seconds) rows
+        covering completed trips that start in [start_date, end_date],
+        optionally only for the given vehicles.
+        
+        Whole days are read from vehicle_daily_usage when rollups are enabled;
+        raw trips only fill in the partial days at either edge.
+        """
+        columns = (
+            Trip.vehicle_id.label("vehicle_id"),
+            literal(1).label("trip_count"),
+            Trip.distance_traveled.label("distance_km"),
+            AnalyticsService._trip_seconds(db).label("in_use_seconds")
+        )
+        
+        def raw(lower, upper, include_upper):
+            query = AnalyticsService._raw_trip_facts(lower, upper, include_upper, *columns)
+            return query.where(Trip.vehicle_id.in_(vehicle_ids)) if vehicle_ids is not None else query
+        
+        span = AnalyticsService._aligned_span(start_date, end_date, timedelta(days=1))
+        if span is None:
+            return raw(start_date, end_date, True).subquery()
+        
+        first, last = span
+        rolled = select(
+            VehicleDailyUsage.vehicle_id,
+            VehicleDailyUsage.trip_count,
+            VehicleDailyUsage.distance_km,
+            VehicleDailyUsage.in_use_seconds
+        ).where(
+            VehicleDailyUsage.day >= first.date(),
+            VehicleDailyUsage.day < last.date()
+        )
+        if vehicle_ids is not None:
+            rolled = rolled.where(VehicleDailyUsage.vehicle_id.in_(vehicle_ids))
+        
+        return union_all(raw(start_date, first, False), rolled, raw(last, end_date, True)).subquery()
+    
+    @staticmethod
+    def _hourly_trip_facts(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        location: Optional[str] = None,
+        include_end: bool = True
+    ):
+        """
+        Subquery of (hour_of_day, trip_count, distance_km, in_use_seconds) rows
+        covering completed trips that start in [start_date, end_date] (or
+        [start_date, end_date) without include_end), optionally only for
+        trips whose vehicle was at a location when they started.
+        
+        Whole hours are read from location_hourly_usage when rollups are
+        enabled; raw trips only fill in the partial hours at either edge.
+        """
+        columns = (
+            AnalyticsService._hour_of_day(db, Trip.start_time).label("hour_of_day"),
+            literal(1).label("trip_count"),
+            Trip.distance_traveled.label("distance_km"),
+            AnalyticsService._trip_seconds(db).label("in_use_seconds")
+        )
+        
+        def raw(lower, upper, include_upper):
+            query = AnalyticsService._raw_trip_facts(lower, upper, include_upper, *columns)
+            if location:
+                query = query.where(Trip.vehicle_location == location)
+            return query
+        
+        span = AnalyticsService._aligned_span(start_date, end_date, timedelta(hours=1))
+        if span is None:
+            return raw(start_date, end_date, include_end).subquery()
+        
+        first, last = span
+        rolled = select(
+            AnalyticsService._hour_of_day(db, LocationHourlyUsage.hour),
+            LocationHourlyUsage.trip_count,
+            LocationHourlyUsage.distance_km,
+            LocationHourlyUsage.in_use_seconds
+        ).where(
+            LocationHourlyUsage.hour >= first,
+            LocationHourlyUsage.hour < last
+        )
+        if location:
+            rolled = rolled.where(LocationHourlyUsage.location == location)
+        
+        return union_all(raw(start_date, first, False), rolled, raw(last, end_date, include_end)).subquery()
+    
+    @staticmethod
+    def _hour_of_day(db: Session, column):
+        """SQL expression for the hour of day (0-23) of a datetime column"""
+        if db.get_bind().dialect.name == "sqlite":
+            return cast(func.strftime("%H", column), Integer)
+        return cast(extract("hour", column), Integer)
+    
+    @staticmethod
+    def _calculate_peak_hours(hour_counts: Dict[int, int]) -> List[str]:
+        """Calculate peak usage hours from an hour-of-day trip histogram"""
+        if not hour_counts:
+            return []
+        
+        # Get top 3 peak hours (earlier hour first on ties)
+        sorted_hours = sorted(hour_counts.items(), key=lambda x: (-x[1], x[0]))[:3]
+        return [f"{hour:02d}:00-{hour+1:02d}:00" for hour, count in sorted_hours]
+    
+    @staticmethod
+    def _time_bucket(db: Session, column, bucket: str):
+        """SQL expression for the start of the hour/day/week (Monday) containing a datetime column"""
+        if db.get_bind().dialect.name == "sqlite":
+            if bucket == "hour":
+                return func.strftime("%Y-%m-%d %H:00:00", column)
+            if bucket == "day":
+                return func.strftime("%Y-%m-%d 00:00:00", column)
+            return func.strftime("%Y-%m-%d 00:00:00", column, "weekday 0", "-6 days")
+        return func.date_trunc(bucket, column)
+    
+    @staticmethod
+    def _bucket_floor(moment: datetime, bucket: str) -> datetime:
+        """Python counterpart of _time_bucket"""
+        if bucket == "hour":
+            return moment.replace(minute=0, second=0, microsecond=0)
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday()) if bucket == "week" else day
+    
+    @staticmethod
+    def get_booking_statistics(
+        db: Session,
+        start_date: datetime,
+        end_date: datetime,
+        bucket: Optional[str] = None
+    ) -> Dict:
+        """
+        Get booking statistics for bookings created in a date range.
+        
+        Counts come from one scan with conditional aggregates. With
+        bucket="hour", "day" or "week" the same scan is grouped by bucket and
+        a "series" of per-bucket counts and completion rates is added, one
+        entry per bucket in the range (empty buckets included). Raises
+        ValueError when that would be more than MAX_SERIES_BUCKETS entries.
+        """
+        if bucket is not None:
+            if bucket not in BOOKING_STATISTICS_BUCKETS:
+                raise ValueError(f"Invalid bucket {bucket!r}, expected one of {', '.join(BOOKING_STATISTICS_BUCKETS)}")
+            buckets = (end_date - AnalyticsService._bucket_floor(start_date, bucket)) // BOOKING_STATISTICS_BUCKETS[bucket] + 1
+            if buckets > MAX_SERIES_BUCKETS:
+                raise ValueError(
+                    f"Range spans {buckets} {bucket} buckets, at most {MAX_SERIES_BUCKETS} allowed; use a wider bucket"
+                )
+        
+        def count_status(status):
+            return func.coalesce(func.sum(case((Booking.status == status, 1), else_=0)), 0)
+        
+        counts = (
+            func.count(Booking.id),
+            count_status(BookingStatus.CONFIRMED),
+            count_status(BookingStatus.CANCELLED),
+            count_status(BookingStatus.COMPLETED)
+        )
+        in_range = (Booking.created_at >= start_date, Booking.created_at <= end_date)
+        
+        if bucket is None:
+            rows = [(None,) + tuple(db.query(*counts).filter(*in_range).one())]
+        else:
+            bucket_start = AnalyticsService._time_bucket(db, Booking.created_at, bucket)
+            rows = db.query(bucket_start, *counts).filter(*in_range).group_by(bucket_start).all()
+        
+        def summary(total, confirmed, cancelled, completed):
+            return {
+                "total_bookings": total,
+                "confirmed_bookings": confirmed,
+                "completed_bookings": completed,
+                "cancelled_bookings": cancelled,
+                "completion_rate": round((completed / total * 100), 2) if total > 0 else 0
+            }
+        
+        totals = [sum(row[i] for row in rows) for i in range(1, 5)]
+        stats = {"start_date": start_date, "end_date": end_date, **summary(*totals)}
+        
+        if bucket is not None:
+            by_bucket = {
+                value if isinstance(value, datetime) else datetime.fromisoformat(value): row
+                for value, *row in rows
+            }
+            step = BOOKING_STATISTICS_BUCKETS[bucket]
+            series = []
+            moment = AnalyticsService._bucket_floor(start_date, bucket)
+            while moment <= end_date:
+                series.append({"bucket_start": moment, **summary(*by_bucket.get(moment, (0, 0, 0, 0)))})
+                moment += step
+            stats["bucket"] = bucket
+            stats["series"] = series
+        
+        return stats
@@ -0,0 +1,342 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Booking
+from app.schemas import BookingStatus
+import threading
+import uuid
+
+
+ACTIVE_STATUSES = (BookingStatus.CONFIRMED, BookingStatus.PENDING)
+
+# Keys used to stash per-transaction booking view changes in Session.info
+_PENDING_ADDS_KEY = "booking_views_pending_adds"
+_PENDING_REMOVALS_KEY = "booking_views_pending_removals"
+_PENDING_CONFIRMS_KEY = "booking_views_pending_confirms"
+
+
+def hold_expiry(status: BookingStatus, created_at: datetime) -> Optional[datetime]:
+    """When a booking stops blocking its slot: PENDING holds lapse after the TTL, others never"""
+    if status != BookingStatus.PENDING:
+        return None
+    return created_at + timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+
+
+class BookingTimeline:
+    """Booking intervals of a single vehicle, kept sorted for bisection"""
+
+    __slots__ = ("entries", "ends")
+
+    def __init__(self):
+        self.entries: List[Tuple[datetime, datetime, uuid.UUID]] = []  # sorted by (start, end, id)
+        self.ends: List[datetime] = []  # sorted end times
+
+    def add(self, booking_id: uuid.UUID, start_time: datetime, end_time: datetime):
+        insort(self.entries, (start_time, end_time, booking_id))
+        insort(self.ends, end_time)
+
+    def remove(self, booking_id: uuid.UUID, start_time: datetime, end_time: datetime):
+        entry = (start_time, end_time, booking_id)
+        i = bisect_left(self.entries, entry)
+        if i < len(self.entries) and self.entries[i] == entry:
+            del self.entries[i]
+        j = bisect_left(self.ends, end_time)
+        if j < len(self.ends) and self.ends[j] == end_time:
+            del self.ends[j]
+
+    def count_overlaps(self, start_time: datetime, end_time: datetime) -> int:
+        """
+        Count intervals overlapping [start_time, end_time) in O(log n).
+
+        Every interval that ends at or before start_time also starts before
+        end_time, so overlaps = #(start < end_time) - #(end <= start_time).
+        """
+        started_before_end = bisect_left(self.entries, (end_time,))
+        ended_before_start = bisect_right(self.ends, start_time)
+        return started_before_end - ended_before_start
+
+    def overlapping(self, start_time: datetime, end_time: datetime) -> List[Tuple[datetime, datetime, uuid.UUID]]:
+        """Return the intervals overlapping [start_time, end_time)"""
+        upper = bisect_left(self.entries, (end_time,))
+        return [entry for entry in self.entries[:upper] if entry[1] > start_time]
+
+    def __len__(self):
+        return len(self.entries)
+
+
+class BookingIntervalIndex:
+    """
+    In-memory per-vehicle index of active (CONFIRMED/PENDING) bookings.
+
+    Answers availability checks with two bisections per vehicle instead of a
+    range query. It is kept in step with transactions through
+    stage_booking_added / stage_booking_removed below: additions apply as
+    soon as a booking is flushed and are undone on rollback, removals
+    (cancel/complete) only take effect after commit.
+
+    PENDING holds are indexed with their expiry and stop counting once it
+    passes, matching BookingService._occupies_slot, even before the sweeper
+    cancels them.
+
+    The index is process-local. It is only authoritative when a single
+    process writes bookings, which is why it is opt-in (BOOKING_INDEX_ENABLED);
+    `verify` compares it against the database and can repair drift.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._timelines: Dict[uuid.UUID, BookingTimeline] = {}
+        self._bookings: Dict[uuid.UUID, Tuple[uuid.UUID, datetime, datetime]] = {}
+        self._holds: Dict[uuid.UUID, Dict[uuid.UUID, datetime]] = {}  # vehicle -> {hold booking: expiry}
+        self._ready = False
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the index has been warmed and may answer queries"""
+        return self._ready
+
+    def __len__(self):
+        return len(self._bookings)
+
+    def warm(self, db: Session) -> int:
+        """(Re)build the index from all active bookings. Returns the number indexed."""
+        rows = db.query(
+            Booking.id, Booking.vehicle_id, Booking.start_time, Booking.end_time, Booking.status, Booking.created_at
+        ).filter(Booking.status.in_(ACTIVE_STATUSES)).all()
+
+        timelines: Dict[uuid.UUID, BookingTimeline] = {}
+        bookings: Dict[uuid.UUID, Tuple[uuid.UUID, datetime, datetime]] = {}
+        holds: Dict[uuid.UUID, Dict[uuid.UUID, datetime]] = {}
+        for booking_id, vehicle_id, start_time, end_time, status, created_at in rows:
+            timelines.setdefault(vehicle_id, BookingTimeline()).add(booking_id, start_time, end_time)
+            bookings[booking_id] = (vehicle_id, start_time, end_time)
+            expires_at = hold_expiry(status, created_at)
+            if expires_at is not None:
+                holds.setdefault(vehicle_id, {})[booking_id] = expires_at
+
+        with self._lock:
+            self._timelines = timelines
+            self._bookings = bookings
+            self._holds = holds
+            self._ready = True
+
+        return len(bookings)
+
+    def reset(self):
+        """Drop all entries and stop answering queries until warmed again"""
+        with self._lock:
+            self._timelines = {}
+            self._bookings = {}
+            self._holds = {}
+            self._ready = False
+
+    def add(
+        self,
+        booking_id: uuid.UUID,
+        vehicle_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        hold_expires_at: Optional[datetime] = None
+    ):
+        """Index an active booking (no-op if it is already indexed); holds pass their expiry"""
+        with self._lock:
+            if booking_id in self._bookings:
+                return
+            self._timelines.setdefault(vehicle_id, BookingTimeline()).add(booking_id, start_time, end_time)
+            self._bookings[booking_id] = (vehicle_id, start_time, end_time)
+            if hold_expires_at is not None:
+                self._holds.setdefault(vehicle_id, {})[booking_id] = hold_expires_at
+
+    def remove(self, booking_id: uuid.UUID):
+        """Drop a booking from the index (no-op if it is not indexed)"""
+        with self._lock:
+            entry = self._bookings.pop(booking_id, None)
+            if entry is None:
+                return
+            vehicle_id, start_time, end_time = entry
+            timeline = self._timelines.get(vehicle_id)
+            if timeline is not None:
+                timeline.remove(booking_id, start_time, end_time)
+                if not timeline:
+                    del self._timelines[vehicle_id]
+            self._drop_hold(vehicle_id, booking_id)
+
+    def confirm(self, booking_id: uuid.UUID):
+        """Turn a hold into a booking that no longer expires"""
+        with self._lock:
+            entry = self._bookings.get(booking_id)
+            if entry is not None:
+                self._drop_hold(entry[0], booking_id)
+
+    def _drop_hold(self, vehicle_id: uuid.UUID, booking_id: uuid.UUID):
+        holds = self._holds.get(vehicle_id)
+        if holds is not None:
+            holds.pop(booking_id, None)
+            if not holds:
+                del self._holds[vehicle_id]
+
+    def _lapsed_holds(self, vehicle_id: uuid.UUID) -> List[uuid.UUID]:
+        """Holds of a vehicle past their expiry that the sweeper has not cancelled yet"""
+        holds = self._holds.get(vehicle_id)
+        if not holds:
+            return []
+        now = datetime.utcnow()
+        return [booking_id for booking_id, expires_at in holds.items() if expires_at <= now]
+
+    def count_overlaps(
+        self,
+        vehicle_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        exclude_booking_id: Optional[uuid.UUID] = None
+    ) -> int:
+        """Count active bookings of a vehicle that overlap the given window"""
+        with self._lock:
+            timeline = self._timelines.get(vehicle_id)
+            if timeline is None:
+                return 0
+
+            count = timeline.count_overlaps(start_time, end_time)
+
+            if exclude_booking_id is not None:
+                excluded = self._bookings.get(exclude_booking_id)
+                if excluded and excluded[0] == vehicle_id and excluded[1] < end_time and excluded[2] > start_time:
+                    count -= 1
+
+            for booking_id in self._lapsed_holds(vehicle_id):
+                if booking_id == exclude_booking_id:
+                    continue
+                _, start, end = self._bookings[booking_id]
+                if start < end_time and end > start_time:
+                    count -= 1
+
+            return count
+
+    def get_conflicting_ids(self, vehicle_id: uuid.UUID, start_time: datetime, end_time: datetime) -> List[uuid.UUID]:
+        """Get the IDs of active bookings of a vehicle that overlap the given window"""
+        with self._lock:
+            timeline = self._timelines.get(vehicle_id)
+            if timeline is None:
+                return []
+            lapsed = set(self._lapsed_holds(vehicle_id))
+            return [
+                booking_id for _, _, booking_id in timeline.overlapping(start_time, end_time)
+                if booking_id not in lapsed
+            ]
+
+    # Consistency
+
+    def verify(self, db: Session, repair: bool = False) -> Dict:
+        """
+        Compare the index against the active bookings in the database.
+
+        Reports bookings missing from the index, stale entries that are no
+        longer active, and entries whose time window or hold expiry differs.
+        With repair=True the index is rebuilt when any drift is found.
+        """
+        rows = db.query(
+            Booking.id, Booking.vehicle_id, Booking.start_time, Booking.end_time, Booking.status, Booking.created_at
+        ).filter(Booking.status.in_(ACTIVE_STATUSES)).all()
+        expected = {
+            booking_id: (vehicle_id, start, end, hold_expiry(status, created_at))
+            for booking_id, vehicle_id, start, end, status, created_at in rows
+        }
+
+        with self._lock:
+            actual = {
+                booking_id: (vehicle_id, start, end, self._holds.get(vehicle_id, {}).get(booking_id))
+                for booking_id, (vehicle_id, start, end) in self._bookings.items()
+            }
+
+        missing = [str(bid) for bid in expected.keys() - actual.keys()]
+        stale = [str(bid) for bid in actual.keys() - expected.keys()]
+        mismatched = [
+            str(bid) for bid in expected.keys() & actual.keys()
+            if expected[bid] != actual[bid]
+        ]
+        consistent = not (missing or stale or mismatched)
+
+        repaired = False
+        if repair and not consistent:
+            self.warm(db)
+            repaired = True
+
+        return {
+            "ready": self._ready,
+            "consistent": consistent,
+            "indexed_bookings": len(actual),
+            "database_bookings": len(expected),
+            "missing": missing,
+            "stale": stale,
+            "mismatched": mismatched,
+            "repaired": repaired
+        }
+
+
+booking_index = BookingIntervalIndex()
+
+
+# In-memory views of active bookings kept in step with committed transactions.
+# A view provides is_ready, add(booking_id, vehicle_id, start, end, hold_expires_at),
+# remove(booking_id) and confirm(booking_id).
+_booking_views = [booking_index]
+
+
+def register_booking_view(view):
+    """Keep another in-memory view of active bookings updated by stage_booking_*"""
+    if view not in _booking_views:
+        _booking_views.append(view)
+
+
+def stage_booking_added(db: Session, booking: Booking):
+    """
+    Add a new active booking to every ready view immediately.
+
+    Adding before commit errs on the side of "busy": a concurrent request can
+    never see the slot as free before the booking that took it has committed.
+    The addition is undone if the transaction does not commit.
+    """
+    views = [view for view in _booking_views if view.is_ready]
+    if not views:
+        return
+    expires_at = hold_expiry(booking.status, booking.created_at)
+    for view in views:
+        view.add(booking.id, booking.vehicle_id, booking.start_time, booking.end_time, expires_at)
+    db.info.setdefault(_PENDING_ADDS_KEY, []).append(booking.id)
+
+
+def stage_booking_removed(db: Session, booking_id: uuid.UUID):
+    """Remove a booking that stopped being active from every view once the transaction commits"""
+    if any(view.is_ready for view in _booking_views):
+        db.info.setdefault(_PENDING_REMOVALS_KEY, []).append(booking_id)
+
+
+def stage_hold_confirmed(db: Session, booking_id: uuid.UUID):
+    """Stop a confirmed hold from expiring in every view once the transaction commits"""
+    if any(view.is_ready for view in _booking_views):
+        db.info.setdefault(_PENDING_CONFIRMS_KEY, []).append(booking_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_view_removals(session):
+    session.info.pop(_PENDING_ADDS_KEY, None)
+    for booking_id in session.info.pop(_PENDING_CONFIRMS_KEY, []):
+        for view in _booking_views:
+            view.confirm(booking_id)
+    for booking_id in session.info.pop(_PENDING_REMOVALS_KEY, []):
+        for view in _booking_views:
+            view.remove(booking_id)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_view_changes(session, transaction):
+    if transaction.parent is None:
+        # Anything still staged here belongs to a transaction that did not commit
+        for booking_id in session.info.pop(_PENDING_ADDS_KEY, []):
+            for view in _booking_views:
+                view.remove(booking_id)
+        session.info.pop(_PENDING_REMOVALS_KEY, None)
+        session.info.pop(_PENDING_CONFIRMS_KEY, None)
@@ -0,0 +1,65 @@
+from typing import Iterable, List
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.config import settings
+import threading
+import zlib
+
+
+# Key used to remember which stripes a session holds in Session.info
+_HELD_STRIPES_KEY = "booking_lock_stripes"
+
+
+class StripedLockTable:
+    """
+    Fixed table of mutexes that vehicle IDs hash onto.
+
+    Locks are held for the rest of the session's transaction and released
+    when it ends (commit, rollback or close). Stripes are always taken in
+    ascending order, so sessions locking several vehicles cannot deadlock.
+    Plain (non-reentrant) locks are used because the transaction may end on
+    a different thread than the one that started it; the session remembers
+    which stripes it already holds instead.
+    """
+
+    def __init__(self, stripes: int = 64):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe_for(self, key) -> int:
+        """Map a key onto its stripe (stable across processes)"""
+        return zlib.crc32(str(key).encode()) % len(self._locks)
+
+    def acquire(self, db: Session, keys: Iterable, timeout: float = -1) -> bool:
+        """
+        Lock the stripes of all keys for the current transaction.
+
+        Returns False (holding nothing new) if a stripe could not be taken
+        within `timeout` seconds.
+        """
+        held: List[int] = db.info.setdefault(_HELD_STRIPES_KEY, [])
+        wanted = sorted({self.stripe_for(key) for key in keys} - set(held))
+
+        acquired = []
+        for stripe in wanted:
+            if not self._locks[stripe].acquire(timeout=timeout):
+                for taken in acquired:
+                    self._locks[taken].release()
+                return False
+            acquired.append(stripe)
+
+        held.extend(acquired)
+        return True
+
+    def release(self, db: Session):
+        """Release every stripe held by the session"""
+        for stripe in db.info.pop(_HELD_STRIPES_KEY, []):
+            self._locks[stripe].release()
+
+
+vehicle_locks = StripedLockTable(settings.BOOKING_LOCK_STRIPES)
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_vehicle_locks(session, transaction):
+    if transaction.parent is None:
+        vehicle_locks.release(session)
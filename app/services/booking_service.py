@@ -1,9 +1,21 @@
-from datetime import datetime
-from typing import List, Optional
+from datetime import datetime, timedelta
+from itertools import groupby
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, or_, select
+from app.config import settings
 from app.models import Booking, Vehicle
 from app.schemas import BookingStatus, VehicleStatus
+from app.services.booking_index import (
+    booking_index, BookingTimeline, stage_booking_added, stage_booking_removed, stage_hold_confirmed
+)
+from app.services.booking_lock import vehicle_locks
+from app.services.occupancy_calendar import occupancy_calendar
+from app.services.lock_manager import get_lock_manager, hold_lease, held_leases
+from app.services.pagination import DEFAULT_PAGE_SIZE, keyset_page
+from app.services.rollup_service import RollupService
+import random
+import time
 import uuid
 
 
@@ -12,9 +24,32 @@ class BookingConflictError(Exception):
     pass
 
 
+class BookingConcurrencyError(BookingConflictError):
+    """Raised when an optimistic write keeps losing to concurrent writers"""
+    pass
+
+
 class BookingService:
     """Service for managing bookings with concurrency-safe operations"""
     
+    # Candidate vehicle IDs fetched per round trip when searching the occupancy calendar
+    CANDIDATE_BATCH_SIZE = 500
+    
+    @staticmethod
+    def _occupies_slot():
+        """
+        Filter for bookings that block their time slot.
+        
+        CONFIRMED bookings always do; PENDING holds only until their TTL
+        runs out, so an expired hold frees the slot before the sweeper
+        gets to cancel it.
+        """
+        hold_cutoff = datetime.utcnow() - timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+        return or_(
+            Booking.status == BookingStatus.CONFIRMED,
+            and_(Booking.status == BookingStatus.PENDING, Booking.created_at > hold_cutoff)
+        )
+    
     @staticmethod
     def check_availability(
         db: Session,
@@ -25,14 +60,23 @@ class BookingService:
     ) -> bool:
         """
         Check if vehicle is available for the given time range.
-        Uses database indexes for efficient queries.
+        Uses the in-memory booking index or occupancy calendar when they are
+        warmed, otherwise database indexes for efficient queries.
         
         Time-window conflict detection: A booking conflicts if it overlaps
         with the requested time window.
         """
+        if booking_index.is_ready:
+            return booking_index.count_overlaps(vehicle_id, start_time, end_time, exclude_booking_id) == 0
+        
+        if exclude_booking_id is None:
+            is_free = occupancy_calendar.is_free(vehicle_id, start_time, end_time)
+            if is_free is not None:
+                return is_free
+        
         query = db.query(Booking).filter(
             Booking.vehicle_id == vehicle_id,
-            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PENDING]),
+            BookingService._occupies_slot(),
             # Overlap condition: booking_start < requested_end AND booking_end > requested_start
             and_(
                 Booking.start_time < end_time,
@@ -54,22 +98,170 @@ class BookingService:
         end_time: datetime
     ) -> List[Booking]:
         """Get all bookings that conflict with the given time range"""
+        if booking_index.is_ready:
+            conflicting_ids = booking_index.get_conflicting_ids(vehicle_id, start_time, end_time)
+            if not conflicting_ids:
+                return []
+            return db.query(Booking).filter(Booking.id.in_(conflicting_ids)).all()
+        
         return db.query(Booking).filter(
             Booking.vehicle_id == vehicle_id,
-            Booking.status.in_([BookingStatus.CONFIRMED, BookingStatus.PENDING]),
+            BookingService._occupies_slot(),
             and_(
                 Booking.start_time < end_time,
                 Booking.end_time > start_time
             )
         ).all()
     
+    @staticmethod
+    def find_available_vehicles(
+        db: Session,
+        start_time: datetime,
+        end_time: datetime,
+        location: Optional[str] = None,
+        limit: int = 50
+    ) -> List[Vehicle]:
+        """
+        Find available vehicles with no active booking overlapping the window.
+        
+        Runs as a single anti-join (NOT EXISTS) so the whole fleet is checked
+        in one query instead of one availability check per vehicle. The
+        correlated subquery is served by idx_booking_vehicle_time.
+        
+        When the occupancy calendar covers the window, candidate IDs are
+        streamed from one index-only query (CANDIDATE_BATCH_SIZE rows at a
+        time) and filtered against the calendar, which stops reading once
+        `limit` free vehicles are found.
+        """
+        if occupancy_calendar.covers(start_time, end_time):
+            candidates = select(Vehicle.id).where(
+                Vehicle.is_active == True,
+                Vehicle.status == VehicleStatus.AVAILABLE
+            )
+            if location:
+                candidates = candidates.where(Vehicle.location == location)
+            candidate_ids = db.execute(
+                candidates.order_by(Vehicle.created_at.desc())
+                .execution_options(yield_per=BookingService.CANDIDATE_BATCH_SIZE)
+            ).scalars()
+            try:
+                free_ids = occupancy_calendar.free_vehicles(candidate_ids, start_time, end_time, limit)
+            finally:
+                candidate_ids.close()
+            if free_ids is not None:
+                if not free_ids:
+                    return []
+                vehicles = {v.id: v for v in db.query(Vehicle).filter(Vehicle.id.in_(free_ids))}
+                return [vehicles[vid] for vid in free_ids if vid in vehicles]
+        
+        conflict_exists = db.query(Booking.id).filter(
+            Booking.vehicle_id == Vehicle.id,
+            BookingService._occupies_slot(),
+            and_(
+                Booking.start_time < end_time,
+                Booking.end_time > start_time
+            )
+        ).exists()
+        
+        query = db.query(Vehicle).filter(
+            Vehicle.is_active == True,
+            Vehicle.status == VehicleStatus.AVAILABLE,
+            ~conflict_exists
+        )
+        
+        if location:
+            query = query.filter(Vehicle.location == location)
+        
+        return query.order_by(Vehicle.created_at.desc()).limit(limit).all()
+    
+    @staticmethod
+    def find_free_slots(
+        db: Session,
+        duration: timedelta,
+        horizon_start: datetime,
+        horizon_end: datetime,
+        vehicle_id: Optional[uuid.UUID] = None,
+        location: Optional[str] = None,
+        limit: int = 5
+    ) -> List[Dict]:
+        """
+        Find the earliest free windows of at least `duration` within the horizon.
+        
+        Either a single vehicle or every available vehicle at a location is
+        searched; inactive or unavailable vehicles have no free slots.
+        Active bookings are read in one query ordered by (vehicle,
+        start_time) and the gaps between them are collected in a single
+        pass, instead of probing shifted windows one at a time.
+        """
+        query = db.query(Vehicle.id, Booking.start_time, Booking.end_time).outerjoin(
+            Booking,
+            and_(
+                Booking.vehicle_id == Vehicle.id,
+                BookingService._occupies_slot(),
+                Booking.start_time < horizon_end,
+                Booking.end_time > horizon_start
+            )
+        )
+        
+        # Only vehicles that can be booked have free slots, as in find_available_vehicles
+        query = query.filter(
+            Vehicle.is_active == True,
+            Vehicle.status == VehicleStatus.AVAILABLE
+        )
+        if vehicle_id:
+            query = query.filter(Vehicle.id == vehicle_id)
+        elif location:
+            query = query.filter(Vehicle.location == location)
+        
+        rows = query.order_by(Vehicle.id, Booking.start_time).all()
+        
+        slots = []
+        for vid, vehicle_rows in groupby(rows, key=lambda row: row[0]):
+            intervals = [(start, end) for _, start, end in vehicle_rows if start is not None]
+            for gap_start, gap_end in BookingService._free_gaps(
+                intervals, duration, horizon_start, horizon_end, limit
+            ):
+                slots.append({
+                    "vehicle_id": vid,
+                    "start_time": gap_start,
+                    "end_time": gap_end
+                })
+        
+        slots.sort(key=lambda slot: (slot["start_time"], str(slot["vehicle_id"])))
+        return slots[:limit]
+    
+    @staticmethod
+    def _free_gaps(
+        intervals: List[Tuple[datetime, datetime]],
+        duration: timedelta,
+        horizon_start: datetime,
+        horizon_end: datetime,
+        limit: int
+    ) -> List[Tuple[datetime, datetime]]:
+        """Collect gaps of at least `duration` between intervals sorted by start time"""
+        gaps = []
+        cursor = horizon_start
+        for start, end in intervals:
+            if start - cursor >= duration:
+                gaps.append((cursor, start))
+                if len(gaps) >= limit:
+                    return gaps
+            cursor = max(cursor, end)
+        
+        if horizon_end - cursor >= duration:
+            gaps.append((cursor, horizon_end))
+        
+        return gaps
+    
     @staticmethod
     def create_booking(
         db: Session,
         user_id: uuid.UUID,
         vehicle_id: uuid.UUID,
         start_time: datetime,
-        end_time: datetime
+        end_time: datetime,
+        optimistic: Optional[bool] = None,
+        status: BookingStatus = BookingStatus.CONFIRMED
     ) -> Booking:
         """
         Create a booking with concurrency-safe checks.
@@ -77,11 +269,26 @@ class BookingService:
         Strategy:
         1. Verify vehicle exists and is available
         2. Check availability using transaction-safe query
-        3. Create booking in confirmed state
+        3. Create booking in confirmed state (or PENDING for a hold)
         4. Commit transaction atomically
+        
+        When a lock manager is configured (LOCK_BACKEND), a per-vehicle lease
+        is taken first and held until the transaction ends.
+        
+        With optimistic=True (default: BOOKING_CONCURRENCY_MODE) the vehicle
+        row is not locked up front; see _create_booking_optimistic.
         """
+        if optimistic is None:
+            optimistic = settings.BOOKING_CONCURRENCY_MODE == "optimistic"
+        
+        # Resolve contention between workers before touching the vehicle rows
+        BookingService.acquire_vehicle_leases(db, [vehicle_id])
+        
+        if optimistic:
+            return BookingService._create_booking_optimistic(db, user_id, vehicle_id, start_time, end_time, status)
+        
         # Verify vehicle exists and is available
-        vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).with_for_update().first()
+        vehicle = BookingService._lock_vehicles(db, [vehicle_id]).get(vehicle_id)
         if not vehicle:
             raise ValueError(f"Vehicle {vehicle_id} not found")
         
@@ -102,16 +309,436 @@ class BookingService:
             vehicle_id=vehicle_id,
             start_time=start_time,
             end_time=end_time,
-            status=BookingStatus.CONFIRMED
+            status=status
         )
         
+        BookingService._fence_vehicle_writes(db, [vehicle_id])
         db.add(booking)
         db.flush()  # Flush to get the ID without committing
+        stage_booking_added(db, booking)
+        RollupService.record_bookings_created(db, [booking])
+        
+        return booking
+    
+    @staticmethod
+    def acquire_vehicle_leases(db: Session, vehicle_ids: List[uuid.UUID]):
+        """
+        Take lock-manager leases on vehicles, in ID order, for the transaction.
+        
+        No-op when no lock manager is configured. Leases the session already
+        holds are reused; if any lease cannot be taken in time the ones taken
+        by this call are released and BookingConcurrencyError is raised.
+        """
+        manager = get_lock_manager()
+        if manager is None:
+            return
+        
+        held = {lease.key for lease in held_leases(db)}
+        acquired = []
+        for vehicle_id in sorted(set(vehicle_ids)):
+            key = f"vehicle:{vehicle_id}"
+            if key in held:
+                continue
+            
+            lease = manager.acquire(key, settings.LOCK_TTL_SECONDS, settings.LOCK_WAIT_TIMEOUT_SECONDS)
+            if lease is None:
+                for taken in acquired:
+                    manager.release(taken)
+                raise BookingConcurrencyError(f"Vehicle {vehicle_id} is being booked concurrently, please retry")
+            acquired.append(lease)
+        
+        for lease in acquired:
+            hold_lease(db, manager, lease)
+    
+    @staticmethod
+    def _fence_vehicle_writes(db: Session, vehicle_ids: Iterable[uuid.UUID]):
+        """
+        Record the session's lease tokens on the vehicles it is about to book.
+        
+        Each vehicle row keeps the fencing token of the newest lease that
+        wrote to it, and the update only applies while this lease's token is
+        at least that large. A holder whose lease expired and was taken over
+        by a writer with a newer token therefore matches no row and is
+        refused, in the same transaction as its booking insert. No-op
+        without a lock manager.
+        
+        A refused lease that is still the current holder means the lock
+        manager's counter fell behind the database (backend switched, Redis
+        counter lost); the manager is advanced past the stored token so the
+        retry is accepted.
+        """
+        leases = {lease.key: lease for lease in held_leases(db)}
+        vehicles = Vehicle.__table__
+        for vehicle_id in sorted(set(vehicle_ids)):
+            lease = leases.get(f"vehicle:{vehicle_id}")
+            if lease is None:
+                continue
+            
+            fenced = db.execute(
+                vehicles.update()
+                .where(
+                    vehicles.c.id == vehicle_id,
+                    or_(vehicles.c.lease_token.is_(None), vehicles.c.lease_token <= lease.token)
+                )
+                # Keep updated_at: it is the optimistic-mode version token
+                .values(lease_token=lease.token, updated_at=vehicles.c.updated_at)
+            ).rowcount
+            if not fenced:
+                manager = get_lock_manager()
+                if manager is not None and manager.is_held(lease):
+                    stored = db.execute(select(vehicles.c.lease_token).where(vehicles.c.id == vehicle_id)).scalar()
+                    if stored is not None:
+                        manager.advance_tokens(stored)
+                raise BookingConcurrencyError("Vehicle lock expired before the booking was written, please retry")
+    
+    @staticmethod
+    def _lock_vehicles(db: Session, vehicle_ids: List[uuid.UUID]) -> Dict[uuid.UUID, Vehicle]:
+        """
+        Lock vehicles for the rest of the transaction and load them.
+        
+        PostgreSQL: one SELECT FOR UPDATE ordered by vehicle ID.
+        SQLite ignores FOR UPDATE, so instead:
+        1. Take the in-process striped locks of the vehicles, which queues
+           requests for the same vehicle without busy-waiting on SQLite
+        2. Issue a write to the vehicle rows, which starts the write
+           transaction and takes SQLite's database write lock, giving
+           BEGIN IMMEDIATE semantics across processes
+        Both are held until commit/rollback, so the availability check and
+        the insert that follow cannot interleave with another booking.
+        """
+        vehicle_ids = sorted(set(vehicle_ids))
+        query = db.query(Vehicle).filter(Vehicle.id.in_(vehicle_ids)).order_by(Vehicle.id)
+        
+        if db.get_bind().dialect.name != "sqlite":
+            return {vehicle.id: vehicle for vehicle in query.with_for_update().all()}
+        
+        db.connection()  # begin the session transaction so the stripes are released with it
+        if not vehicle_locks.acquire(db, vehicle_ids, timeout=settings.BOOKING_LOCK_TIMEOUT_SECONDS):
+            raise BookingConcurrencyError("Timed out waiting for the vehicle lock, please retry")
+        
+        db.execute(
+            Vehicle.__table__.update()
+            .where(Vehicle.__table__.c.id.in_(vehicle_ids))
+            .values(updated_at=datetime.utcnow())
+        )
+        
+        return {vehicle.id: vehicle for vehicle in query.populate_existing().all()}
+    
+    @staticmethod
+    def _create_booking_optimistic(
+        db: Session,
+        user_id: uuid.UUID,
+        vehicle_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        status: BookingStatus = BookingStatus.CONFIRMED
+    ) -> Booking:
+        """
+        Create a booking without holding a vehicle row lock while checking.
+        
+        Each attempt runs in a savepoint: read the vehicle and its version
+        token (updated_at), check availability, insert the booking, then
+        compare-and-swap the token. Any concurrent booking of the same vehicle
+        swaps the token first, so a lost race rolls the attempt back and
+        retries with bounded exponential backoff; the retry then sees the
+        winner's booking and fails with a normal conflict.
+        """
+        max_attempts = settings.OPTIMISTIC_BOOKING_MAX_RETRIES + 1
+        
+        for attempt in range(max_attempts):
+            savepoint = db.begin_nested()
+            try:
+                vehicle = db.query(Vehicle).filter(Vehicle.id == vehicle_id).first()
+                if not vehicle:
+                    raise ValueError(f"Vehicle {vehicle_id} not found")
+                
+                if vehicle.status != VehicleStatus.AVAILABLE:
+                    raise ValueError(f"Vehicle is not available (status: {vehicle.status})")
+                
+                seen_version = vehicle.updated_at
+                
+                if not BookingService.check_availability(db, vehicle_id, start_time, end_time):
+                    conflicting = BookingService.get_conflicting_bookings(db, vehicle_id, start_time, end_time)
+                    raise BookingConflictError(
+                        f"Vehicle has {len(conflicting)} conflicting booking(s) in the requested time window"
+                    )
+                
+                booking = Booking(
+                    id=uuid.uuid4(),
+                    user_id=user_id,
+                    vehicle_id=vehicle_id,
+                    start_time=start_time,
+                    end_time=end_time,
+                    status=status
+                )
+                BookingService._fence_vehicle_writes(db, [vehicle_id])
+                db.add(booking)
+                db.flush()
+                
+                swapped = db.query(Vehicle).filter(
+                    Vehicle.id == vehicle_id,
+                    Vehicle.updated_at == seen_version
+                ).update({Vehicle.updated_at: datetime.utcnow()}, synchronize_session=False)
+            except Exception:
+                savepoint.rollback()
+                raise
+            
+            if swapped:
+                savepoint.commit()
+                db.expire(vehicle, ["updated_at"])
+                stage_booking_added(db, booking)
+                RollupService.record_bookings_created(db, [booking])
+                return booking
+            
+            savepoint.rollback()
+            db.expire_all()
+            if attempt + 1 < max_attempts:
+                BookingService._backoff(attempt)
         
+        raise BookingConcurrencyError(
+            f"Vehicle {vehicle_id} is being booked concurrently, please retry"
+        )
+    
+    @staticmethod
+    def _backoff(attempt: int):
+        """Sleep with capped exponential backoff and jitter before a retry"""
+        delay = min(
+            settings.OPTIMISTIC_BOOKING_BACKOFF_MAX_SECONDS,
+            settings.OPTIMISTIC_BOOKING_BACKOFF_SECONDS * (2 ** attempt)
+        )
+        time.sleep(delay * random.uniform(0.5, 1.0))
+    
+    @staticmethod
+    def _compare_and_set_status(db: Session, booking: Booking, new_status: BookingStatus) -> Booking:
+        """
+        Change a booking's status only if nobody else changed it since it was read.
+        
+        Guards the UPDATE with the booking's version column and bumps it.
+        """
+        now = datetime.utcnow()
+        updated = db.query(Booking).filter(
+            Booking.id == booking.id,
+            Booking.version == booking.version
+        ).update(
+            {Booking.status: new_status, Booking.version: now, Booking.updated_at: now},
+            synchronize_session=False
+        )
+        
+        if not updated:
+            db.expire(booking)
+            raise BookingConcurrencyError(f"Booking {booking.id} was modified concurrently")
+        
+        db.expire(booking, ["status", "version", "updated_at"])
         return booking
     
     @staticmethod
-    def cancel_booking(db: Session, booking_id: uuid.UUID) -> Booking:
+    def create_bookings_bulk(
+        db: Session,
+        user_id: uuid.UUID,
+        items: List[Tuple[uuid.UUID, datetime, datetime]]
+    ) -> List[Dict]:
+        """
+        Create many bookings in one transaction.
+        
+        Strategy:
+        1. Lock every referenced vehicle (leases, then a single SELECT FOR
+           UPDATE), ordered by vehicle ID so concurrent batches never deadlock
+        2. Load the active bookings of those vehicles in one query
+        3. Check each item, in (vehicle, start) order, against the database
+           bookings and the items already accepted from this batch
+        4. Insert the accepted bookings with a single flush
+        
+        Returns one result per item, in input order, with status
+        "created", "conflict" or "invalid". The caller commits.
+        """
+        results: List[Optional[Dict]] = [None] * len(items)
+        
+        now = datetime.utcnow()
+        valid = []
+        for position, (vehicle_id, start_time, end_time) in enumerate(items):
+            if start_time >= end_time:
+                results[position] = {"index": position, "status": "invalid", "booking": None,
+                                     "detail": "Start time must be before end time"}
+            elif start_time <= now:
+                results[position] = {"index": position, "status": "invalid", "booking": None,
+                                     "detail": "Booking start time must be in the future"}
+            else:
+                valid.append((vehicle_id, start_time, end_time, position))
+        
+        if not valid:
+            return results
+        
+        vehicle_ids = sorted({item[0] for item in valid})
+        BookingService.acquire_vehicle_leases(db, vehicle_ids)
+        vehicles = BookingService._lock_vehicles(db, vehicle_ids)
+        
+        window_start = min(item[1] for item in valid)
+        window_end = max(item[2] for item in valid)
+        existing = db.query(
+            Booking.id, Booking.vehicle_id, Booking.start_time, Booking.end_time
+        ).filter(
+            Booking.vehicle_id.in_(vehicle_ids),
+            BookingService._occupies_slot(),
+            and_(
+                Booking.start_time < window_end,
+                Booking.end_time > window_start
+            )
+        ).all()
+        
+        timelines: Dict[uuid.UUID, BookingTimeline] = {}
+        for booking_id, vehicle_id, start_time, end_time in existing:
+            timelines.setdefault(vehicle_id, BookingTimeline()).add(booking_id, start_time, end_time)
+        
+        created = []
+        for vehicle_id, start_time, end_time, position in sorted(valid, key=lambda item: item[:3]):
+            vehicle = vehicles.get(vehicle_id)
+            if not vehicle:
+                results[position] = {"index": position, "status": "invalid", "booking": None,
+                                     "detail": f"Vehicle {vehicle_id} not found"}
+                continue
+            
+            if vehicle.status != VehicleStatus.AVAILABLE:
+                results[position] = {"index": position, "status": "invalid", "booking": None,
+                                     "detail": f"Vehicle is not available (status: {vehicle.status})"}
+                continue
+            
+            timeline = timelines.setdefault(vehicle_id, BookingTimeline())
+            conflicts = timeline.count_overlaps(start_time, end_time)
+            if conflicts:
+                results[position] = {"index": position, "status": "conflict", "booking": None,
+                                     "detail": f"Vehicle has {conflicts} conflicting booking(s) in the requested time window"}
+                continue
+            
+            booking = Booking(
+                id=uuid.uuid4(),
+                user_id=user_id,
+                vehicle_id=vehicle_id,
+                start_time=start_time,
+                end_time=end_time,
+                status=BookingStatus.CONFIRMED
+            )
+            timeline.add(booking.id, start_time, end_time)
+            created.append(booking)
+            results[position] = {"index": position, "status": "created", "booking": booking, "detail": None}
+        
+        if created:
+            BookingService._fence_vehicle_writes(db, {booking.vehicle_id for booking in created})
+            db.add_all(created)
+            db.flush()
+            for booking in created:
+                stage_booking_added(db, booking)
+            RollupService.record_bookings_created(db, created)
+        
+        return results
+    
+    @staticmethod
+    def hold_expires_at(booking: Booking) -> datetime:
+        """When a PENDING hold lapses (holds live BOOKING_HOLD_TTL_SECONDS from creation)"""
+        return booking.created_at + timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+    
+    @staticmethod
+    def create_hold(
+        db: Session,
+        user_id: uuid.UUID,
+        vehicle_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime
+    ) -> Booking:
+        """
+        Reserve a slot with a short-lived PENDING booking during checkout.
+        
+        The hold blocks the slot like a confirmed booking, but the caller
+        commits right away, so no vehicle lock or connection is kept while
+        the client completes payment. confirm_hold turns it into a booking;
+        expire_stale_holds releases it once BOOKING_HOLD_TTL_SECONDS pass.
+        """
+        return BookingService.create_booking(
+            db, user_id, vehicle_id, start_time, end_time, status=BookingStatus.PENDING
+        )
+    
+    @staticmethod
+    def confirm_hold(db: Session, booking_id: uuid.UUID) -> Booking:
+        """
+        Confirm a PENDING hold that has not expired.
+        
+        A single conditional UPDATE flips the status, so a confirmation
+        racing the sweeper (or another confirmation) cannot both win.
+        """
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+        
+        confirmed = db.query(Booking).filter(
+            Booking.id == booking_id,
+            Booking.status == BookingStatus.PENDING,
+            Booking.created_at > cutoff
+        ).update(
+            {Booking.status: BookingStatus.CONFIRMED, Booking.version: now, Booking.updated_at: now},
+            synchronize_session=False
+        )
+        
+        booking = db.query(Booking).filter(Booking.id == booking_id).populate_existing().first()
+        if not booking:
+            raise ValueError(f"Booking {booking_id} not found")
+        
+        if not confirmed:
+            if booking.status == BookingStatus.PENDING:
+                raise ValueError("Booking hold has expired")
+            raise ValueError(f"Cannot confirm booking with status {booking.status}")
+        
+        stage_hold_confirmed(db, booking.id)
+        RollupService.record_status_change(db, [booking], BookingStatus.PENDING, BookingStatus.CONFIRMED)
+        return booking
+    
+    @staticmethod
+    def expire_stale_holds(db: Session, batch_size: int = 500) -> int:
+        """
+        Cancel PENDING holds older than the hold TTL, in committed batches.
+        
+        Each batch selects up to batch_size expired hold IDs and cancels them
+        with one UPDATE, keeping every transaction short. Returns the number
+        of holds expired.
+        """
+        expired = 0
+        while True:
+            now = datetime.utcnow()
+            cutoff = now - timedelta(seconds=settings.BOOKING_HOLD_TTL_SECONDS)
+            
+            holds = db.query(Booking.id, Booking.vehicle_id, Booking.vehicle_location, Booking.created_at).filter(
+                Booking.status == BookingStatus.PENDING,
+                Booking.created_at <= cutoff
+            ).limit(batch_size).all()
+            if not holds:
+                break
+            
+            hold_ids = [hold.id for hold in holds]
+            count = db.query(Booking).filter(
+                Booking.id.in_(hold_ids),
+                Booking.status == BookingStatus.PENDING,
+                Booking.created_at <= cutoff
+            ).update(
+                {Booking.status: BookingStatus.CANCELLED, Booking.version: now, Booking.updated_at: now},
+                synchronize_session=False
+            )
+            if count < len(holds):
+                # Some holds changed concurrently; only the rows this UPDATE stamped were expired
+                swept = {booking_id for (booking_id,) in db.query(Booking.id).filter(
+                    Booking.id.in_(hold_ids),
+                    Booking.version == now
+                )}
+                holds = [hold for hold in holds if hold.id in swept]
+            for hold in holds:
+                stage_booking_removed(db, hold.id)
+            RollupService.record_status_change(db, holds, BookingStatus.PENDING, BookingStatus.CANCELLED)
+            db.commit()
+            
+            expired += count
+            if len(hold_ids) < batch_size:
+                break
+        
+        return expired
+    
+    @staticmethod
+    def cancel_booking(db: Session, booking_id: uuid.UUID, optimistic: Optional[bool] = None) -> Booking:
         """Cancel an existing booking"""
         booking = db.query(Booking).filter(Booking.id == booking_id).first()
         if not booking:
@@ -123,11 +750,20 @@ class BookingService:
         if booking.status == BookingStatus.CANCELLED:
             raise ValueError("Booking is already cancelled")
         
-        booking.status = BookingStatus.CANCELLED
+        if optimistic is None:
+            optimistic = settings.BOOKING_CONCURRENCY_MODE == "optimistic"
+        
+        previous_status = booking.status
+        if optimistic:
+            BookingService._compare_and_set_status(db, booking, BookingStatus.CANCELLED)
+        else:
+            booking.status = BookingStatus.CANCELLED
+        stage_booking_removed(db, booking.id)
+        RollupService.record_status_change(db, [booking], previous_status, BookingStatus.CANCELLED)
         return booking
     
     @staticmethod
-    def complete_booking(db: Session, booking_id: uuid.UUID) -> Booking:
+    def complete_booking(db: Session, booking_id: uuid.UUID, optimistic: Optional[bool] = None) -> Booking:
         """Mark a booking as completed"""
         booking = db.query(Booking).filter(Booking.id == booking_id).first()
         if not booking:
@@ -136,33 +772,62 @@ class BookingService:
         if booking.status != BookingStatus.CONFIRMED:
             raise ValueError(f"Cannot complete booking with status {booking.status}")
         
-        booking.status = BookingStatus.COMPLETED
+        if optimistic is None:
+            optimistic = settings.BOOKING_CONCURRENCY_MODE == "optimistic"
+        
+        if optimistic:
+            BookingService._compare_and_set_status(db, booking, BookingStatus.COMPLETED)
+        else:
+            booking.status = BookingStatus.COMPLETED
+        stage_booking_removed(db, booking.id)
+        RollupService.record_status_change(db, [booking], BookingStatus.CONFIRMED, BookingStatus.COMPLETED)
         return booking
     
+    @staticmethod
+    def get_bookings(
+        db: Session,
+        status: Optional[BookingStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Booking], Optional[str]]:
+        """One page of all bookings, latest start first, optionally filtered by status"""
+        return BookingService._booking_page(BookingService._list_query(db, columns), status, cursor, limit)
+    
     @staticmethod
     def get_user_bookings(
         db: Session,
         user_id: uuid.UUID,
-        status: Optional[BookingStatus] = None
-    ) -> List[Booking]:
-        """Get all bookings for a user, optionally filtered by status"""
-        query = db.query(Booking).filter(Booking.user_id == user_id)
-        
-        if status:
-            query = query.filter(Booking.status == status)
-        
-        return query.order_by(Booking.start_time.desc()).all()
+        status: Optional[BookingStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Booking], Optional[str]]:
+        """One page of a user's bookings, optionally filtered by status"""
+        query = BookingService._list_query(db, columns).filter(Booking.user_id == user_id)
+        return BookingService._booking_page(query, status, cursor, limit)
     
     @staticmethod
     def get_vehicle_bookings(
         db: Session,
         vehicle_id: uuid.UUID,
-        status: Optional[BookingStatus] = None
-    ) -> List[Booking]:
-        """Get all bookings for a vehicle, optionally filtered by status"""
-        query = db.query(Booking).filter(Booking.vehicle_id == vehicle_id)
-        
+        status: Optional[BookingStatus] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Booking], Optional[str]]:
+        """One page of a vehicle's bookings, optionally filtered by status"""
+        query = BookingService._list_query(db, columns).filter(Booking.vehicle_id == vehicle_id)
+        return BookingService._booking_page(query, status, cursor, limit)
+    
+    @staticmethod
+    def _list_query(db: Session, columns: Optional[Sequence]):
+        """Bookings as ORM objects, or as plain rows of just the given columns"""
+        return db.query(*columns) if columns else db.query(Booking)
+    
+    @staticmethod
+    def _booking_page(query, status: Optional[BookingStatus], cursor: Optional[str], limit: int):
+        """Keyset page on (start_time DESC, id DESC); returns (bookings, next_cursor)"""
         if status:
             query = query.filter(Booking.status == status)
-        
-        return query.order_by(Booking.start_time.desc()).all()
+        return keyset_page(query, [(Booking.start_time, True), (Booking.id, True)], cursor, limit)
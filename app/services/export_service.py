@@ -0,0 +1,138 @@
+from datetime import datetime
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models import Trip, Booking
+from app.schemas import BookingStatus
+from app.services.projections import plain_value
+import csv
+import io
+import json
+import uuid
+
+
+TRIP_EXPORT_COLUMNS = (
+    Trip.id, Trip.booking_id, Trip.vehicle_id, Trip.user_id,
+    Trip.start_time, Trip.end_time, Trip.start_location, Trip.end_location,
+    Trip.distance_traveled, Trip.mileage_start, Trip.mileage_end
+)
+
+BOOKING_EXPORT_COLUMNS = (
+    Booking.id, Booking.user_id, Booking.vehicle_id,
+    Booking.start_time, Booking.end_time, Booking.status, Booking.created_at
+)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+class ExportService:
+    """
+    Streams trips and bookings as NDJSON or CSV.
+
+    Rows are selected as plain column tuples (no ORM instances or Pydantic
+    models) on a dedicated connection with stream_results, so PostgreSQL
+    uses a server-side cursor and only yield_per rows are held in memory at
+    a time. The connection is opened when iteration starts and closed when
+    it ends, independently of the request's session, so a StreamingResponse
+    can keep reading after the endpoint has returned.
+    """
+
+    BATCH_SIZE = 1000
+
+    @staticmethod
+    def trip_rows(
+        db: Session,
+        vehicle_id: Optional[uuid.UUID] = None,
+        user_id: Optional[uuid.UUID] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        completed_only: bool = False
+    ) -> Iterator[Tuple]:
+        """Trips filtered like TripService.get_*_trips, oldest start first"""
+        query = select(*TRIP_EXPORT_COLUMNS)
+        if vehicle_id:
+            query = query.where(Trip.vehicle_id == vehicle_id)
+        if user_id:
+            query = query.where(Trip.user_id == user_id)
+        if start_date:
+            query = query.where(Trip.start_time >= start_date)
+        if end_date:
+            query = query.where(Trip.start_time <= end_date)
+        if completed_only:
+            query = query.where(Trip.end_time.isnot(None))
+
+        return ExportService._stream(db, query.order_by(Trip.start_time, Trip.id))
+
+    @staticmethod
+    def booking_rows(
+        db: Session,
+        user_id: Optional[uuid.UUID] = None,
+        status: Optional[BookingStatus] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Iterator[Tuple]:
+        """Bookings filtered like list_bookings, by start time, oldest first"""
+        query = select(*BOOKING_EXPORT_COLUMNS)
+        if user_id:
+            query = query.where(Booking.user_id == user_id)
+        if status:
+            query = query.where(Booking.status == status)
+        if start_date:
+            query = query.where(Booking.start_time >= start_date)
+        if end_date:
+            query = query.where(Booking.start_time <= end_date)
+
+        return ExportService._stream(db, query.order_by(Booking.start_time, Booking.id))
+
+    @staticmethod
+    def _stream(db: Session, query) -> Iterator[Tuple]:
+        with db.get_bind().connect() as connection:
+            result = connection.execution_options(
+                stream_results=True, yield_per=ExportService.BATCH_SIZE
+            ).execute(query)
+            for partition in result.partitions():
+                for row in partition:
+                    yield tuple(row)
+
+    @staticmethod
+    def column_names(columns: Sequence) -> List[str]:
+        return [column.key for column in columns]
+
+    @staticmethod
+    def encode(rows: Iterable[Tuple], names: List[str], fmt: str) -> Iterator[bytes]:
+        """
+        Encode rows as NDJSON or CSV (with a header).
+
+        The first row is sent on its own so the client gets bytes as soon as
+        the cursor returns; after that rows are sent in chunks of BATCH_SIZE.
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format {fmt!r}")
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n") if fmt == "csv" else None
+        if writer:
+            writer.writerow(names)
+
+        pending, flush_at = 0, 1
+        for row in rows:
+            values = [plain_value(value) for value in row]
+            if writer:
+                writer.writerow(["" if value is None else value for value in values])
+            else:
+                buffer.write(json.dumps(dict(zip(names, values)), separators=(",", ":")))
+                buffer.write("\n")
+
+            pending += 1
+            if pending >= flush_at:
+                yield buffer.getvalue().encode()
+                buffer.seek(0)
+                buffer.truncate()
+                pending, flush_at = 0, ExportService.BATCH_SIZE
+
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
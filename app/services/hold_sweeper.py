@@ -0,0 +1,50 @@
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from app.services.booking_service import BookingService
+import threading
+
+
+class HoldSweeper:
+    """Background thread that periodically expires stale PENDING booking holds"""
+
+    def __init__(self, session_factory: Callable[[], Session], interval_seconds: float = 30, batch_size: int = 500):
+        self._session_factory = session_factory
+        self._interval = interval_seconds
+        self._batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Expire all stale holds now. Returns the number expired."""
+        db = self._session_factory()
+        try:
+            return BookingService.expire_stale_holds(db, self._batch_size)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        """Start sweeping in a daemon thread (no-op if already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="booking-hold-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the sweeper thread to exit and wait for it"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                expired = self.run_once()
+                if expired:
+                    print(f"✅ Expired {expired} stale booking hold(s)")
+            except Exception as e:
+                print(f"⚠️  Booking hold sweep failed: {e}")
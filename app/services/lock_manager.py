@@ -0,0 +1,242 @@
+from abc import ABC, abstractmethod
+from typing import List, Optional
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+from app.config import settings
+import random
+import threading
+import time
+import uuid
+
+
+# Key used to remember the leases a session holds in Session.info
+_HELD_LEASES_KEY = "lock_manager_leases"
+
+
+class Lease:
+    """A time-limited lock on a key with a monotonically increasing fencing token"""
+
+    __slots__ = ("key", "owner", "token", "expires_at")
+
+    def __init__(self, key: str, owner: str, token: int, expires_at: float):
+        self.key = key
+        self.owner = owner
+        self.token = token
+        self.expires_at = expires_at  # time.monotonic() deadline as seen by this process
+
+    def __repr__(self):
+        return f"<Lease(key={self.key}, token={self.token})>"
+
+
+class LockManager(ABC):
+    """
+    Base class for lease-based lock backends.
+
+    A lease expires after its TTL even if never released, so a crashed
+    holder cannot block a key forever. Every successful acquire returns a
+    larger fencing token than any earlier lease on the same key; the
+    resource stores the token of the last write it accepted and rejects
+    writes carrying a smaller one, so a holder whose lease expired cannot
+    write after its successor has (see BookingService._fence_vehicle_writes).
+
+    Tokens share one scale across backends: a new manager is advanced past
+    the largest token stored on any vehicle (see get_lock_manager), so
+    switching backends or losing the Redis counter never issues tokens the
+    database would refuse.
+    """
+
+    @abstractmethod
+    def acquire(self, key: str, ttl: float, timeout: float = 0) -> Optional[Lease]:
+        """Acquire a lease on key, waiting up to timeout seconds. Returns None on timeout."""
+
+    @abstractmethod
+    def release(self, lease: Lease) -> bool:
+        """Release a lease. Returns False if it had already expired or been taken over."""
+
+    @abstractmethod
+    def is_held(self, lease: Lease) -> bool:
+        """Check that the lease is still the current holder of its key"""
+
+    @abstractmethod
+    def advance_tokens(self, floor: int):
+        """Make every later fencing token larger than floor"""
+
+
+class InProcessLockManager(LockManager):
+    """Lock manager for a single process (tests, single-worker deployments)"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._holders = {}  # key -> Lease
+        self._next_token = 1
+
+    def _current(self, key: str) -> Optional[Lease]:
+        lease = self._holders.get(key)
+        if lease is not None and lease.expires_at <= time.monotonic():
+            del self._holders[key]
+            return None
+        return lease
+
+    def acquire(self, key: str, ttl: float, timeout: float = 0) -> Optional[Lease]:
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                current = self._current(key)
+                now = time.monotonic()
+                if current is None:
+                    lease = Lease(key, uuid.uuid4().hex, self._next_token, now + ttl)
+                    self._next_token += 1
+                    self._holders[key] = lease
+                    return lease
+
+                if now >= deadline:
+                    return None
+
+                # Wake up when released, or when the current lease would expire
+                self._condition.wait(min(deadline, current.expires_at) - now)
+
+    def release(self, lease: Lease) -> bool:
+        with self._condition:
+            current = self._current(lease.key)
+            if current is None or current.owner != lease.owner:
+                return False
+            del self._holders[lease.key]
+            self._condition.notify_all()
+            return True
+
+    def is_held(self, lease: Lease) -> bool:
+        with self._condition:
+            current = self._current(lease.key)
+            return current is not None and current.owner == lease.owner
+
+    def advance_tokens(self, floor: int):
+        with self._condition:
+            self._next_token = max(self._next_token, floor + 1)
+
+
+class RedisLockManager(LockManager):
+    """
+    Lock manager backed by any client speaking the Redis protocol.
+
+    Leases are `SET key owner:token NX PX ttl`; fencing tokens come from
+    INCR on one counter shared by all keys, so a single write can advance
+    it past the database. Release and validation compare the stored value
+    so an expired holder can never delete someone else's lease.
+    """
+
+    RELEASE_SCRIPT = (
+        "if redis.call('get', KEYS[1]) == ARGV[1] then "
+        "return redis.call('del', KEYS[1]) else return 0 end"
+    )
+    ADVANCE_SCRIPT = (
+        "if tonumber(redis.call('get', KEYS[1]) or '0') < tonumber(ARGV[1]) then "
+        "redis.call('set', KEYS[1], ARGV[1]) end return 0"
+    )
+
+    def __init__(self, client, prefix: str = "fleet:lock:"):
+        self._client = client
+        self._prefix = prefix
+
+    def _value(self, lease: Lease) -> str:
+        return f"{lease.owner}:{lease.token}"
+
+    def acquire(self, key: str, ttl: float, timeout: float = 0) -> Optional[Lease]:
+        name = self._prefix + key
+        deadline = time.monotonic() + timeout
+        owner = uuid.uuid4().hex
+        delay = 0.005
+
+        while True:
+            token = int(self._client.incr(f"{self._prefix}fence"))
+            lease = Lease(key, owner, token, time.monotonic() + ttl)
+            if self._client.set(name, self._value(lease), nx=True, px=max(1, int(ttl * 1000))):
+                return lease
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+
+            time.sleep(min(remaining, delay * random.uniform(0.5, 1.0)))
+            delay = min(delay * 2, 0.1)
+
+    def release(self, lease: Lease) -> bool:
+        return bool(self._client.eval(self.RELEASE_SCRIPT, 1, self._prefix + lease.key, self._value(lease)))
+
+    def is_held(self, lease: Lease) -> bool:
+        value = self._client.get(self._prefix + lease.key)
+        if isinstance(value, bytes):
+            value = value.decode()
+        return value == self._value(lease)
+
+    def advance_tokens(self, floor: int):
+        self._client.eval(self.ADVANCE_SCRIPT, 1, f"{self._prefix}fence", str(floor))
+
+
+_lock_manager: Optional[LockManager] = None
+_lock_manager_lock = threading.Lock()
+
+
+def get_lock_manager() -> Optional[LockManager]:
+    """Return the lock manager configured by LOCK_BACKEND ("none", "memory" or "redis")"""
+    global _lock_manager
+    if _lock_manager is None and settings.LOCK_BACKEND != "none":
+        with _lock_manager_lock:
+            if _lock_manager is None:
+                if settings.LOCK_BACKEND == "redis":
+                    import redis  # optional dependency, only needed for this backend
+                    _lock_manager = RedisLockManager(redis.Redis.from_url(settings.REDIS_URL))
+                elif settings.LOCK_BACKEND == "memory":
+                    _lock_manager = InProcessLockManager()
+                else:
+                    raise ValueError(f"Unknown LOCK_BACKEND: {settings.LOCK_BACKEND}")
+                _seed_tokens(_lock_manager)
+    return _lock_manager
+
+
+def _seed_tokens(manager: LockManager):
+    """Advance a new manager past every fencing token already stored on vehicles"""
+    from app.database import SessionLocal
+    from app.models import Vehicle
+
+    db = SessionLocal()
+    try:
+        floor = db.query(func.max(Vehicle.lease_token)).scalar()
+    except Exception as e:
+        # Booking writes still recover: a refused current holder advances the tokens
+        print(f"⚠️  Could not read stored fencing tokens: {e}")
+        return
+    finally:
+        db.close()
+    if floor is not None:
+        manager.advance_tokens(floor)
+
+
+def set_lock_manager(manager: Optional[LockManager]):
+    """Override the lock manager (None falls back to LOCK_BACKEND on next use)"""
+    global _lock_manager
+    _lock_manager = manager
+
+
+def hold_lease(db: Session, manager: LockManager, lease: Lease):
+    """Keep a lease until the session's current transaction ends"""
+    db.info.setdefault(_HELD_LEASES_KEY, []).append((manager, lease))
+
+
+def held_leases(db: Session) -> List[Lease]:
+    """Leases held by the session's current transaction"""
+    return [lease for _, lease in db.info.get(_HELD_LEASES_KEY, [])]
+
+
+def release_leases(db: Session):
+    """Release every lease the session holds (also done when its transaction ends)"""
+    for manager, lease in db.info.pop(_HELD_LEASES_KEY, []):
+        try:
+            manager.release(lease)
+        except Exception:
+            pass  # the lease still expires after its TTL
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _release_leases(session, transaction):
+    if transaction.parent is None:
+        release_leases(session)
@@ -0,0 +1,314 @@
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Booking
+from app.services.booking_index import ACTIVE_STATUSES, hold_expiry, register_booking_view
+import numpy as np
+import threading
+import uuid
+
+
+# free_vehicles probes up to this many candidates per requested vehicle before
+# switching to the fleet-wide busy bitset
+PROBE_FACTOR = 4
+
+
+class OccupancyCalendar:
+    """
+    Per-slot fleet occupancy bitsets over a short rolling horizon.
+
+    The horizon (default: 30 days of 15-minute slots) starts at midnight UTC
+    of the current day. Each slot holds one packed bitset over the fleet, with
+    bit j set when an active booking of vehicle j touches the slot: a
+    (slots x vehicles / 8) uint8 matrix, about 18 MB for 50,000 vehicles.
+    A fleet search ORs the window's slot rows into one busy bitset and then
+    only checks candidates against the (usually small) set of busy vehicles,
+    instead of testing every candidate's bookings one vehicle at a time.
+
+    A set bit in a slot fully inside the window always means a conflict. Only
+    the two edge slots of a window that is not slot-aligned can be partially
+    occupied without overlapping; those vehicles are re-checked against their
+    exact booking intervals, so answers are exact.
+
+    PENDING holds set their bits like any booking. Vehicles holding a hold
+    past its expiry are re-checked against their exact intervals, which skip
+    lapsed holds, so a hold stops blocking its slot as soon as it expires.
+
+    Bitsets are rebuilt from the bookings table with `warm` and kept in step
+    with bookings through the same transaction staging as the booking index.
+    """
+
+    def __init__(self, slot_minutes: int = 15, horizon_days: int = 30):
+        self.slot = timedelta(minutes=slot_minutes)
+        self.slots = int(timedelta(days=horizon_days) / self.slot)
+        self._lock = threading.RLock()
+        self._epoch: Optional[datetime] = None
+        self._bits = np.zeros((self.slots, 0), dtype=np.uint8)
+        self._columns: Dict[int, int] = {}  # vehicle UUID as int -> bit position in every slot row
+        self._vehicle_ids: List[uuid.UUID] = []
+        self._intervals: Dict[uuid.UUID, Dict[uuid.UUID, Tuple[datetime, datetime]]] = {}
+        self._booking_vehicle: Dict[uuid.UUID, uuid.UUID] = {}
+        self._holds: Dict[uuid.UUID, Dict[uuid.UUID, datetime]] = {}  # vehicle -> {hold booking: expiry}
+        self._ready = False
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether the calendar has been warmed and may answer queries"""
+        return self._ready
+
+    @staticmethod
+    def _current_epoch() -> datetime:
+        return datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def _slot_range(self, start_time: datetime, end_time: datetime) -> Tuple[int, int]:
+        """Slots [first, last) touched by [start_time, end_time), clipped to the horizon"""
+        first = (start_time - self._epoch) // self.slot
+        last = -((self._epoch - end_time) // self.slot)  # ceiling division
+        return max(0, first), min(self.slots, last)
+
+    def _column(self, vehicle_id: uuid.UUID) -> int:
+        """Bit position of a vehicle, allocating one (and growing the rows) on first use"""
+        column = self._columns.get(vehicle_id.int)
+        if column is None:
+            column = len(self._vehicle_ids)
+            if column >= self._bits.shape[1] * 8:
+                grown = np.zeros((self.slots, max(64, self._bits.shape[1] * 2)), dtype=np.uint8)
+                grown[:, :self._bits.shape[1]] = self._bits
+                self._bits = grown
+            self._columns[vehicle_id.int] = column
+            self._vehicle_ids.append(vehicle_id)
+        return column
+
+    def _mark(self, column: int, start_time: datetime, end_time: datetime):
+        first, last = self._slot_range(start_time, end_time)
+        if first < last:
+            self._bits[first:last, column >> 3] |= np.uint8(0x80 >> (column & 7))
+
+    def _rebuild_vehicle(self, vehicle_id: uuid.UUID):
+        column = self._columns.get(vehicle_id.int)
+        if column is None:
+            return
+        self._bits[:, column >> 3] &= np.uint8(~(0x80 >> (column & 7)) & 0xFF)
+        for start_time, end_time in self._intervals.get(vehicle_id, {}).values():
+            self._mark(column, start_time, end_time)
+
+    def _rebuild_all(self):
+        self._bits[:] = 0
+        for vehicle_id, intervals in self._intervals.items():
+            column = self._column(vehicle_id)
+            for start_time, end_time in intervals.values():
+                self._mark(column, start_time, end_time)
+
+    def _roll_horizon(self):
+        """Move the horizon forward when a new day starts, dropping finished bookings"""
+        epoch = self._current_epoch()
+        if epoch == self._epoch:
+            return
+        self._epoch = epoch
+        for vehicle_id, intervals in list(self._intervals.items()):
+            for booking_id in [bid for bid, (_, end) in intervals.items() if end <= epoch]:
+                del intervals[booking_id]
+                del self._booking_vehicle[booking_id]
+                self._drop_hold(vehicle_id, booking_id)
+            if not intervals:
+                del self._intervals[vehicle_id]
+        self._rebuild_all()
+
+    def _clear(self):
+        self._bits = np.zeros((self.slots, 0), dtype=np.uint8)
+        self._columns = {}
+        self._vehicle_ids = []
+        self._intervals = {}
+        self._booking_vehicle = {}
+        self._holds = {}
+
+    def _drop_hold(self, vehicle_id: uuid.UUID, booking_id: uuid.UUID):
+        holds = self._holds.get(vehicle_id)
+        if holds is not None:
+            holds.pop(booking_id, None)
+            if not holds:
+                del self._holds[vehicle_id]
+
+    def warm(self, db: Session) -> int:
+        """(Re)build all bitsets from active bookings. Returns the number of bookings loaded."""
+        epoch = self._current_epoch()
+        rows = db.query(
+            Booking.id, Booking.vehicle_id, Booking.start_time, Booking.end_time, Booking.status, Booking.created_at
+        ).filter(
+            Booking.status.in_(ACTIVE_STATUSES),
+            Booking.end_time > epoch
+        ).all()
+
+        with self._lock:
+            self._epoch = epoch
+            self._clear()
+            for booking_id, vehicle_id, start_time, end_time, status, created_at in rows:
+                self._intervals.setdefault(vehicle_id, {})[booking_id] = (start_time, end_time)
+                self._booking_vehicle[booking_id] = vehicle_id
+                expires_at = hold_expiry(status, created_at)
+                if expires_at is not None:
+                    self._holds.setdefault(vehicle_id, {})[booking_id] = expires_at
+            self._rebuild_all()
+            self._ready = True
+
+        return len(rows)
+
+    def reset(self):
+        """Drop all bitsets and stop answering queries until warmed again"""
+        with self._lock:
+            self._clear()
+            self._ready = False
+
+    def add(
+        self,
+        booking_id: uuid.UUID,
+        vehicle_id: uuid.UUID,
+        start_time: datetime,
+        end_time: datetime,
+        hold_expires_at: Optional[datetime] = None
+    ):
+        """Mark an active booking's slots as occupied; holds pass their expiry"""
+        with self._lock:
+            self._roll_horizon()
+            if booking_id in self._booking_vehicle:
+                return
+            self._intervals.setdefault(vehicle_id, {})[booking_id] = (start_time, end_time)
+            self._booking_vehicle[booking_id] = vehicle_id
+            if hold_expires_at is not None:
+                self._holds.setdefault(vehicle_id, {})[booking_id] = hold_expires_at
+            self._mark(self._column(vehicle_id), start_time, end_time)
+
+    def remove(self, booking_id: uuid.UUID):
+        """Free a booking's slots (slots shared with other bookings stay occupied)"""
+        with self._lock:
+            vehicle_id = self._booking_vehicle.pop(booking_id, None)
+            if vehicle_id is None:
+                return
+            intervals = self._intervals.get(vehicle_id, {})
+            intervals.pop(booking_id, None)
+            if not intervals:
+                self._intervals.pop(vehicle_id, None)
+            self._drop_hold(vehicle_id, booking_id)
+            self._rebuild_vehicle(vehicle_id)
+
+    def confirm(self, booking_id: uuid.UUID):
+        """Turn a hold into a booking that no longer expires"""
+        with self._lock:
+            vehicle_id = self._booking_vehicle.get(booking_id)
+            if vehicle_id is not None:
+                self._drop_hold(vehicle_id, booking_id)
+
+    def covers(self, start_time: datetime, end_time: datetime) -> bool:
+        """Whether a window lies inside the calendar horizon"""
+        if not self._ready:
+            return False
+        with self._lock:
+            self._roll_horizon()
+            return start_time >= self._epoch and end_time <= self._epoch + self.slot * self.slots
+
+    def _window_slots(self, start_time: datetime, end_time: datetime) -> Tuple[int, int, int, int]:
+        """Slots touched by the window, and the slots fully inside it, as two [first, last) ranges"""
+        first, last = self._slot_range(start_time, end_time)
+        inner_first, inner_last = first, last
+        if first < last and start_time != self._epoch + self.slot * first:
+            inner_first += 1
+        if first < last and end_time != self._epoch + self.slot * last:
+            inner_last -= 1
+        return first, last, inner_first, inner_last
+
+    def _overlaps(self, vehicle_id: uuid.UUID, start_time: datetime, end_time: datetime) -> bool:
+        intervals = self._intervals.get(vehicle_id, {})
+        lapsed = self._lapsed_holds(vehicle_id)
+        return any(
+            start < end_time and end > start_time
+            for booking_id, (start, end) in intervals.items()
+            if booking_id not in lapsed
+        )
+
+    def _lapsed_holds(self, vehicle_id: uuid.UUID) -> List[uuid.UUID]:
+        """Holds of a vehicle past their expiry that the sweeper has not cancelled yet"""
+        holds = self._holds.get(vehicle_id)
+        if not holds:
+            return []
+        now = datetime.utcnow()
+        return [booking_id for booking_id, expires_at in holds.items() if expires_at <= now]
+
+    def _busy(self, start_time: datetime, end_time: datetime) -> np.ndarray:
+        """Boolean vector over bit positions: vehicles with a booking in the window"""
+        first, last, inner_first, inner_last = self._window_slots(start_time, end_time)
+        width = self._bits.shape[1]
+        touched = np.bitwise_or.reduce(self._bits[first:last], axis=0) if first < last else np.zeros(width, np.uint8)
+        blocked = (
+            np.bitwise_or.reduce(self._bits[inner_first:inner_last], axis=0)
+            if inner_first < inner_last else np.zeros(width, np.uint8)
+        )
+
+        busy = np.unpackbits(blocked, count=len(self._vehicle_ids)).astype(bool)
+        # Only partially covered edge slots are occupied; compare exact intervals
+        edge_only = np.unpackbits(touched & ~blocked, count=len(self._vehicle_ids))
+        for column in np.flatnonzero(edge_only).tolist():
+            busy[column] = self._overlaps(self._vehicle_ids[column], start_time, end_time)
+        # Bits of lapsed holds are still set; compare exact intervals for their vehicles
+        for vehicle_id in [vid for vid in self._holds if self._lapsed_holds(vid)]:
+            column = self._columns[vehicle_id.int]
+            if busy[column]:
+                busy[column] = self._overlaps(vehicle_id, start_time, end_time)
+        return busy
+
+    def is_free(self, vehicle_id: uuid.UUID, start_time: datetime, end_time: datetime) -> Optional[bool]:
+        """Check one vehicle. Returns None when the window is outside the horizon."""
+        if not self.covers(start_time, end_time):
+            return None
+        with self._lock:
+            column = self._columns.get(vehicle_id.int)
+            if column is None:
+                return True
+            first, last, inner_first, inner_last = self._window_slots(start_time, end_time)
+            mask = np.uint8(0x80 >> (column & 7))
+            if not (self._bits[first:last, column >> 3] & mask).any():
+                return True
+            if (self._bits[inner_first:inner_last, column >> 3] & mask).any() and not self._lapsed_holds(vehicle_id):
+                return False
+            return not self._overlaps(vehicle_id, start_time, end_time)
+
+    def free_vehicles(
+        self,
+        vehicle_ids: Iterable[uuid.UUID],
+        start_time: datetime,
+        end_time: datetime,
+        limit: Optional[int] = None
+    ) -> Optional[List[uuid.UUID]]:
+        """
+        Filter vehicles down to those free for the whole window, keeping order.
+
+        With a limit, the first few candidates are probed one by one against
+        their own bookings, which is cheapest while most of the fleet is
+        free. Past PROBE_FACTOR * limit
+        candidates, the fleet's busy bitset for the window is computed once
+        and the remaining candidates are only checked against the busy
+        vehicles. Returns None when the window is outside the horizon.
+        """
+        if not self.covers(start_time, end_time):
+            return None
+        with self._lock:
+            candidates = iter(vehicle_ids)
+            free = []
+            if limit is not None:
+                for probed, vehicle_id in enumerate(candidates, 1):
+                    if not self._overlaps(vehicle_id, start_time, end_time):
+                        free.append(vehicle_id)
+                        if len(free) >= limit:
+                            return free
+                    if probed >= PROBE_FACTOR * limit:
+                        break
+
+            busy = {self._vehicle_ids[column].int for column in np.flatnonzero(self._busy(start_time, end_time)).tolist()}
+        remaining = None if limit is None else limit - len(free)
+        free.extend(islice((vehicle_id for vehicle_id in candidates if vehicle_id.int not in busy), remaining))
+        return free
+
+
+occupancy_calendar = OccupancyCalendar(settings.OCCUPANCY_SLOT_MINUTES, settings.OCCUPANCY_HORIZON_DAYS)
+register_booking_view(occupancy_calendar)
@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, or_
+import base64
+import json
+import uuid
+
+
+# Page size used when none is given, and the most rows one page may hold
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded for the requested ordering"""
+    pass
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque URL-safe cursor holding the sort key of the last row of a page"""
+    plain = [value.isoformat() if isinstance(value, datetime) else str(value) if isinstance(value, uuid.UUID) else value
+             for value in values]
+    return base64.urlsafe_b64encode(json.dumps(plain, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> Tuple:
+    """Sort key values from a cursor, parsed to the python types of columns"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != len(columns):
+            raise ValueError("wrong number of values")
+        return tuple(_parse(value, column) for value, column in zip(raw, columns))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid cursor") from e
+
+
+def _parse(value, column):
+    python_type = column.type.python_type
+    if value is None or isinstance(value, python_type):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is uuid.UUID:
+        return uuid.UUID(value)
+    return python_type(value)
+
+
+def after_cursor(order: Sequence[Tuple[Any, bool]], values: Sequence[Any]):
+    """
+    WHERE clause selecting rows strictly after values in the given ordering.
+
+    order lists (column, descending) pairs, most significant first; the
+    last column must be unique so every row has a distinct position. The
+    clause is expanded to a < x OR (a = x AND b > y) ... rather than a row
+    value comparison so the columns may sort in different directions, and
+    repeats the bound on the first column on its own (a <= x) so an index
+    on it can be range-scanned.
+    """
+    clauses = []
+    for i, (column, descending) in enumerate(order):
+        beyond = column < values[i] if descending else column > values[i]
+        equal = [earlier == values[j] for j, (earlier, _) in enumerate(order[:i])]
+        clauses.append(and_(*equal, beyond))
+
+    first, descending = order[0]
+    return and_(first <= values[0] if descending else first >= values[0], or_(*clauses))
+
+
+def keyset_page(query, order: Sequence[Tuple[Any, bool]], cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    Fetch one page of a Query ordered by order (see after_cursor).
+
+    Reads limit + 1 rows to tell whether another page follows; limit is
+    capped at MAX_PAGE_SIZE. Returns the rows and the cursor of the next
+    page, or None on the last page. Raises InvalidCursorError for a
+    malformed cursor.
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    columns = [column for column, _ in order]
+    if cursor:
+        query = query.filter(after_cursor(order, decode_cursor(cursor, columns)))
+
+    rows = query.order_by(*[
+        column.desc() if descending else column.asc() for column, descending in order
+    ]).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
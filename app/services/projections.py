@@ -0,0 +1,44 @@
+from datetime import datetime
+from enum import Enum
+from typing import Iterable, Optional, Sequence
+from app.config import settings
+from app.models import Booking, Trip, Vehicle
+from app.schemas import BookingResponse, TripResponse, VehicleResponse
+import json
+import uuid
+
+
+# Columns selected by the projection read path, one per field of the response model, in field order
+VEHICLE_LIST_COLUMNS = tuple(getattr(Vehicle, name) for name in VehicleResponse.model_fields)
+BOOKING_LIST_COLUMNS = tuple(getattr(Booking, name) for name in BookingResponse.model_fields)
+TRIP_LIST_COLUMNS = tuple(getattr(Trip, name) for name in TripResponse.model_fields)
+
+
+def projection_enabled(endpoint: str) -> bool:
+    """Whether a list endpoint ("vehicles", "bookings", "trips") serves rows through the projection path"""
+    return endpoint in settings.LIST_PROJECTIONS
+
+
+def plain_value(value):
+    """JSON/CSV-friendly form of a column value"""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    return value
+
+
+def encode_page(rows: Iterable[Sequence], columns: Sequence, next_cursor: Optional[str]) -> bytes:
+    """
+    A {"items": [...], "next_cursor": ...} page as JSON bytes, straight from column rows.
+
+    rows are the tuple-like rows of a column query (no ORM instances), in
+    the order of columns. The output is what the matching Page[...Response]
+    model serializes to, without building either ORM objects or Pydantic
+    models per row.
+    """
+    names = [column.key for column in columns]
+    items = [dict(zip(names, map(plain_value, row))) for row in rows]
+    return json.dumps({"items": items, "next_cursor": next_cursor}, separators=(",", ":")).encode()
@@ -0,0 +1,78 @@
+from typing import Dict, Iterable, Optional, Tuple
+import math
+
+
+# Bin holding zero (and negative) values; positive bins never get near it
+ZERO_BIN = -(2 ** 30)
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with logarithmic bins (DDSketch).
+
+    A positive value x falls in bin ceil(log_gamma(x)) with
+    gamma = (1 + a) / (1 - a), and every value in a bin is within relative
+    error a of the bin's representative value. A sketch is just a map of
+    bin -> count, so sketches merge by adding counts. That is what lets the
+    per-day bins in trip_metric_sketches be merged with SUM(count) GROUP BY
+    bin for any range of days.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, bins: Optional[Dict[int, int]] = None):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = dict(bins or {})
+
+    @property
+    def count(self) -> int:
+        return sum(self.bins.values())
+
+    def bin_for(self, value: float) -> int:
+        if value <= 0:
+            return ZERO_BIN
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def value_for(self, bin: int) -> float:
+        """Representative value of a bin (within relative_accuracy of every value in it)"""
+        if bin == ZERO_BIN:
+            return 0.0
+        return 2 * self.gamma ** bin / (self.gamma + 1)
+
+    def add(self, value: float, count: int = 1):
+        bin = self.bin_for(value)
+        self.bins[bin] = self.bins.get(bin, 0) + count
+
+    def merge_bins(self, bins: Iterable[Tuple[int, int]]):
+        """Add (bin, count) pairs, e.g. rows of a GROUP BY bin query"""
+        for bin, count in bins:
+            self.bins[bin] = self.bins.get(bin, 0) + count
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1); None for an empty sketch"""
+        total = self.count
+        if not total:
+            return None
+
+        rank = q * (total - 1)
+        seen = 0
+        for bin in sorted(self.bins):
+            seen += self.bins[bin]
+            if seen > rank:
+                return self.value_for(bin)
+        return self.value_for(max(self.bins))
+
+
+# Metrics sketched per trip, as stored in trip_metric_sketches.metric
+TRIP_METRICS = ("duration_hours", "distance_km")
+
+# Accuracy of the stored trip_metric_sketches bins; changing it requires a rollup rebuild
+TRIP_SKETCH_ACCURACY = 0.01
+
+
+def trip_metrics(start_time, end_time, distance_km: Optional[float]) -> Dict[str, float]:
+    """The per-trip values sketched in trip_metric_sketches"""
+    return {
+        "duration_hours": (end_time - start_time).total_seconds() / 3600.0,
+        "distance_km": distance_km or 0.0,
+    }
@@ -0,0 +1,48 @@
+from typing import Callable, Optional
+from sqlalchemy.orm import Session
+from app.services.rollup_service import RollupService
+import threading
+
+
+class RollupApplier:
+    """Background thread that periodically folds queued booking deltas into the usage rollups"""
+
+    def __init__(self, session_factory: Callable[[], Session], interval_seconds: float = 5, batch_size: int = 1000):
+        self._session_factory = session_factory
+        self._interval = interval_seconds
+        self._batch_size = batch_size
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        """Apply everything queued now. Returns the number of changes applied."""
+        db = self._session_factory()
+        try:
+            return RollupService.apply_outbox(db, self._batch_size)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def start(self):
+        """Start applying in a daemon thread (no-op if already running)"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-outbox-applier", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the applier thread to exit and wait for it"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self._interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"⚠️  Rollup outbox apply failed: {e}")
@@ -0,0 +1,397 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import Date, and_, case, cast, delete, event, func, insert, literal, select, union_all, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.config import settings
+from app.models import Booking, Trip, Vehicle, VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch, RollupOutbox
+from app.schemas import BookingStatus
+from app.services.analytics_service import AnalyticsService
+from app.services.analytics_cache import BOOKING_FACTS, TRIP_FACTS, stage_analytics_change
+from app.services.quantile_sketch import TRIP_SKETCH_ACCURACY, QuantileSketch, trip_metrics
+import uuid
+
+
+# Rollup counter holding the bookings currently in each status
+BOOKING_STATUS_COLUMNS = {
+    BookingStatus.PENDING: "pending_bookings",
+    BookingStatus.CONFIRMED: "confirmed_bookings",
+    BookingStatus.COMPLETED: "completed_bookings",
+    BookingStatus.CANCELLED: "cancelled_bookings",
+}
+
+COUNTER_COLUMNS = ("trip_count", "distance_km", "in_use_seconds") + tuple(BOOKING_STATUS_COLUMNS.values())
+
+
+class RollupService:
+    """
+    Maintains the usage rollup tables.
+
+    vehicle_daily_usage is keyed by (vehicle_id, day) and
+    location_hourly_usage by (location, hour). Both hold completed-trip totals
+    bucketed by trip start time and booking counts per current status
+    bucketed by booking creation time, the same columns AnalyticsService
+    filters raw rows on. Locations are the vehicle_location stored on each
+    trip and booking when it was created, so later changes to a booking or
+    trip land in the same row even after the vehicle has moved.
+
+    Nothing is written unless ANALYTICS_ROLLUPS_ENABLED. A completed trip is
+    an additive upsert in the caller's transaction. Booking changes only
+    insert their deltas into rollup_outbox in the caller's transaction, so
+    concurrent bookings never queue on a busy location's hourly row;
+    `apply_outbox` later folds queued deltas into the rollups in batches.
+    `rebuild` recomputes a range from the raw tables.
+
+    Completed trips also add their duration and distance to per-day
+    quantile sketch bins (trip_metric_sketches), per vehicle and per location.
+
+    Every change is also staged as an analytics cache invalidation.
+    """
+
+    @staticmethod
+    def hour_bucket(moment: datetime) -> datetime:
+        return moment.replace(minute=0, second=0, microsecond=0)
+
+    @staticmethod
+    def record_trip_completed(db: Session, trip: Trip):
+        """Add a trip that just ended to the rollups"""
+        seconds = round((trip.end_time - trip.start_time).total_seconds())
+        location = trip.vehicle_location or ""
+        changes = [(
+            trip.vehicle_id,
+            location,
+            trip.start_time,
+            {"trip_count": 1, "distance_km": trip.distance_traveled or 0.0, "in_use_seconds": seconds}
+        )]
+        if not settings.ANALYTICS_ROLLUPS_ENABLED:
+            RollupService._stage(db, changes)
+            return
+        RollupService._apply(db, changes)
+
+        sketch = QuantileSketch(TRIP_SKETCH_ACCURACY)
+        metrics = trip_metrics(trip.start_time, trip.end_time, trip.distance_traveled)
+        for scope, key in (("vehicle", str(trip.vehicle_id)), ("location", location)):
+            for metric, value in metrics.items():
+                RollupService._upsert(db, TripMetricSketch, {
+                    "scope": scope, "key": key, "metric": metric,
+                    "day": trip.start_time.date(), "bin": sketch.bin_for(value)
+                }, {"count": 1})
+
+    @staticmethod
+    def record_bookings_created(db: Session, bookings: Iterable[Booking]):
+        """Count newly inserted bookings (created_at must be populated, i.e. after flush)"""
+        RollupService._enqueue(db, [
+            (
+                booking.vehicle_id,
+                booking.vehicle_location or "",
+                booking.created_at,
+                {BOOKING_STATUS_COLUMNS[booking.status]: 1}
+            )
+            for booking in bookings
+        ])
+
+    @staticmethod
+    def record_status_change(
+        db: Session,
+        bookings: Iterable,
+        old_status: BookingStatus,
+        new_status: BookingStatus
+    ):
+        """
+        Move bookings from one status counter to another.
+
+        Accepts Booking objects or rows with vehicle_id, vehicle_location and
+        created_at.
+        """
+        RollupService._enqueue(db, [
+            (
+                booking.vehicle_id,
+                booking.vehicle_location or "",
+                booking.created_at,
+                {BOOKING_STATUS_COLUMNS[old_status]: -1, BOOKING_STATUS_COLUMNS[new_status]: 1}
+            )
+            for booking in bookings
+        ])
+
+    @staticmethod
+    def apply_outbox(db: Session, batch_size: int = 1000) -> int:
+        """
+        Fold queued booking deltas into the rollups, in committed batches.
+
+        Each batch merges its deltas per rollup row, so a busy location hour
+        is updated once per batch instead of once per booking. Rows locked by
+        another applier are skipped (Postgres). Returns the number of queued
+        changes applied.
+        """
+        columns = list(BOOKING_STATUS_COLUMNS.values())
+        applied = 0
+        while True:
+            rows = db.execute(
+                select(
+                    RollupOutbox.id, RollupOutbox.vehicle_id, RollupOutbox.location, RollupOutbox.moment,
+                    *(RollupOutbox.__table__.c[column] for column in columns)
+                ).order_by(RollupOutbox.created_at).limit(batch_size).with_for_update(skip_locked=True)
+            ).all()
+            if not rows:
+                break
+
+            RollupService._apply(db, [
+                (row.vehicle_id, row.location, row.moment, {
+                    column: getattr(row, column) for column in columns if getattr(row, column)
+                })
+                for row in rows
+            ])
+            db.execute(delete(RollupOutbox).where(RollupOutbox.id.in_([row.id for row in rows])))
+            db.commit()
+
+            applied += len(rows)
+            if len(rows) < batch_size:
+                break
+
+        return applied
+
+    @staticmethod
+    def _enqueue(db: Session, changes: List[Tuple[uuid.UUID, str, datetime, Dict[str, float]]]):
+        """Queue booking counter changes in rollup_outbox (when rollups are enabled)"""
+        RollupService._stage(db, changes)
+        if not changes or not settings.ANALYTICS_ROLLUPS_ENABLED:
+            return
+        db.execute(insert(RollupOutbox), [
+            {"id": uuid.uuid4(), "vehicle_id": vehicle_id, "location": location, "moment": moment, **deltas}
+            for vehicle_id, location, moment, deltas in changes
+        ])
+
+    @staticmethod
+    def _stage(db: Session, changes: List[Tuple[uuid.UUID, str, datetime, Dict[str, float]]]):
+        """Stage analytics cache invalidations for (vehicle_id, location, moment, deltas) changes"""
+        for facts, columns in ((TRIP_FACTS, {"trip_count"}), (BOOKING_FACTS, set(BOOKING_STATUS_COLUMNS.values()))):
+            touched = [change for change in changes if columns & change[3].keys()]
+            if touched:
+                stage_analytics_change(
+                    db,
+                    facts,
+                    moments=[moment for _, _, moment, _ in touched],
+                    locations={location for _, location, _, _ in touched},
+                    vehicle_ids={vehicle_id for vehicle_id, _, _, _ in touched}
+                )
+
+    @staticmethod
+    def _apply(db: Session, changes: List[Tuple[uuid.UUID, str, datetime, Dict[str, float]]]):
+        """Merge (vehicle_id, location, moment, deltas) changes per rollup row and upsert them"""
+        if not changes:
+            return
+
+        RollupService._stage(db, changes)
+        daily: Dict[Tuple[uuid.UUID, date], Dict[str, float]] = {}
+        hourly: Dict[Tuple[str, datetime], Dict[str, float]] = {}
+        for vehicle_id, location, moment, deltas in changes:
+            for rows, key in (
+                (daily, (vehicle_id, moment.date())),
+                (hourly, (location, RollupService.hour_bucket(moment)))
+            ):
+                row = rows.setdefault(key, {})
+                for column, delta in deltas.items():
+                    row[column] = row.get(column, 0) + delta
+
+        for (vehicle_id, day), deltas in daily.items():
+            RollupService._upsert(db, VehicleDailyUsage, {"vehicle_id": vehicle_id, "day": day}, deltas)
+        for (location, hour), deltas in hourly.items():
+            RollupService._upsert(db, LocationHourlyUsage, {"location": location, "hour": hour}, deltas)
+
+    @staticmethod
+    def _upsert(db: Session, model, key: Dict, deltas: Dict[str, float]):
+        """Add deltas to a rollup row, creating it if needed"""
+        table = model.__table__
+        dialect = db.get_bind().dialect.name
+
+        if dialect in ("sqlite", "postgresql"):
+            dialect_insert = sqlite.insert if dialect == "sqlite" else postgresql.insert
+            stmt = dialect_insert(table).values(**key, **deltas)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key),
+                set_={column: table.c[column] + stmt.excluded[column] for column in deltas}
+            )
+            db.execute(stmt)
+            return
+
+        updated = db.execute(
+            table.update().where(
+                and_(*(table.c[column] == value for column, value in key.items()))
+            ).values({column: table.c[column] + delta for column, delta in deltas.items()})
+        ).rowcount
+        if not updated:
+            db.execute(table.insert().values(**key, **deltas))
+
+    # Rebuild
+
+    @staticmethod
+    def backfill_locations(db: Session) -> int:
+        """
+        Stamp bookings and trips that have no vehicle_location (created before
+        it was stored) with their vehicle's current location. Returns the
+        number of rows updated. The caller commits.
+        """
+        updated = 0
+        for model in (Booking, Trip):
+            updated += db.execute(
+                update(model).where(model.vehicle_location.is_(None)).values(
+                    vehicle_location=func.coalesce(
+                        select(Vehicle.location).where(Vehicle.id == model.vehicle_id).scalar_subquery(), ""
+                    )
+                ).execution_options(synchronize_session=False)
+            ).rowcount
+        return updated
+
+    @staticmethod
+    def _day_bucket_sql(db: Session, column):
+        if db.get_bind().dialect.name == "sqlite":
+            return func.date(column)
+        return cast(func.date_trunc("day", column), Date)
+
+    @staticmethod
+    def _hour_bucket_sql(db: Session, column):
+        if db.get_bind().dialect.name == "sqlite":
+            # Same text format SQLAlchemy uses to store DateTime on SQLite
+            return func.strftime("%Y-%m-%d %H:00:00.000000", column)
+        return func.date_trunc("hour", column)
+
+    @staticmethod
+    def rebuild(
+        db: Session,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None
+    ) -> Dict[str, int]:
+        """
+        Recompute the rollups from trips and bookings.
+
+        Bookings and trips without a vehicle_location are stamped first
+        (backfill_locations), so none of them land in the "" location; the
+        number stamped is returned under "locations_backfilled". Covers whole
+        days from start_date (rounded down) to end_date (rounded up), or
+        everything when omitted. Rollup rows in the range are replaced
+        with INSERT ... SELECT aggregates, and queued outbox deltas for
+        bookings created in the range are dropped since the raw rows already
+        include them. The caller commits.
+        """
+        stamped = RollupService.backfill_locations(db)
+
+        if start_date is not None:
+            start_date = datetime.combine(start_date.date(), time.min)
+        if end_date is not None and end_date != datetime.combine(end_date.date(), time.min):
+            end_date = datetime.combine(end_date.date(), time.min) + timedelta(days=1)
+
+        def in_range(column, lower, upper):
+            conditions = []
+            if lower is not None:
+                conditions.append(column >= lower)
+            if upper is not None:
+                conditions.append(column < upper)
+            return conditions
+
+        db.execute(delete(VehicleDailyUsage).where(*in_range(
+            VehicleDailyUsage.day,
+            start_date.date() if start_date else None,
+            end_date.date() if end_date else None
+        )))
+        db.execute(delete(LocationHourlyUsage).where(*in_range(LocationHourlyUsage.hour, start_date, end_date)))
+        db.execute(delete(RollupOutbox).where(*in_range(RollupOutbox.moment, start_date, end_date)))
+
+        status_counts = [
+            func.coalesce(func.sum(case((Booking.status == status, 1), else_=0)), 0).label(column)
+            for status, column in BOOKING_STATUS_COLUMNS.items()
+        ]
+        no_bookings = [literal(0).label(column) for column in BOOKING_STATUS_COLUMNS.values()]
+
+        counts = {"locations_backfilled": stamped}
+        for model, key_names, trip_keys, booking_keys in (
+            (
+                VehicleDailyUsage, ("vehicle_id", "day"),
+                (Trip.vehicle_id, RollupService._day_bucket_sql(db, Trip.start_time)),
+                (Booking.vehicle_id, RollupService._day_bucket_sql(db, Booking.created_at))
+            ),
+            (
+                LocationHourlyUsage, ("location", "hour"),
+                (func.coalesce(Trip.vehicle_location, ""), RollupService._hour_bucket_sql(db, Trip.start_time)),
+                (func.coalesce(Booking.vehicle_location, ""), RollupService._hour_bucket_sql(db, Booking.created_at))
+            ),
+        ):
+            trip_facts = select(
+                *(key.label(name) for key, name in zip(trip_keys, key_names)),
+                func.count(Trip.id).label("trip_count"),
+                func.coalesce(func.sum(Trip.distance_traveled), 0.0).label("distance_km"),
+                func.coalesce(func.sum(AnalyticsService._trip_seconds(db)), 0).label("in_use_seconds"),
+                *no_bookings
+            ).where(
+                Trip.end_time.isnot(None),
+                *in_range(Trip.start_time, start_date, end_date)
+            ).group_by(*trip_keys)
+
+            booking_facts = select(
+                *(key.label(name) for key, name in zip(booking_keys, key_names)),
+                literal(0).label("trip_count"),
+                literal(0.0).label("distance_km"),
+                literal(0).label("in_use_seconds"),
+                *status_counts
+            ).where(
+                *in_range(Booking.created_at, start_date, end_date)
+            ).group_by(*booking_keys)
+
+            facts = union_all(trip_facts, booking_facts).subquery()
+            merged = select(
+                *(facts.c[name] for name in key_names),
+                *(func.sum(facts.c[column]) for column in COUNTER_COLUMNS)
+            ).group_by(*(facts.c[name] for name in key_names))
+
+            result = db.execute(insert(model).from_select(list(key_names) + list(COUNTER_COLUMNS), merged))
+            counts[model.__tablename__] = result.rowcount
+
+        counts[TripMetricSketch.__tablename__] = RollupService._rebuild_sketches(db, start_date, end_date, in_range)
+        return counts
+
+    @staticmethod
+    def _rebuild_sketches(db: Session, start_date: Optional[datetime], end_date: Optional[datetime], in_range) -> int:
+        """Replace trip_metric_sketches rows in the range; bins are computed in Python while streaming trips"""
+        db.execute(delete(TripMetricSketch).where(*in_range(
+            TripMetricSketch.day,
+            start_date.date() if start_date else None,
+            end_date.date() if end_date else None
+        )))
+
+        sketch = QuantileSketch(TRIP_SKETCH_ACCURACY)
+        bins: Dict[Tuple[str, str, str, date, int], int] = {}
+        trips = db.execute(
+            select(Trip.vehicle_id, func.coalesce(Trip.vehicle_location, ""), Trip.start_time, Trip.end_time, Trip.distance_traveled)
+            .where(Trip.end_time.isnot(None), *in_range(Trip.start_time, start_date, end_date))
+            .execution_options(yield_per=1000)
+        )
+        for vehicle_id, location, start_time, end_time, distance in trips:
+            day = start_time.date()
+            for metric, value in trip_metrics(start_time, end_time, distance).items():
+                bin = sketch.bin_for(value)
+                for key in (("vehicle", str(vehicle_id), metric, day, bin), ("location", location, metric, day, bin)):
+                    bins[key] = bins.get(key, 0) + 1
+
+        if bins:
+            db.execute(insert(TripMetricSketch), [
+                {"scope": scope, "key": key, "metric": metric, "day": day, "bin": bin, "count": count}
+                for (scope, key, metric, day, bin), count in bins.items()
+            ])
+        return len(bins)
+
+
+@event.listens_for(Session, "before_flush")
+def _stamp_vehicle_location(session: Session, flush_context, instances):
+    """Store the vehicle's current location ("" when unset) on new bookings and trips"""
+    new_vehicles = {obj.id: obj for obj in session.new if isinstance(obj, Vehicle)}
+    for obj in session.new:
+        if not isinstance(obj, (Booking, Trip)) or obj.vehicle_location is not None or obj.vehicle_id is None:
+            continue
+        vehicle = new_vehicles.get(obj.vehicle_id) or session.identity_map.get(
+            session.identity_key(Vehicle, obj.vehicle_id)
+        )
+        if vehicle is not None:
+            obj.vehicle_location = vehicle.location or ""
+        else:
+            obj.vehicle_location = func.coalesce(
+                select(Vehicle.location).where(Vehicle.id == obj.vehicle_id).scalar_subquery(), ""
+            )
@@ -1,9 +1,11 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from app.models import Trip, Booking
 from app.schemas import BookingStatus
+from app.services.pagination import DEFAULT_PAGE_SIZE, keyset_page
+from app.services.rollup_service import RollupService
 import uuid
 
 
@@ -56,6 +58,7 @@ class TripService:
         if mileage_end >= trip.mileage_start:
             trip.distance_traveled = mileage_end - trip.mileage_start
         
+        RollupService.record_trip_completed(db, trip)
         return trip
     
     @staticmethod
@@ -73,36 +76,39 @@ class TripService:
         db: Session,
         vehicle_id: uuid.UUID,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
-    ) -> List[Trip]:
-        """Get all trips for a vehicle within a date range"""
-        query = db.query(Trip).filter(Trip.vehicle_id == vehicle_id)
-        
-        if start_date:
-            query = query.filter(Trip.start_time >= start_date)
-        
-        if end_date:
-            query = query.filter(Trip.start_time <= end_date)
-        
-        return query.order_by(Trip.start_time.desc()).all()
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Trip], Optional[str]]:
+        """One page of a vehicle's trips within a date range (plain rows of columns when given)"""
+        query = (db.query(*columns) if columns else db.query(Trip)).filter(Trip.vehicle_id == vehicle_id)
+        return TripService._trip_page(query, start_date, end_date, cursor, limit)
     
     @staticmethod
     def get_user_trips(
         db: Session,
         user_id: uuid.UUID,
         start_date: Optional[datetime] = None,
-        end_date: Optional[datetime] = None
-    ) -> List[Trip]:
-        """Get all trips for a user within a date range"""
-        query = db.query(Trip).filter(Trip.user_id == user_id)
-        
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Trip], Optional[str]]:
+        """One page of a user's trips within a date range (plain rows of columns when given)"""
+        query = (db.query(*columns) if columns else db.query(Trip)).filter(Trip.user_id == user_id)
+        return TripService._trip_page(query, start_date, end_date, cursor, limit)
+    
+    @staticmethod
+    def _trip_page(query, start_date: Optional[datetime], end_date: Optional[datetime], cursor: Optional[str], limit: int):
+        """Keyset page on (start_time DESC, id DESC); returns (trips, next_cursor)"""
         if start_date:
             query = query.filter(Trip.start_time >= start_date)
         
         if end_date:
             query = query.filter(Trip.start_time <= end_date)
         
-        return query.order_by(Trip.start_time.desc()).all()
+        return keyset_page(query, [(Trip.start_time, True), (Trip.id, True)], cursor, limit)
     
     @staticmethod
     def get_completed_trips(
@@ -0,0 +1,56 @@
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+
+
+# Times are passed as float hours since this Monday midnight, so hour % 168 is the weekly cell
+REFERENCE_MONDAY = datetime(2001, 1, 1)
+HOURS_PER_WEEK = 7 * 24
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+
+def hours_since_reference(moment: datetime) -> float:
+    return (moment - REFERENCE_MONDAY).total_seconds() / 3600.0
+
+
+def weekly_occupancy(
+    starts: np.ndarray,
+    ends: np.ndarray,
+    groups: Optional[np.ndarray] = None,
+    group_count: int = 1
+) -> np.ndarray:
+    """
+    Hours of [start, end) intervals falling in each (weekday, hour) cell.
+
+    Every interval is split at hour boundaries with array operations (one
+    piece per wall-clock hour it touches), each piece is clipped to its hour,
+    and the piece lengths are summed per group and weekly cell with a single
+    bincount. Returns a (group_count, 7, 24) array; groups holds each
+    interval's group index (all 0 when omitted).
+    """
+    starts = np.asarray(starts, dtype=np.float64)
+    ends = np.asarray(ends, dtype=np.float64)
+    groups = np.zeros(len(starts), dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+
+    keep = ends > starts
+    starts, ends, groups = starts[keep], ends[keep], groups[keep]
+
+    first_hour = np.floor(starts)
+    pieces = (np.ceil(ends) - first_hour).astype(np.int64)
+    owner = np.repeat(np.arange(len(starts)), pieces)
+    offset = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces, pieces)
+    hour = first_hour[owner] + offset
+
+    covered = np.minimum(ends[owner], hour + 1) - np.maximum(starts[owner], hour)
+    cell = groups[owner] * HOURS_PER_WEEK + hour.astype(np.int64) % HOURS_PER_WEEK
+
+    occupancy = np.bincount(cell, weights=covered, minlength=group_count * HOURS_PER_WEEK)
+    # bincount returns int64 zeros when there are no intervals at all
+    return occupancy.astype(np.float64, copy=False).reshape(group_count, 7, 24)
+
+
+def top_cells(values: np.ndarray, k: int) -> List[tuple]:
+    """(weekday, hour) of the k largest non-zero cells of a 7x24 matrix, earlier cells first on ties"""
+    flat = values.ravel()
+    order = np.argsort(-flat, kind="stable")[:k]
+    return [divmod(int(i), 24) for i in order if flat[i] > 0]
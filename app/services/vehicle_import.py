@@ -0,0 +1,144 @@
+from datetime import datetime
+from itertools import islice
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.models import Vehicle
+from app.schemas import VehicleCreate, VehicleStatus
+from app.services.analytics_cache import VEHICLE_FACTS, stage_analytics_change
+import csv
+import io
+import json
+import uuid
+
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# (line number, parsed record or None, parse error or None)
+ImportRecord = Tuple[int, Optional[Dict], Optional[str]]
+
+
+class VehicleImportService:
+    """
+    Bulk vehicle import from CSV or NDJSON.
+
+    Records are read lazily from the uploaded file and handled CHUNK_SIZE
+    at a time: each is validated against VehicleCreate, plates repeated
+    within the chunk or already in the database (one IN query per chunk)
+    are rejected, and the rest are inserted with one executemany. Earlier
+    chunks are already inserted when a later one is checked, so repeats
+    across chunks are caught by the same query. Memory is bounded by the
+    chunk size plus at most MAX_REPORTED_ERRORS error entries.
+    """
+
+    CHUNK_SIZE = 1000
+    MAX_REPORTED_ERRORS = 1000
+
+    @staticmethod
+    def read_records(file: IO[bytes], fmt: str) -> Iterator[ImportRecord]:
+        """Parse an uploaded file line by line into (line, record, error) tuples"""
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unsupported import format {fmt!r}")
+
+        text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+        try:
+            if fmt == "csv":
+                reader = csv.DictReader(text)
+                for row in reader:
+                    # Empty cells fall back to the schema defaults; unknown columns are ignored
+                    yield reader.line_num, {key: value for key, value in row.items() if key and value not in ("", None)}, None
+            else:
+                for line_number, line in enumerate(text, start=1):
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except ValueError as e:
+                        yield line_number, None, f"Invalid JSON: {e}"
+                        continue
+                    if isinstance(record, dict):
+                        yield line_number, record, None
+                    else:
+                        yield line_number, None, "Each line must be a JSON object"
+        finally:
+            text.detach()
+
+    @staticmethod
+    def import_vehicles(db: Session, records: Iterable[ImportRecord]) -> Dict:
+        """
+        Insert every valid record as a new available vehicle.
+
+        Returns counts and per-row errors ({line, license_plate, detail}),
+        at most MAX_REPORTED_ERRORS of them. The caller commits.
+        """
+        summary = {"created": 0, "failed": 0, "errors": [], "errors_truncated": False}
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, VehicleImportService.CHUNK_SIZE))
+            if not chunk:
+                return summary
+            VehicleImportService._import_chunk(db, chunk, summary)
+
+    @staticmethod
+    def _import_chunk(db: Session, chunk: List[ImportRecord], summary: Dict):
+        def fail(line: int, license_plate: Optional[str], detail: str):
+            summary["failed"] += 1
+            if len(summary["errors"]) < VehicleImportService.MAX_REPORTED_ERRORS:
+                summary["errors"].append({"line": line, "license_plate": license_plate, "detail": detail})
+            else:
+                summary["errors_truncated"] = True
+
+        valid: Dict[str, Tuple[int, VehicleCreate]] = {}
+        for line, record, error in chunk:
+            if error:
+                fail(line, None, error)
+                continue
+            try:
+                vehicle = VehicleCreate.model_validate(record)
+            except ValidationError as e:
+                fail(line, record.get("license_plate"), "; ".join(
+                    f"{'.'.join(str(part) for part in issue['loc']) or 'row'}: {issue['msg']}" for issue in e.errors()
+                ))
+                continue
+            if vehicle.license_plate in valid:
+                fail(line, vehicle.license_plate, f"Duplicate license plate (line {valid[vehicle.license_plate][0]})")
+                continue
+            valid[vehicle.license_plate] = (line, vehicle)
+
+        if not valid:
+            return
+
+        existing = set(db.execute(
+            select(Vehicle.license_plate).where(Vehicle.license_plate.in_(list(valid)))
+        ).scalars())
+
+        now = datetime.utcnow()
+        rows = []
+        for license_plate, (line, vehicle) in valid.items():
+            if license_plate in existing:
+                fail(line, license_plate, "Vehicle with this license plate already exists")
+                continue
+            rows.append({
+                "id": uuid.uuid4(),
+                "license_plate": license_plate,
+                "make": vehicle.make,
+                "model": vehicle.model,
+                "year": vehicle.year,
+                "location": vehicle.location,
+                "mileage": vehicle.mileage,
+                "status": VehicleStatus.AVAILABLE,
+                "health_score": 100.0,
+                "is_active": True,
+                "created_at": now,
+                "updated_at": now,
+            })
+
+        if rows:
+            db.execute(insert(Vehicle), rows)
+            summary["created"] += len(rows)
+            stage_analytics_change(
+                db, VEHICLE_FACTS,
+                locations={row["location"] for row in rows},
+                vehicle_ids=[row["id"] for row in rows]
+            )
@@ -1,11 +1,18 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import Float, String, Uuid, bindparam, case, column, func, select, update, values
 from sqlalchemy.orm import Session
 from app.models import Vehicle
 from app.schemas import VehicleStatus
+from app.services.analytics_cache import VEHICLE_FACTS, stage_analytics_change
+from app.services.pagination import DEFAULT_PAGE_SIZE, keyset_page
 import uuid
 
 
+# (vehicle id, recorded at, mileage or None, location or None)
+ReadingTuple = Tuple[uuid.UUID, datetime, Optional[float], Optional[str]]
+
+
 class VehicleService:
     """Service for managing vehicle lifecycle and operations"""
     
@@ -33,6 +40,7 @@ class VehicleService:
         )
         
         db.add(vehicle)
+        stage_analytics_change(db, VEHICLE_FACTS, locations={location}, vehicle_ids={vehicle.id})
         return vehicle
     
     @staticmethod
@@ -50,6 +58,45 @@ class VehicleService:
         
         return query.order_by(Vehicle.created_at.desc()).all()
     
+    @staticmethod
+    def search_vehicles(
+        db: Session,
+        status: Optional[VehicleStatus] = None,
+        location: Optional[str] = None,
+        make: Optional[str] = None,
+        model: Optional[str] = None,
+        min_health_score: Optional[float] = None,
+        max_health_score: Optional[float] = None,
+        cursor: Optional[str] = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        columns: Optional[Sequence] = None
+    ) -> Tuple[List[Vehicle], Optional[str]]:
+        """
+        One page of active vehicles matching every given filter, newest first.
+        
+        Filters and ordering run in SQL; pages are keyed on (created_at, id)
+        so each page costs the same however deep it is. Returns the vehicles
+        (or, with columns, plain rows of just those columns) and the cursor
+        of the next page (None on the last page). Raises InvalidCursorError
+        for a malformed cursor.
+        """
+        query = (db.query(*columns) if columns else db.query(Vehicle)).filter(Vehicle.is_active == True)
+        
+        if status:
+            query = query.filter(Vehicle.status == status)
+        if location:
+            query = query.filter(Vehicle.location == location)
+        if make:
+            query = query.filter(Vehicle.make == make)
+        if model:
+            query = query.filter(Vehicle.model == model)
+        if min_health_score is not None:
+            query = query.filter(Vehicle.health_score >= min_health_score)
+        if max_health_score is not None:
+            query = query.filter(Vehicle.health_score <= max_health_score)
+        
+        return keyset_page(query, [(Vehicle.created_at, True), (Vehicle.id, True)], cursor, limit)
+    
     @staticmethod
     def get_available_vehicles(
         db: Session,
@@ -91,6 +138,7 @@ class VehicleService:
             )
         
         vehicle.status = new_status
+        stage_analytics_change(db, VEHICLE_FACTS, locations={vehicle.location}, vehicle_ids={vehicle_id})
         return vehicle
     
     @staticmethod
@@ -108,14 +156,115 @@ class VehicleService:
             raise ValueError("Mileage cannot decrease")
         
         vehicle.mileage = new_mileage
+        vehicle.health_score = VehicleService.health_score_for_mileage(new_mileage)
+        stage_analytics_change(db, VEHICLE_FACTS, locations={vehicle.location}, vehicle_ids={vehicle_id})
         
-        # Update health score based on mileage (predictive maintenance)
+        return vehicle
+    
+    @staticmethod
+    def health_score_for_mileage(mileage: float) -> float:
+        """Health score (0-100) for a mileage, used for predictive maintenance"""
         # Health decreases gradually with mileage
         max_mileage = 500000  # Assume vehicle lifecycle ends at 500k km
-        health_percentage = max(0, 100 * (1 - (new_mileage / max_mileage)))
-        vehicle.health_score = round(health_percentage, 2)
+        health_percentage = max(0, 100 * (1 - (mileage / max_mileage)))
+        return round(health_percentage, 2)
+    
+    @staticmethod
+    def ingest_telemetry(db: Session, readings: Iterable[ReadingTuple]) -> Dict:
+        """
+        Apply a batch of device readings in one read and one UPDATE.
         
-        return vehicle
+        Readings are coalesced to the latest mileage and the latest location
+        per vehicle (by recorded_at). Unknown or inactive vehicles and
+        mileage below the stored value are rejected per vehicle; a rejected
+        mileage does not stop the location from being applied. The update
+        repeats the non-decreasing mileage check in SQL, so a concurrent
+        higher reading is never overwritten, and sets the health score from
+        the new mileage. Returns counts and the rejections; the caller
+        commits.
+        """
+        received = 0
+        latest_mileage: Dict[uuid.UUID, Tuple[datetime, float]] = {}
+        latest_location: Dict[uuid.UUID, Tuple[datetime, str]] = {}
+        for vehicle_id, recorded_at, mileage, location in readings:
+            received += 1
+            for latest, value in ((latest_mileage, mileage), (latest_location, location)):
+                if value is not None and (vehicle_id not in latest or recorded_at >= latest[vehicle_id][0]):
+                    latest[vehicle_id] = (recorded_at, value)
+        
+        vehicle_ids = list(dict.fromkeys([*latest_mileage, *latest_location]))
+        summary = {"received": received, "vehicles": len(vehicle_ids), "updated": 0, "rejected": []}
+        if not vehicle_ids:
+            return summary
+        
+        current = {
+            row.id: row for row in db.execute(
+                select(Vehicle.id, Vehicle.mileage, Vehicle.location)
+                .where(Vehicle.id.in_(vehicle_ids), Vehicle.is_active == True)
+            )
+        }
+        
+        changes = []
+        touched_locations = set()
+        for vehicle_id in vehicle_ids:
+            row = current.get(vehicle_id)
+            if row is None:
+                summary["rejected"].append({"vehicle_id": vehicle_id, "detail": "Vehicle not found"})
+                continue
+            
+            mileage = latest_mileage.get(vehicle_id, (None, None))[1]
+            if mileage is not None and mileage < row.mileage:
+                summary["rejected"].append({"vehicle_id": vehicle_id, "detail": "Mileage cannot decrease"})
+                mileage = None
+            if mileage == row.mileage:
+                mileage = None
+            
+            location = latest_location.get(vehicle_id, (None, None))[1]
+            if location == row.location:
+                location = None
+            
+            if mileage is not None or location is not None:
+                health_score = VehicleService.health_score_for_mileage(mileage) if mileage is not None else None
+                changes.append((vehicle_id, mileage, health_score, location))
+                touched_locations.update({row.location, location} - {None})
+        
+        if not changes:
+            return summary
+        
+        vehicles = Vehicle.__table__
+        postgres = db.get_bind().dialect.name == "postgresql"
+        if postgres:
+            # UPDATE ... FROM (VALUES ...): the whole batch in one statement
+            source = values(
+                column("id", Uuid(as_uuid=True)),
+                column("mileage", Float),
+                column("health_score", Float),
+                column("location", String),
+                name="telemetry"
+            ).data(changes).c
+        else:
+            # SQLite cannot name the columns of a VALUES list; send the same UPDATE as one executemany
+            source = {name: bindparam(f"new_{name}") for name in ("id", "mileage", "health_score", "location")}
+        
+        advances = source["mileage"] >= vehicles.c.mileage
+        stmt = update(vehicles).where(vehicles.c.id == source["id"], vehicles.c.is_active == True).values(
+            mileage=case((advances, source["mileage"]), else_=vehicles.c.mileage),
+            health_score=case((advances, source["health_score"]), else_=vehicles.c.health_score),
+            location=func.coalesce(source["location"], vehicles.c.location),
+        )
+        result = db.execute(stmt) if postgres else db.execute(stmt, [
+            {"new_id": vehicle_id, "new_mileage": mileage, "new_health_score": health_score, "new_location": location}
+            for vehicle_id, mileage, health_score, location in changes
+        ])
+        summary["updated"] = result.rowcount
+        
+        # Mileage changes move the health score, location changes move the vehicle
+        stage_analytics_change(
+            db, VEHICLE_FACTS,
+            locations=touched_locations,
+            vehicle_ids={vehicle_id for vehicle_id, _, _, _ in changes}
+        )
+        return summary
     
     @staticmethod
     def update_vehicle_location(
@@ -128,6 +277,7 @@ class VehicleService:
         if not vehicle:
             raise ValueError(f"Vehicle {vehicle_id} not found")
         
+        stage_analytics_change(db, VEHICLE_FACTS, locations={vehicle.location, location}, vehicle_ids={vehicle_id})
         vehicle.location = location
         return vehicle
     
@@ -140,6 +290,7 @@ class VehicleService:
         
         vehicle.is_active = False
         vehicle.status = VehicleStatus.INACTIVE
+        stage_analytics_change(db, VEHICLE_FACTS, locations={vehicle.location}, vehicle_ids={vehicle_id})
         return vehicle
     
     @staticmethod
@@ -0,0 +1,181 @@
+"""
+Usage heatmap benchmark: a year of trips through AnalyticsService.get_usage_heatmap.
+
+A fresh SQLite file is seeded with vehicles and a year of completed trips,
+then the 7x24 heatmap (with the per-location breakdown) is timed against a
+straightforward Python implementation that loads Trip objects and walks
+each trip hour by hour. Both grids are compared.
+
+Usage:
+    python -m benchmarks.analytics_heatmap --trips 100000
+    python -m benchmarks.analytics_heatmap --output benchmarks/results/analytics.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Booking, Trip, User, Vehicle
+from app.schemas import BookingStatus, UserRole, VehicleStatus
+from app.services import AnalyticsService
+
+
+WINDOW_START = datetime(2025, 1, 1)
+WINDOW_END = datetime(2026, 1, 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Usage heatmap benchmark")
+    parser.add_argument("--vehicles", type=int, default=500, help="Fleet size")
+    parser.add_argument("--trips", type=int, default=100000, help="Completed trips over the year")
+    parser.add_argument("--locations", type=int, default=10, help="Distinct vehicle locations")
+    parser.add_argument("--skip-legacy", action="store_true", help="Do not time the hour-by-hour implementation")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument("--output", default=None, help="Append the JSON result to this JSON Lines file")
+    return parser.parse_args(argv)
+
+
+def legacy_usage_heatmap(db, start_date, end_date):
+    """Load every overlapping trip and add its clipped time to each hour it spans"""
+    grid = [[0.0] * 24 for _ in range(7)]
+    trips = db.query(Trip).filter(
+        Trip.start_time <= end_date,
+        Trip.end_time > start_date
+    ).all()
+    for trip in trips:
+        moment = max(trip.start_time, start_date)
+        end = min(trip.end_time, end_date)
+        while moment < end:
+            next_hour = moment.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            grid[moment.weekday()][moment.hour] += (min(end, next_hour) - moment).total_seconds() / 3600.0
+            moment = next_hour
+    return grid
+
+
+def seed(engine, vehicles, trips, locations, rng):
+    """Bulk-insert a fleet and trips of 15 minutes to 12 hours spread over the year"""
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+    window_minutes = int((WINDOW_END - WINDOW_START).total_seconds() // 60)
+
+    vehicle_ids = [uuid.uuid4() for _ in range(vehicles)]
+    vehicle_rows = [{
+        "id": vehicle_id, "license_plate": f"HEAT{i:06d}", "make": "Bench", "model": "Load",
+        "year": 2024, "status": VehicleStatus.AVAILABLE, "location": f"Zone {i % locations}",
+        "mileage": 0.0, "health_score": 100.0, "is_active": True, "created_at": now, "updated_at": now,
+    } for i, vehicle_id in enumerate(vehicle_ids)]
+
+    booking_rows, trip_rows = [], []
+    for _ in range(trips):
+        vehicle = rng.choice(vehicle_rows)
+        vehicle_id = vehicle["id"]
+        start = WINDOW_START + timedelta(minutes=rng.randrange(window_minutes))
+        end = start + timedelta(minutes=rng.randint(15, 720))
+        booking_id = uuid.uuid4()
+        booking_rows.append({
+            "id": booking_id, "user_id": user_id, "vehicle_id": vehicle_id, "start_time": start,
+            "end_time": end, "status": BookingStatus.COMPLETED, "created_at": now, "updated_at": now,
+            "version": now, "vehicle_location": vehicle["location"],
+        })
+        trip_rows.append({
+            "id": uuid.uuid4(), "booking_id": booking_id, "vehicle_id": vehicle_id, "user_id": user_id,
+            "vehicle_location": vehicle["location"],
+            "start_time": start, "end_time": end, "distance_traveled": rng.uniform(5, 300),
+            "mileage_start": 0.0, "mileage_end": 0.0, "created_at": now, "updated_at": now,
+        })
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "id": user_id, "username": "bench", "email": "bench@example.com", "hashed_password": "not-used",
+            "role": UserRole.FLEET_MANAGER, "is_active": True, "created_at": now, "updated_at": now,
+        }])
+        conn.execute(Vehicle.__table__.insert(), vehicle_rows)
+        if booking_rows:
+            conn.execute(Booking.__table__.insert(), booking_rows)
+            conn.execute(Trip.__table__.insert(), trip_rows)
+
+
+def timed(engine, func):
+    """Run func(db) in a fresh session; return (result, seconds, statements executed)"""
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        result = func(db)
+        return result, time.perf_counter() - started, len(statements)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+
+    with tempfile.TemporaryDirectory(prefix="fleet-bench-") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'heatmap.db')}")
+        Base.metadata.create_all(bind=engine)
+        seed(engine, args.vehicles, args.trips, args.locations, rng)
+
+        heatmap, heatmap_seconds, heatmap_queries = timed(engine, lambda db: AnalyticsService.get_usage_heatmap(
+            db, WINDOW_START, WINDOW_END, by_location=True
+        ))
+        result = {
+            "vehicles": args.vehicles,
+            "trips": args.trips,
+            "locations": len(heatmap["locations"]),
+            "heatmap": {"seconds": round(heatmap_seconds, 4), "queries": heatmap_queries},
+            "peak": heatmap["peaks"][0]["label"] if heatmap["peaks"] else None,
+        }
+
+        if not args.skip_legacy:
+            legacy, legacy_seconds, legacy_queries = timed(engine, lambda db: legacy_usage_heatmap(
+                db, WINDOW_START, WINDOW_END
+            ))
+            result["legacy"] = {"seconds": round(legacy_seconds, 4), "queries": legacy_queries}
+            result["speedup"] = round(legacy_seconds / heatmap_seconds, 1) if heatmap_seconds else None
+            result["same_grid"] = bool(np.allclose(legacy, heatmap["vehicle_hours"], atol=0.01))
+
+        engine.dispose()
+
+    print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        "benchmark": "analytics_heatmap",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "database": "sqlite",
+        "config": {
+            "vehicles": args.vehicles,
+            "trips": args.trips,
+            "locations": args.locations,
+            "seed": args.seed,
+        },
+        "results": result,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,209 @@
+"""
+Underutilized-vehicle detection benchmark: per-vehicle N+1 vs one aggregate.
+
+For each fleet size a fresh SQLite file is seeded with vehicles and completed
+trips, then the original implementation (one utilization query per vehicle)
+and AnalyticsService.get_underutilized_vehicles (one GROUP BY query) are
+timed on the same data and their results compared.
+
+Usage:
+    python -m benchmarks.analytics_underutilized --sizes 1000,10000,50000
+    python -m benchmarks.analytics_underutilized --output benchmarks/results/analytics.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Booking, Trip, User, Vehicle
+from app.schemas import BookingStatus, UserRole, VehicleStatus
+from app.services import AnalyticsService
+
+
+WINDOW_START = datetime(2026, 1, 1)
+WINDOW_END = datetime(2026, 1, 31)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Underutilized-vehicle detection benchmark")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="Comma-separated fleet sizes")
+    parser.add_argument("--trips-per-vehicle", type=int, default=5, help="Average completed trips per vehicle")
+    parser.add_argument("--threshold", type=float, default=20.0, help="Utilization threshold percentage")
+    parser.add_argument("--page-size", type=int, default=100, help="Page size for the paginated run")
+    parser.add_argument("--skip-legacy-above", type=int, default=None,
+                        help="Do not time the N+1 implementation for fleets larger than this")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument("--output", default=None, help="Append the JSON result to this JSON Lines file")
+    return parser.parse_args(argv)
+
+
+def legacy_underutilized_vehicles(db, start_date, end_date, threshold_percentage):
+    """The pre-aggregate implementation: load every vehicle, then its trips"""
+    vehicles = db.query(Vehicle).filter(Vehicle.is_active == True).all()
+    total_hours = (end_date - start_date).total_seconds() / 3600.0
+
+    underutilized = []
+    for vehicle in vehicles:
+        trips = db.query(Trip).filter(
+            Trip.vehicle_id == vehicle.id,
+            Trip.start_time >= start_date,
+            Trip.start_time <= end_date,
+            Trip.end_time.isnot(None)
+        ).all()
+        hours_in_use = sum(trip.get_duration_hours() for trip in trips)
+        utilization = round((hours_in_use / total_hours) * 100, 2) if total_hours > 0 else 0
+        if utilization < threshold_percentage:
+            underutilized.append({
+                "vehicle_id": str(vehicle.id),
+                "license_plate": vehicle.license_plate,
+                "utilization_percentage": utilization,
+                "total_trips": len(trips),
+                "health_score": vehicle.health_score
+            })
+
+    return sorted(underutilized, key=lambda x: x["utilization_percentage"])
+
+
+def seed(engine, vehicles, trips_per_vehicle, rng):
+    """Bulk-insert a fleet whose utilization spreads from idle to busy"""
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+    window_hours = int((WINDOW_END - WINDOW_START).total_seconds() // 3600)
+
+    vehicle_rows, booking_rows, trip_rows = [], [], []
+    for i in range(vehicles):
+        vehicle_id = uuid.uuid4()
+        vehicle_rows.append({
+            "id": vehicle_id, "license_plate": f"BENCH{i:06d}", "make": "Bench", "model": "Load",
+            "year": 2024, "status": VehicleStatus.AVAILABLE, "location": f"Zone {i % 10}",
+            "mileage": 0.0, "health_score": 100.0, "is_active": True, "created_at": now, "updated_at": now,
+        })
+        for _ in range(rng.randint(0, trips_per_vehicle * 2)):
+            start = WINDOW_START + timedelta(hours=rng.randrange(window_hours - 24))
+            end = start + timedelta(hours=rng.randint(1, 24))
+            booking_id = uuid.uuid4()
+            booking_rows.append({
+                "id": booking_id, "user_id": user_id, "vehicle_id": vehicle_id, "start_time": start,
+                "end_time": end, "status": BookingStatus.COMPLETED, "created_at": now, "updated_at": now,
+                "version": now,
+            })
+            trip_rows.append({
+                "id": uuid.uuid4(), "booking_id": booking_id, "vehicle_id": vehicle_id, "user_id": user_id,
+                "start_time": start, "end_time": end, "distance_traveled": rng.uniform(5, 300),
+                "mileage_start": 0.0, "mileage_end": 0.0, "created_at": now, "updated_at": now,
+            })
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "id": user_id, "username": "bench", "email": "bench@example.com", "hashed_password": "not-used",
+            "role": UserRole.FLEET_MANAGER, "is_active": True, "created_at": now, "updated_at": now,
+        }])
+        conn.execute(Vehicle.__table__.insert(), vehicle_rows)
+        if booking_rows:
+            conn.execute(Booking.__table__.insert(), booking_rows)
+            conn.execute(Trip.__table__.insert(), trip_rows)
+
+    return len(trip_rows)
+
+
+def timed(engine, func):
+    """Run func(db) in a fresh session; return (result, seconds, statements executed)"""
+    statements = []
+
+    def count(*args):
+        statements.append(1)
+
+    event.listen(engine, "before_cursor_execute", count)
+    db = sessionmaker(bind=engine)()
+    try:
+        started = time.perf_counter()
+        result = func(db)
+        return result, time.perf_counter() - started, len(statements)
+    finally:
+        db.close()
+        event.remove(engine, "before_cursor_execute", count)
+
+
+def run_size(args, vehicles, workdir):
+    rng = random.Random(args.seed)
+    engine = create_engine(f"sqlite:///{os.path.join(workdir, f'analytics-{vehicles}.db')}")
+    Base.metadata.create_all(bind=engine)
+    trips = seed(engine, vehicles, args.trips_per_vehicle, rng)
+
+    aggregate, aggregate_seconds, aggregate_queries = timed(engine, lambda db: AnalyticsService.get_underutilized_vehicles(
+        db, WINDOW_START, WINDOW_END, args.threshold
+    ))
+    _, page_seconds, _ = timed(engine, lambda db: AnalyticsService.get_underutilized_vehicles(
+        db, WINDOW_START, WINDOW_END, args.threshold, limit=args.page_size
+    ))
+
+    result = {
+        "vehicles": vehicles,
+        "trips": trips,
+        "underutilized": len(aggregate),
+        "aggregate": {
+            "seconds": round(aggregate_seconds, 4),
+            "queries": aggregate_queries,
+            "first_page_seconds": round(page_seconds, 4),
+        },
+    }
+
+    if args.skip_legacy_above is None or vehicles <= args.skip_legacy_above:
+        legacy, legacy_seconds, legacy_queries = timed(engine, lambda db: legacy_underutilized_vehicles(
+            db, WINDOW_START, WINDOW_END, args.threshold
+        ))
+        result["legacy"] = {"seconds": round(legacy_seconds, 4), "queries": legacy_queries}
+        result["speedup"] = round(legacy_seconds / aggregate_seconds, 1) if aggregate_seconds else None
+        # Rounding to 2 decimals before the threshold check may differ at the boundary only
+        result["same_vehicles"] = (
+            {v["vehicle_id"] for v in legacy} == {v["vehicle_id"] for v in aggregate}
+        )
+
+    engine.dispose()
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+
+    with tempfile.TemporaryDirectory(prefix="fleet-bench-") as workdir:
+        results = []
+        for vehicles in sizes:
+            results.append(run_size(args, vehicles, workdir))
+            print(json.dumps(results[-1]), file=sys.stderr)
+
+    report = {
+        "benchmark": "analytics_underutilized",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "database": "sqlite",
+        "config": {
+            "sizes": sizes,
+            "trips_per_vehicle": args.trips_per_vehicle,
+            "threshold": args.threshold,
+            "page_size": args.page_size,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+List read path benchmark: ORM objects + response models vs column projections.
+
+A fresh SQLite file is seeded with vehicles, bookings and trips. For each
+list (vehicles, bookings, trips) one page of --rows rows is read and
+serialized to JSON twice: the default path (ORM instances validated into
+Page[...Response] and dumped the way FastAPI does) and the projection path
+(plain column rows encoded by projections.encode_page). Each run reports
+per-row CPU time and peak traced memory, and both JSON bodies are compared.
+
+The page size cap is lifted for the run so a single page holds --rows rows.
+
+Usage:
+    python -m benchmarks.list_projection --rows 10000
+    python -m benchmarks.list_projection --output benchmarks/results/list_projection.jsonl
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Booking, Trip, User, Vehicle
+from app.schemas import BookingResponse, BookingStatus, Page, TripResponse, UserRole, VehicleResponse, VehicleStatus
+from app.services import BookingService, TripService, VehicleService, pagination
+from app.services.projections import BOOKING_LIST_COLUMNS, TRIP_LIST_COLUMNS, VEHICLE_LIST_COLUMNS, encode_page
+
+
+START = datetime(2026, 1, 1)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="List read path benchmark")
+    parser.add_argument("--rows", type=int, default=10000, help="Rows per list page")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per path; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument("--output", default=None, help="Append the JSON result to this JSON Lines file")
+    return parser.parse_args(argv)
+
+
+def seed(engine, rows, rng):
+    """Bulk-insert rows vehicles, and rows bookings with one trip each, all for one user"""
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+
+    vehicle_rows = [{
+        "id": uuid.uuid4(), "license_plate": f"LIST{i:06d}", "make": rng.choice(["Toyota", "Ford", "Kia"]),
+        "model": "Bench", "year": 2024, "status": VehicleStatus.AVAILABLE, "location": f"Zone {i % 10}",
+        "mileage": rng.uniform(0, 100000), "health_score": rng.uniform(30, 100), "is_active": True,
+        "created_at": START + timedelta(minutes=i), "updated_at": now,
+    } for i in range(rows)]
+
+    booking_rows, trip_rows = [], []
+    for i in range(rows):
+        vehicle_id = rng.choice(vehicle_rows)["id"]
+        start = START + timedelta(minutes=10 * i)
+        booking_id = uuid.uuid4()
+        booking_rows.append({
+            "id": booking_id, "user_id": user_id, "vehicle_id": vehicle_id, "start_time": start,
+            "end_time": start + timedelta(hours=1), "status": BookingStatus.COMPLETED,
+            "created_at": now, "updated_at": now, "version": now,
+        })
+        trip_rows.append({
+            "id": uuid.uuid4(), "booking_id": booking_id, "vehicle_id": vehicle_id, "user_id": user_id,
+            "start_time": start, "end_time": start + timedelta(minutes=50), "start_location": "Depot",
+            "end_location": "Depot", "distance_traveled": rng.uniform(1, 80), "mileage_start": 0.0,
+            "mileage_end": 10.0, "created_at": now, "updated_at": now,
+        })
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "id": user_id, "username": "bench", "email": "bench@example.com", "hashed_password": "not-used",
+            "role": UserRole.FLEET_MANAGER, "is_active": True, "created_at": now, "updated_at": now,
+        }])
+        conn.execute(Vehicle.__table__.insert(), vehicle_rows)
+        conn.execute(Booking.__table__.insert(), booking_rows)
+        conn.execute(Trip.__table__.insert(), trip_rows)
+    return user_id
+
+
+def orm_body(fetch, model):
+    """The default path: ORM instances, validated and serialized like a FastAPI response_model"""
+    items, next_cursor = fetch(None)
+    adapter = TypeAdapter(Page[model])
+    value = adapter.validate_python({"items": items, "next_cursor": next_cursor}, from_attributes=True)
+    return json.dumps(adapter.dump_python(value, mode="json")).encode()
+
+
+def projection_body(fetch, columns):
+    rows, next_cursor = fetch(columns)
+    return encode_page(rows, columns, next_cursor)
+
+
+def measure(session_factory, build, repeat):
+    """Fastest CPU time over repeat runs in fresh sessions, and peak traced memory of one run"""
+    best = None
+    for _ in range(repeat):
+        db = session_factory()
+        try:
+            gc.collect()
+            started = time.process_time()
+            body = build(db)
+            elapsed = time.process_time() - started
+        finally:
+            db.close()
+        best = elapsed if best is None else min(best, elapsed)
+
+    db = session_factory()
+    try:
+        gc.collect()
+        tracemalloc.start()
+        build(db)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        db.close()
+    return body, best, peak
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    pagination.MAX_PAGE_SIZE = max(pagination.MAX_PAGE_SIZE, args.rows)
+
+    lists = {
+        "vehicles": (VehicleResponse, VEHICLE_LIST_COLUMNS,
+                     lambda db, user_id: lambda columns: VehicleService.search_vehicles(
+                         db, limit=args.rows, columns=columns)),
+        "bookings": (BookingResponse, BOOKING_LIST_COLUMNS,
+                     lambda db, user_id: lambda columns: BookingService.get_user_bookings(
+                         db, user_id, limit=args.rows, columns=columns)),
+        "trips": (TripResponse, TRIP_LIST_COLUMNS,
+                  lambda db, user_id: lambda columns: TripService.get_user_trips(
+                      db, user_id, limit=args.rows, columns=columns)),
+    }
+
+    result = {}
+    with tempfile.TemporaryDirectory(prefix="fleet-bench-") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'lists.db')}")
+        Base.metadata.create_all(bind=engine)
+        user_id = seed(engine, args.rows, rng)
+        session_factory = sessionmaker(bind=engine)
+
+        for name, (model, columns, fetcher) in lists.items():
+            orm, orm_seconds, orm_peak = measure(
+                session_factory, lambda db: orm_body(fetcher(db, user_id), model), args.repeat
+            )
+            projected, projected_seconds, projected_peak = measure(
+                session_factory, lambda db: projection_body(fetcher(db, user_id), columns), args.repeat
+            )
+            rows = len(json.loads(projected)["items"])
+            result[name] = {
+                "rows": rows,
+                "orm": {
+                    "cpu_us_per_row": round(orm_seconds / rows * 1e6, 2),
+                    "peak_bytes_per_row": round(orm_peak / rows),
+                },
+                "projection": {
+                    "cpu_us_per_row": round(projected_seconds / rows * 1e6, 2),
+                    "peak_bytes_per_row": round(projected_peak / rows),
+                },
+                "cpu_speedup": round(orm_seconds / projected_seconds, 1) if projected_seconds else None,
+                "memory_ratio": round(orm_peak / projected_peak, 1) if projected_peak else None,
+                "same_body": json.loads(orm) == json.loads(projected),
+            }
+
+        engine.dispose()
+
+    print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        "benchmark": "list_projection",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "database": "sqlite",
+        "config": {"rows": args.rows, "repeat": args.repeat, "seed": args.seed},
+        "results": result,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+    print(json.dumps(report, indent=2))
+    return 0 if all(entry["same_body"] for entry in result.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+"""
+Occupancy calendar benchmark: per-vehicle bitmap loop vs per-slot fleet bitsets.
+
+A fresh SQLite file is seeded with --vehicles vehicles and about
+--bookings-per-vehicle confirmed bookings each, spread over the calendar
+horizon. The OccupancyCalendar is warmed from it, and --queries random
+windows (15 minutes to --max-window-hours, half of them not slot-aligned)
+are answered over the whole fleet two ways, once for the first --limit free
+vehicles (as find_available_vehicles asks) and once without a limit:
+
+- legacy: one Python int bitmap per vehicle, tested vehicle by vehicle the
+  way the calendar used to answer free_vehicles
+- calendar: OccupancyCalendar.free_vehicles, which ORs the window's slot rows
+  into one busy bitset and checks candidates against the busy vehicles
+
+Each run reports milliseconds per query and whether both ways returned the
+same vehicles for every window.
+
+Usage:
+    python -m benchmarks.occupancy_calendar --vehicles 50000
+    python -m benchmarks.occupancy_calendar --output benchmarks/results/occupancy.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base
+from app.models import Booking, User, Vehicle
+from app.schemas import BookingStatus, UserRole, VehicleStatus
+from app.services import OccupancyCalendar
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Occupancy calendar benchmark")
+    parser.add_argument("--vehicles", type=int, default=50000, help="Fleet size")
+    parser.add_argument("--bookings-per-vehicle", type=int, default=4, help="Average active bookings per vehicle")
+    parser.add_argument("--queries", type=int, default=200, help="Fleet-wide availability queries to time")
+    parser.add_argument("--max-window-hours", type=int, default=8, help="Longest queried window")
+    parser.add_argument("--limit", type=int, default=50, help="Free vehicles asked for by the limited queries")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for the synthetic data")
+    parser.add_argument("--output", default=None, help="Append the JSON result to this JSON Lines file")
+    return parser.parse_args(argv)
+
+
+def seed(engine, vehicles, bookings_per_vehicle, epoch, horizon, rng):
+    """Bulk-insert vehicles and confirmed bookings inside the horizon; returns vehicle IDs newest first"""
+    user_id = uuid.uuid4()
+    now = datetime.utcnow()
+
+    vehicle_rows = [{
+        "id": uuid.uuid4(), "license_plate": f"OCC{i:06d}", "make": "Kia", "model": "Bench", "year": 2024,
+        "status": VehicleStatus.AVAILABLE, "location": f"Zone {i % 10}", "mileage": 0.0, "health_score": 100.0,
+        "is_active": True, "created_at": epoch - timedelta(minutes=i), "updated_at": now,
+    } for i in range(vehicles)]
+
+    booking_rows = []
+    for _ in range(vehicles * bookings_per_vehicle):
+        start = epoch + timedelta(minutes=rng.randrange(0, int((horizon - timedelta(days=1)).total_seconds() // 60)))
+        booking_rows.append({
+            "id": uuid.uuid4(), "user_id": user_id, "vehicle_id": rng.choice(vehicle_rows)["id"],
+            "start_time": start, "end_time": start + timedelta(minutes=rng.randrange(20, 600)),
+            "status": BookingStatus.CONFIRMED, "created_at": now, "updated_at": now, "version": now,
+        })
+
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{
+            "id": user_id, "username": "bench", "email": "bench@example.com", "hashed_password": "not-used",
+            "role": UserRole.USER, "is_active": True, "created_at": now, "updated_at": now,
+        }])
+        conn.execute(Vehicle.__table__.insert(), vehicle_rows)
+        conn.execute(Booking.__table__.insert(), booking_rows)
+    return [row["id"] for row in vehicle_rows], booking_rows
+
+
+class LegacyCalendar:
+    """The previous layout: one Python int bitmap per vehicle, checked vehicle by vehicle"""
+
+    def __init__(self, calendar, booking_rows):
+        self.calendar = calendar
+        self.bitmaps = {}
+        self.intervals = {}
+        for row in booking_rows:
+            first, last = calendar._slot_range(row["start_time"], row["end_time"])
+            bits = ((1 << (last - first)) - 1) << first if first < last else 0
+            self.bitmaps[row["vehicle_id"]] = self.bitmaps.get(row["vehicle_id"], 0) | bits
+            self.intervals.setdefault(row["vehicle_id"], []).append((row["start_time"], row["end_time"]))
+
+    def free_vehicles(self, vehicle_ids, start_time, end_time, limit=None):
+        first, last, inner_first, inner_last = self.calendar._window_slots(start_time, end_time)
+        window = ((1 << (last - first)) - 1) << first if first < last else 0
+        interior = ((1 << (inner_last - inner_first)) - 1) << inner_first if inner_first < inner_last else 0
+
+        free = []
+        for vehicle_id in vehicle_ids:
+            touched = self.bitmaps.get(vehicle_id, 0) & window
+            if touched and (touched & interior or any(
+                start < end_time and end > start_time for start, end in self.intervals[vehicle_id]
+            )):
+                continue
+            free.append(vehicle_id)
+            if limit is not None and len(free) >= limit:
+                break
+        return free
+
+
+def timed(func, windows):
+    started = time.perf_counter()
+    answers = [func(start, end) for start, end in windows]
+    return answers, time.perf_counter() - started
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    calendar = OccupancyCalendar()
+    epoch = OccupancyCalendar._current_epoch()
+    horizon = calendar.slot * calendar.slots
+
+    with tempfile.TemporaryDirectory(prefix="fleet-bench-") as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'occupancy.db')}")
+        Base.metadata.create_all(bind=engine)
+        vehicle_ids, booking_rows = seed(engine, args.vehicles, args.bookings_per_vehicle, epoch, horizon, rng)
+
+        db = sessionmaker(bind=engine)()
+        try:
+            started = time.perf_counter()
+            loaded = calendar.warm(db)
+            warm_seconds = time.perf_counter() - started
+        finally:
+            db.close()
+        engine.dispose()
+
+    legacy = LegacyCalendar(calendar, booking_rows)
+    windows = []
+    for i in range(args.queries):
+        start = epoch + timedelta(days=1, minutes=rng.randrange(0, 27 * 24 * 60))
+        if i % 2 == 0:
+            start = epoch + (start - epoch) // calendar.slot * calendar.slot
+        windows.append((start, start + timedelta(minutes=rng.randrange(15, args.max_window_hours * 60 + 1))))
+
+    result = {
+        "vehicles": args.vehicles,
+        "bookings": loaded,
+        "warm_seconds": round(warm_seconds, 3),
+        "bitset_bytes": calendar._bits.nbytes,
+    }
+    for name, limit in (("page", args.limit), ("fleet", None)):
+        legacy_answers, legacy_seconds = timed(
+            lambda s, e: legacy.free_vehicles(vehicle_ids, s, e, limit), windows
+        )
+        calendar_answers, calendar_seconds = timed(
+            lambda s, e: calendar.free_vehicles(vehicle_ids, s, e, limit), windows
+        )
+        result[name] = {
+            "limit": limit,
+            "legacy_ms_per_query": round(legacy_seconds / args.queries * 1000, 3),
+            "calendar_ms_per_query": round(calendar_seconds / args.queries * 1000, 3),
+            "speedup": round(legacy_seconds / calendar_seconds, 1) if calendar_seconds else None,
+            "mean_free_vehicles": round(sum(len(a) for a in calendar_answers) / args.queries),
+            "same_vehicles": legacy_answers == calendar_answers,
+        }
+    print(json.dumps(result), file=sys.stderr)
+
+    report = {
+        "benchmark": "occupancy_calendar",
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "database": "sqlite",
+        "config": {
+            "vehicles": args.vehicles, "bookings_per_vehicle": args.bookings_per_vehicle,
+            "queries": args.queries, "max_window_hours": args.max_window_hours, "limit": args.limit,
+            "seed": args.seed,
+        },
+        "results": result,
+    }
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a") as f:
+            f.write(json.dumps(report) + "\n")
+
+    print(json.dumps(report, indent=2))
+    return 0 if result["page"]["same_vehicles"] and result["fleet"]["same_vehicles"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
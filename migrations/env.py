@@ -0,0 +1,33 @@
+from logging.config import fileConfig
+from alembic import context
+from sqlalchemy import create_engine, pool
+from app.database import Base, DATABASE_URL
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+
+config = context.config
+
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def database_url() -> str:
+    """sqlalchemy.url when set (tests), otherwise the app's DATABASE_URL"""
+    return config.get_main_option("sqlalchemy.url") or DATABASE_URL
+
+
+def run_migrations_online():
+    engine = create_engine(database_url(), poolclass=pool.NullPool)
+    with engine.connect() as connection:
+        context.configure(connection=connection, target_metadata=target_metadata)
+        with context.begin_transaction():
+            context.run_migrations()
+    engine.dispose()
+
+
+if context.is_offline_mode():
+    # The revisions inspect the live schema, so there is no --sql mode
+    raise SystemExit("Offline (--sql) migrations are not supported; run against a database")
+
+run_migrations_online()
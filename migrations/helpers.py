@@ -0,0 +1,54 @@
+"""
+Idempotent schema steps for the revisions.
+
+Databases created by init_db (Base.metadata.create_all) already have the
+latest columns and indexes, while older ones do not, so every step checks
+the live schema first and `alembic upgrade head` is safe on both.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+def _inspector():
+    return sa.inspect(op.get_bind())
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in _inspector().get_columns(table)}
+
+
+def has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in _inspector().get_indexes(table)}
+
+
+def add_column(table: str, column: sa.Column):
+    """ALTER TABLE ... ADD COLUMN unless the column exists"""
+    if not has_column(table, column.name):
+        op.add_column(table, column)
+
+
+def drop_column(table: str, column: str):
+    if has_column(table, column):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column(column)
+
+
+def create_index(name: str, table: str, columns: list):
+    """
+    CREATE INDEX unless an index of that name exists.
+
+    On PostgreSQL the index is built CONCURRENTLY (outside the revision's
+    transaction), so bookings and trips stay writable while it builds.
+    """
+    if has_index(table, name):
+        return
+    if op.get_bind().dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        op.create_index(name, table, columns)
+
+
+def drop_index(name: str, table: str):
+    if has_index(table, name):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,25 @@
+"""Baseline: create any tables the models define that do not exist yet
+
+Existing tables are left alone; later revisions add their new columns and
+indexes.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+from app.database import Base
+import app.models  # noqa: F401
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    Base.metadata.create_all(bind=op.get_bind(), checkfirst=True)
+
+
+def downgrade():
+    pass
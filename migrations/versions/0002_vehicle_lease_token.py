@@ -0,0 +1,21 @@
+"""Store the fencing token of the last lease that booked each vehicle
+
+Revision ID: 0002_vehicle_lease_token
+Revises: 0001_baseline
+Create Date: 2026-10-16
+"""
+import sqlalchemy as sa
+from migrations.helpers import add_column, drop_column
+
+revision = "0002_vehicle_lease_token"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    add_column("vehicles", sa.Column("lease_token", sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    drop_column("vehicles", "lease_token")
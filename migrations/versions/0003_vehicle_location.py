@@ -0,0 +1,40 @@
+"""Store the vehicle's location on bookings and trips, stamping existing rows
+
+Rows created before the column existed get their vehicle's current location
+(or "" for a vehicle without one), the same backfill that
+RollupService.backfill_locations runs before every rollup rebuild.
+
+Revision ID: 0003_vehicle_location
+Revises: 0002_vehicle_lease_token
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+from migrations.helpers import add_column, drop_column
+
+revision = "0003_vehicle_location"
+down_revision = "0002_vehicle_lease_token"
+branch_labels = None
+depends_on = None
+
+TABLES = ("bookings", "trips")
+
+
+def upgrade():
+    vehicles = sa.table("vehicles", sa.column("id"), sa.column("location"))
+    for name in TABLES:
+        add_column(name, sa.Column("vehicle_location", sa.String(255), nullable=True))
+
+        rows = sa.table(name, sa.column("vehicle_id"), sa.column("vehicle_location"))
+        op.execute(
+            rows.update().where(rows.c.vehicle_location.is_(None)).values(
+                vehicle_location=sa.func.coalesce(
+                    sa.select(vehicles.c.location).where(vehicles.c.id == rows.c.vehicle_id).scalar_subquery(), ""
+                )
+            )
+        )
+
+
+def downgrade():
+    for name in TABLES:
+        drop_column(name, "vehicle_location")
@@ -0,0 +1,20 @@
+"""Index trips by start time for fleet-wide time-window analytics
+
+Revision ID: 0004_trip_start_time_index
+Revises: 0003_vehicle_location
+Create Date: 2026-10-16
+"""
+from migrations.helpers import create_index, drop_index
+
+revision = "0004_trip_start_time_index"
+down_revision = "0003_vehicle_location"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_index("idx_trip_start_time", "trips", ["start_time"])
+
+
+def downgrade():
+    drop_index("idx_trip_start_time", "trips")
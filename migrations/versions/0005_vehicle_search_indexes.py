@@ -0,0 +1,30 @@
+"""Index vehicles for location filters and the keyset-paged vehicle search
+
+Revision ID: 0005_vehicle_search_indexes
+Revises: 0004_trip_start_time_index
+Create Date: 2026-10-16
+"""
+from migrations.helpers import create_index, drop_index
+
+revision = "0005_vehicle_search_indexes"
+down_revision = "0004_trip_start_time_index"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "idx_vehicle_location_status": ["location", "status", "is_active"],
+    "idx_vehicle_active_created": ["is_active", "created_at", "id"],
+    "idx_vehicle_active_status_created": ["is_active", "status", "created_at", "id"],
+    "idx_vehicle_active_location_created": ["is_active", "location", "created_at", "id"],
+    "idx_vehicle_active_make_model_created": ["is_active", "make", "model", "created_at", "id"],
+}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        create_index(name, "vehicles", columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        drop_index(name, "vehicles")
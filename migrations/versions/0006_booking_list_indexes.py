@@ -0,0 +1,27 @@
+"""Index bookings by (start_time, id) for the keyset-paged booking lists
+
+Revision ID: 0006_booking_list_indexes
+Revises: 0005_vehicle_search_indexes
+Create Date: 2026-10-16
+"""
+from migrations.helpers import create_index, drop_index
+
+revision = "0006_booking_list_indexes"
+down_revision = "0005_vehicle_search_indexes"
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    "idx_booking_start_time": ["start_time", "id"],
+    "idx_booking_user_start": ["user_id", "start_time", "id"],
+}
+
+
+def upgrade():
+    for name, columns in INDEXES.items():
+        create_index(name, "bookings", columns)
+
+
+def downgrade():
+    for name in INDEXES:
+        drop_index(name, "bookings")
@@ -0,0 +1,174 @@
+import pytest
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.config import settings
+from app.database import Base
+from app.models import Vehicle, Booking, Trip, User
+from app.services import AnalyticsCache, BookingService, TripService, VehicleService, analytics_cache
+from app.services.analytics_cache import CacheScope, TRIP_FACTS
+from app.schemas import VehicleStatus, BookingStatus, UserRole
+
+
+WINDOW_START = datetime(2026, 3, 1)
+WINDOW_END = datetime(2026, 3, 11)
+
+
+@pytest.fixture
+def test_db(monkeypatch):
+    """Create test database with the analytics cache enabled and empty"""
+    monkeypatch.setattr(settings, "ANALYTICS_CACHE_ENABLED", True)
+    analytics_cache.clear()
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    yield SessionLocal()
+    analytics_cache.clear()
+
+
+@pytest.fixture
+def fleet(test_db):
+    """Two vehicles at different locations, each with an unfinished trip in the window"""
+    user = User(id=uuid.uuid4(), username="analyst", email="analyst@example.com",
+                hashed_password="hashed", role=UserRole.FLEET_MANAGER)
+    test_db.add(user)
+
+    trips = {}
+    for plate, location in (("DOWN001", "Downtown"), ("AIR0001", "Airport")):
+        vehicle = Vehicle(id=uuid.uuid4(), license_plate=plate, make="Toyota", model="Corolla",
+                          year=2024, location=location, status=VehicleStatus.AVAILABLE)
+        booking = Booking(id=uuid.uuid4(), user_id=user.id, vehicle_id=vehicle.id,
+                          start_time=WINDOW_START + timedelta(days=1), end_time=WINDOW_START + timedelta(days=2),
+                          status=BookingStatus.CONFIRMED, created_at=WINDOW_START)
+        trip = Trip(id=uuid.uuid4(), booking_id=booking.id, vehicle_id=vehicle.id, user_id=user.id,
+                    start_time=WINDOW_START + timedelta(days=1), mileage_start=0.0)
+        test_db.add_all([vehicle, booking, trip])
+        trips[location] = trip
+    test_db.commit()
+
+    return trips
+
+
+def test_hits_share_normalized_keys(test_db, fleet):
+    """Test equivalent parameters hit one entry and callers get independent copies"""
+    first = analytics_cache.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, location="")
+    first["total_trips"] = 99
+    aware = analytics_cache.get_fleet_utilization(
+        test_db, WINDOW_START.replace(tzinfo=timezone.utc), WINDOW_END.replace(tzinfo=timezone.utc)
+    )
+
+    assert aware["total_trips"] == 0
+    assert analytics_cache.stats()["misses"] == 1
+    assert analytics_cache.stats()["hits"] == 1
+
+
+def test_ttl_and_lru_eviction():
+    """Test entries expire after the TTL and the least recently used are evicted"""
+    cache = AnalyticsCache(ttl_seconds=0.05, max_entries=2)
+    scope = CacheScope(frozenset({TRIP_FACTS}))
+
+    cache.get_or_compute(("a",), scope, lambda: 1)
+    cache.get_or_compute(("b",), scope, lambda: 2)
+    cache.get_or_compute(("a",), scope, lambda: -1)  # "a" becomes most recently used
+    cache.get_or_compute(("c",), scope, lambda: 3)
+    assert cache.get_or_compute(("a",), scope, lambda: -1) == 1
+    assert cache.get_or_compute(("b",), scope, lambda: 22) == 22
+    assert cache.stats()["evictions"] == 2
+
+    time.sleep(0.06)
+    assert cache.get_or_compute(("a",), scope, lambda: 11) == 11
+
+
+def test_concurrent_identical_requests_compute_once():
+    """Test single-flight: one caller computes while identical callers wait for its result"""
+    cache = AnalyticsCache()
+    scope = CacheScope(frozenset({TRIP_FACTS}))
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return {"value": 42}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_compute(("k",), scope, compute)))
+        for _ in range(8)
+    ]
+    threads[0].start()
+    started.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    while cache.stats()["coalesced"] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"value": 42}] * 8
+
+
+def test_end_trip_invalidates_affected_entries_on_commit(test_db, fleet):
+    """Test a committed end_trip drops entries for its window and location only"""
+    def snapshot():
+        return (
+            analytics_cache.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, "Downtown")["total_trips"],
+            analytics_cache.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, "Airport")["total_trips"],
+            analytics_cache.get_fleet_utilization(test_db, WINDOW_END, WINDOW_END + timedelta(days=1))["total_trips"],
+        )
+
+    assert snapshot() == (0, 0, 0)
+
+    TripService.end_trip(test_db, fleet["Downtown"].id, mileage_end=10.0)
+    test_db.flush()
+    assert snapshot() == (0, 0, 0)  # not committed yet
+    test_db.rollback()
+    assert snapshot() == (0, 0, 0)
+
+    trip = test_db.get(Trip, fleet["Downtown"].id)
+    TripService.end_trip(test_db, trip.id, mileage_end=10.0)
+    test_db.commit()
+
+    assert analytics_cache.stats()["invalidations"] == 1
+    assert snapshot() == (1, 0, 0)
+
+
+def test_booking_and_vehicle_changes_invalidate(test_db, fleet):
+    """Test booking status changes drop booking statistics and vehicle changes drop fleet entries"""
+    assert analytics_cache.get_booking_statistics(test_db, WINDOW_START, WINDOW_END)["cancelled_bookings"] == 0
+    booking_id = test_db.get(Trip, fleet["Airport"].id).booking_id
+    BookingService.cancel_booking(test_db, booking_id)
+    test_db.commit()
+    assert analytics_cache.get_booking_statistics(test_db, WINDOW_START, WINDOW_END)["cancelled_bookings"] == 1
+
+    assert analytics_cache.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, "Depot")["total_vehicles"] == 0
+    VehicleService.update_vehicle_location(test_db, test_db.get(Trip, fleet["Airport"].id).vehicle_id, "Depot")
+    test_db.commit()
+    assert analytics_cache.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, "Depot")["total_vehicles"] == 1
+
+
+def test_mileage_changes_invalidate_health_scores(test_db, fleet):
+    """Test mileage updates and telemetry drop cached underutilized vehicles, whose health score moved"""
+    def health_scores():
+        return sorted(
+            vehicle["health_score"]
+            for vehicle in analytics_cache.get_underutilized_vehicles(test_db, WINDOW_START, WINDOW_END)
+        )
+
+    assert health_scores() == [100.0, 100.0]
+    down_id = test_db.get(Trip, fleet["Downtown"].id).vehicle_id
+    VehicleService.update_vehicle_mileage(test_db, down_id, 250000.0)
+    test_db.commit()
+    assert health_scores() == [50.0, 100.0]
+
+    air_id = test_db.get(Trip, fleet["Airport"].id).vehicle_id
+    VehicleService.ingest_telemetry(test_db, [(air_id, WINDOW_END, 125000.0, None)])
+    test_db.commit()
+    assert health_scores() == [50.0, 75.0]
@@ -0,0 +1,159 @@
+import pytest
+import threading
+from datetime import datetime, timedelta
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.database import Base
+from app.models import Vehicle, Booking, Trip, User
+from app.services import AnalyticsJobError, AnalyticsJobManager, AnalyticsJobQueueFull, AnalyticsService
+from app.services import analytics_jobs
+from app.schemas import AnalyticsJobStatus, VehicleStatus, BookingStatus, UserRole
+
+
+WINDOW_START = datetime(2026, 3, 1)
+WINDOW_END = datetime(2026, 3, 11)
+
+
+@pytest.fixture
+def session_factory():
+    """In-memory database shared by the job threads, with a small fleet"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+
+    db = SessionLocal()
+    user = User(id=uuid.uuid4(), username="analyst", email="analyst@example.com",
+                hashed_password="hashed", role=UserRole.FLEET_MANAGER)
+    db.add(user)
+    for i in range(5):
+        vehicle = Vehicle(id=uuid.uuid4(), license_plate=f"JOB000{i}", make="Toyota", model="Corolla",
+                          year=2024, location="Downtown", status=VehicleStatus.AVAILABLE)
+        start = WINDOW_START + timedelta(days=i)
+        booking = Booking(id=uuid.uuid4(), user_id=user.id, vehicle_id=vehicle.id, start_time=start,
+                          end_time=start + timedelta(hours=i + 1), status=BookingStatus.COMPLETED)
+        db.add_all([vehicle, booking, Trip(
+            id=uuid.uuid4(), booking_id=booking.id, vehicle_id=vehicle.id, user_id=user.id,
+            start_time=start, end_time=start + timedelta(hours=i + 1),
+            distance_traveled=10.0, mileage_start=0.0, mileage_end=10.0
+        )])
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+@pytest.fixture
+def manager(session_factory):
+    manager = AnalyticsJobManager(session_factory, max_workers=1, max_queued=1)
+    yield manager
+    manager.shutdown(wait=True)
+
+
+@pytest.fixture
+def gated_report(monkeypatch):
+    """A report that reports progress, then blocks until released"""
+    started, release = threading.Event(), threading.Event()
+
+    def run(db, context, start_date, end_date, steps=2):
+        context.progress(1, steps)
+        started.set()
+        release.wait(5)
+        context.progress(steps, steps)
+        return {"steps": steps}
+
+    monkeypatch.setitem(analytics_jobs.ANALYTICS_JOB_REPORTS, "gated", run)
+    return started, release
+
+
+def test_job_runs_existing_report(manager, session_factory):
+    """Test a job returns the same report as the synchronous service call"""
+    job = manager.submit("underutilized_vehicles", WINDOW_START, WINDOW_END, {"threshold_percentage": 50.0})
+    manager.wait(job.id, timeout=5)
+
+    assert job.status == AnalyticsJobStatus.SUCCEEDED and job.progress == 1.0
+    db = session_factory()
+    try:
+        assert job.result == AnalyticsService.get_underutilized_vehicles(db, WINDOW_START, WINDOW_END, 50.0)
+    finally:
+        db.close()
+    assert job.to_dict(include_result=True)["result"] == job.result
+
+    batch = manager.submit("vehicles_utilization", WINDOW_START, WINDOW_END, {
+        "vehicle_ids": [str(row["vehicle_id"]) for row in job.result], "chunk_size": 2
+    })
+    manager.wait(batch.id, timeout=5)
+    assert batch.status == AnalyticsJobStatus.SUCCEEDED and len(batch.result) == 5
+
+
+@pytest.mark.parametrize("report, parameters, expected", [
+    ("underutilized_vehicles", {"threshold_percentage": 50.0, "limit": 3, "offset": 1, "chunk_size": 2},
+     lambda db: AnalyticsService.get_underutilized_vehicles(db, WINDOW_START, WINDOW_END, 50.0, 3, 1)),
+    ("fleet_utilization", {"location": "Downtown", "chunk_days": 1},
+     lambda db: AnalyticsService.get_fleet_utilization(db, WINDOW_START, WINDOW_END, "Downtown")),
+    ("usage_heatmap", {"by_location": True, "chunk_days": 1.5},
+     lambda db: AnalyticsService.get_usage_heatmap(db, WINDOW_START, WINDOW_END, by_location=True)),
+])
+def test_chunked_reports_match_service(session_factory, report, parameters, expected):
+    """Test chunked runners report progress per chunk, stop when cancelled and match the one-shot report"""
+    db = session_factory()
+    try:
+        job = analytics_jobs.AnalyticsJob(report, parameters, WINDOW_START, WINDOW_END)
+        runner = analytics_jobs.ANALYTICS_JOB_REPORTS[report]
+        assert runner(db, analytics_jobs.JobContext(job), WINDOW_START, WINDOW_END, **parameters) == expected(db)
+        assert job.progress == 1.0
+
+        cancelled = analytics_jobs.AnalyticsJob(report, parameters, WINDOW_START, WINDOW_END)
+        cancelled.cancel_requested.set()
+        with pytest.raises(analytics_jobs.JobCancelled):
+            runner(db, analytics_jobs.JobContext(cancelled), WINDOW_START, WINDOW_END, **parameters)
+        assert 0 < cancelled.progress < 1
+    finally:
+        db.close()
+
+
+def test_submit_validates_report_and_parameters(manager):
+    """Test unknown reports and parameters are rejected up front, runtime errors fail the job"""
+    with pytest.raises(AnalyticsJobError):
+        manager.submit("everything", WINDOW_START, WINDOW_END)
+    with pytest.raises(AnalyticsJobError):
+        manager.submit("fleet_utilization", WINDOW_START, WINDOW_END, {"region": "Downtown"})
+
+    job = manager.submit("booking_statistics", WINDOW_START, WINDOW_END, {"bucket": "month"})
+    manager.wait(job.id, timeout=5)
+    assert job.status == AnalyticsJobStatus.FAILED and "month" in job.error
+
+
+def test_queue_cap_and_cancellation(manager, gated_report):
+    """Test the queue is bounded, queued jobs cancel at once and running jobs at their next progress report"""
+    started, release = gated_report
+    running = manager.submit("gated", WINDOW_START, WINDOW_END)
+    assert started.wait(5)
+    assert running.status == AnalyticsJobStatus.RUNNING and running.progress == 0.5
+
+    queued = manager.submit("gated", WINDOW_START, WINDOW_END)
+    with pytest.raises(AnalyticsJobQueueFull):
+        manager.submit("gated", WINDOW_START, WINDOW_END)
+
+    assert manager.cancel(queued.id).status == AnalyticsJobStatus.CANCELLED
+    manager.cancel(running.id)
+    release.set()
+    manager.wait(running.id, timeout=5)
+
+    assert running.status == AnalyticsJobStatus.CANCELLED and running.result is None
+    assert manager.stats()["cancelled"] == 2
+
+
+def test_finished_jobs_are_pruned(session_factory):
+    """Test finished jobs are dropped after the retention period and beyond max_retained"""
+    manager = AnalyticsJobManager(session_factory, max_workers=1, retention_seconds=3600, max_retained=2)
+    try:
+        jobs = [manager.submit("fleet_utilization", WINDOW_START, WINDOW_END) for _ in range(3)]
+        for job in jobs:
+            manager.wait(job.id, timeout=5)
+        assert [job.id for job in manager.list()] == [jobs[2].id, jobs[1].id]
+
+        manager.retention_seconds = 0
+        assert manager.get(jobs[2].id) is None and manager.list() == []
+    finally:
+        manager.shutdown(wait=True)
@@ -0,0 +1,465 @@
+import pytest
+from datetime import datetime, timedelta
+import uuid
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.routes.analytics import get_booking_statistics
+from app.models import Vehicle, Booking, Trip, User
+from app.config import settings
+from app.models import VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch, RollupOutbox
+from app.services import AnalyticsService, BookingService, RollupService, TripService, VehicleService
+from app.services.analytics_service import MAX_SERIES_BUCKETS
+from app.services.quantile_sketch import TRIP_SKETCH_ACCURACY, QuantileSketch
+from app.services.usage_heatmap import hours_since_reference, weekly_occupancy
+from app.schemas import VehicleStatus, BookingStatus, UserRole
+
+
+WINDOW_START = datetime(2026, 3, 1)
+WINDOW_END = datetime(2026, 3, 11)  # 240 hours
+
+
+@pytest.fixture
+def test_db():
+    """Create test database"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    return SessionLocal()
+
+
+def _add_vehicle(db, license_plate, location="Downtown", **kwargs):
+    vehicle = Vehicle(
+        id=uuid.uuid4(),
+        license_plate=license_plate,
+        make="Toyota",
+        model="Corolla",
+        year=2024,
+        location=location,
+        status=VehicleStatus.AVAILABLE,
+        **kwargs
+    )
+    db.add(vehicle)
+    return vehicle
+
+
+def _add_trip(db, user, vehicle, start_time, hours, distance=10.0):
+    """Insert a completed trip (and its booking) lasting `hours`"""
+    end_time = start_time + timedelta(hours=hours)
+    booking = Booking(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        vehicle_id=vehicle.id,
+        start_time=start_time,
+        end_time=end_time,
+        status=BookingStatus.COMPLETED
+    )
+    db.add(booking)
+    db.add(Trip(
+        id=uuid.uuid4(),
+        booking_id=booking.id,
+        vehicle_id=vehicle.id,
+        user_id=user.id,
+        start_time=start_time,
+        end_time=end_time,
+        distance_traveled=distance,
+        mileage_start=0.0,
+        mileage_end=distance
+    ))
+
+
+@pytest.fixture
+def fleet(test_db):
+    """Four vehicles with 0h, 12h, 36h and 72h of trips in the window"""
+    user = User(id=uuid.uuid4(), username="analyst", email="analyst@example.com",
+                hashed_password="hashed", role=UserRole.FLEET_MANAGER)
+    test_db.add(user)
+
+    idle = _add_vehicle(test_db, "IDLE001")
+    light = _add_vehicle(test_db, "LIGHT01")
+    medium = _add_vehicle(test_db, "MED0001", location="Airport")
+    busy = _add_vehicle(test_db, "BUSY001")
+    _add_vehicle(test_db, "RETIRED", is_active=False)
+
+    _add_trip(test_db, user, light, WINDOW_START + timedelta(hours=9), 12, distance=120.0)
+    _add_trip(test_db, user, medium, WINDOW_START + timedelta(days=1, hours=9), 24, distance=300.0)
+    _add_trip(test_db, user, medium, WINDOW_START + timedelta(days=3, hours=9), 12, distance=100.0)
+    for day in range(3):
+        _add_trip(test_db, user, busy, WINDOW_START + timedelta(days=day, hours=17), 24, distance=500.0)
+
+    # Outside the window, or still in progress: ignored
+    _add_trip(test_db, user, light, WINDOW_START - timedelta(days=2), 24)
+    test_db.add(Trip(id=uuid.uuid4(), booking_id=uuid.uuid4(), vehicle_id=idle.id, user_id=user.id,
+                     start_time=WINDOW_START + timedelta(days=5), mileage_start=0.0))
+    test_db.commit()
+
+    return {"user": user, "idle": idle, "light": light, "medium": medium, "busy": busy}
+
+
+def test_underutilized_vehicles_single_aggregate_query(test_db, fleet):
+    """Test underutilized detection runs as one query with SQL threshold, sort and paging"""
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    result = AnalyticsService.get_underutilized_vehicles(test_db, WINDOW_START, WINDOW_END, threshold_percentage=20.0)
+
+    assert len(statements) == 1
+    assert [v["license_plate"] for v in result] == ["IDLE001", "LIGHT01", "MED0001"]
+    assert [v["utilization_percentage"] for v in result] == [0.0, 5.0, 15.0]
+    assert [v["total_trips"] for v in result] == [0, 1, 2]
+    assert result[1]["vehicle_id"] == str(fleet["light"].id)
+
+    page = AnalyticsService.get_underutilized_vehicles(
+        test_db, WINDOW_START, WINDOW_END, threshold_percentage=20.0, limit=1, offset=1
+    )
+    assert [v["license_plate"] for v in page] == ["LIGHT01"]
+
+    assert [v["license_plate"] for v in AnalyticsService.get_underutilized_vehicles(
+        test_db, WINDOW_START, WINDOW_END, threshold_percentage=5.0
+    )] == ["IDLE001"]
+
+
+def test_fleet_utilization_aggregates_in_sql(test_db, fleet):
+    """Test fleet totals, peak hours and the location filter computed as aggregates"""
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    metrics = AnalyticsService.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END)
+    assert len(statements) == 2
+    assert metrics["total_vehicles"] == 4
+    assert metrics["total_trips"] == 6
+    assert metrics["total_distance_km"] == 2020.0
+    assert metrics["fleet_utilization_percentage"] == 12.5  # 120h of 4 x 240h
+    assert metrics["peak_usage_hours"] == ["09:00-10:00", "17:00-18:00"]
+
+    airport = AnalyticsService.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, location="Airport")
+    assert airport["total_vehicles"] == 1
+    assert airport["total_trips"] == 2
+    assert airport["total_distance_km"] == 400.0
+    assert airport["fleet_utilization_percentage"] == 15.0
+    assert airport["peak_usage_hours"] == ["09:00-10:00"]
+
+    nowhere = AnalyticsService.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, location="Nowhere")
+    assert nowhere["total_vehicles"] == 0 and nowhere["total_trips"] == 0
+
+
+def test_rollups_match_raw_trips(test_db, fleet, monkeypatch):
+    """Test rollup-backed reads (with raw edge buckets) agree with raw-trip reads"""
+    window_start = WINDOW_START + timedelta(hours=9, minutes=30)  # partial edge day and hour
+    window_end = WINDOW_END - timedelta(minutes=15)
+    raw = (
+        AnalyticsService.get_fleet_utilization(test_db, window_start, window_end),
+        AnalyticsService.get_underutilized_vehicles(test_db, window_start, window_end, threshold_percentage=50.0),
+        AnalyticsService.get_vehicle_utilization(test_db, fleet["busy"].id, window_start, window_end),
+    )
+
+    # Trips from before vehicle_location was stored are stamped before aggregating
+    test_db.query(Trip).update({Trip.vehicle_location: None}, synchronize_session=False)
+    counts = RollupService.rebuild(test_db)
+    test_db.commit()
+    assert counts["vehicle_daily_usage"] > 0 and counts["location_hourly_usage"] > 0
+    assert counts["locations_backfilled"] == test_db.query(Trip).count()
+    assert test_db.query(Trip).filter(Trip.vehicle_id == fleet["medium"].id).first().vehicle_location == "Airport"
+
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    assert (
+        AnalyticsService.get_fleet_utilization(test_db, window_start, window_end),
+        AnalyticsService.get_underutilized_vehicles(test_db, window_start, window_end, threshold_percentage=50.0),
+        AnalyticsService.get_vehicle_utilization(test_db, fleet["busy"].id, window_start, window_end),
+    ) == raw
+
+
+def test_rollups_updated_incrementally(test_db, fleet, monkeypatch):
+    """Test ending a trip updates the rollups exactly as a rebuild would"""
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    RollupService.rebuild(test_db)
+    test_db.commit()
+
+    trip = test_db.query(Trip).filter(Trip.end_time.is_(None)).one()
+    TripService.end_trip(test_db, trip.id, mileage_end=42.0)
+    test_db.commit()
+
+    def snapshot():
+        return sorted(
+            (str(row.vehicle_id), row.day, row.trip_count, row.distance_km, row.completed_bookings)
+            for row in test_db.query(VehicleDailyUsage)
+        )
+
+    incremental = snapshot()
+    assert (str(fleet["idle"].id), trip.start_time.date(), 1, 42.0, 0) in incremental
+
+    RollupService.rebuild(test_db)
+    test_db.commit()
+    assert snapshot() == incremental
+
+
+def test_rollup_writes_skipped_when_disabled(test_db, fleet):
+    """Test trips and bookings write nothing to the rollup tables while rollups are disabled"""
+    start = datetime.utcnow() + timedelta(days=1)
+    booking = BookingService.create_booking(test_db, fleet["user"].id, fleet["idle"].id, start, start + timedelta(hours=1))
+    test_db.commit()
+    BookingService.cancel_booking(test_db, booking.id)
+    trip = test_db.query(Trip).filter(Trip.end_time.is_(None)).one()
+    TripService.end_trip(test_db, trip.id, mileage_end=42.0)
+    test_db.commit()
+
+    for model in (VehicleDailyUsage, LocationHourlyUsage, TripMetricSketch, RollupOutbox):
+        assert test_db.query(model).count() == 0
+
+
+def test_rollups_keep_the_location_stored_at_creation(test_db, fleet, monkeypatch):
+    """Test changes after a vehicle moves land in the location its booking or trip was created at"""
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    RollupService.rebuild(test_db)
+    test_db.commit()
+
+    idle = fleet["idle"]
+    start = datetime.utcnow() + timedelta(days=1)
+    booking = BookingService.create_booking(test_db, fleet["user"].id, idle.id, start, start + timedelta(hours=1))
+    test_db.commit()
+
+    VehicleService.update_vehicle_location(test_db, idle.id, "Airport")
+    test_db.commit()
+    BookingService.cancel_booking(test_db, booking.id)
+    trip = test_db.query(Trip).filter(Trip.end_time.is_(None)).one()
+    TripService.end_trip(test_db, trip.id, mileage_end=42.0)
+    test_db.commit()
+
+    def snapshot():
+        return sorted(
+            (row.location, row.hour, row.trip_count, row.distance_km, row.pending_bookings, row.cancelled_bookings)
+            for row in test_db.query(LocationHourlyUsage)
+        )
+
+    # Booking changes are only queued until the outbox is applied
+    queued = snapshot()
+    assert test_db.query(RollupOutbox).count() == 2
+    assert RollupService.apply_outbox(test_db, batch_size=1) == 2
+    assert test_db.query(RollupOutbox).count() == 0
+
+    incremental = snapshot()
+    assert incremental != queued
+    assert all(count >= 0 for row in incremental for count in row[2:])
+    assert ("Downtown", RollupService.hour_bucket(trip.start_time), 1, 42.0, 0, 0) in incremental
+
+    RollupService.rebuild(test_db)
+    test_db.commit()
+    assert snapshot() == incremental
+
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", False)
+    raw = AnalyticsService.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, location="Downtown")
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    assert AnalyticsService.get_fleet_utilization(test_db, WINDOW_START, WINDOW_END, location="Downtown") == raw
+    assert raw["total_trips"] == 5
+
+
+def test_booking_statistics_single_scan_and_buckets(test_db, fleet):
+    """Test booking statistics come from one conditional-aggregate query, optionally bucketed"""
+    for day, hour, booking_status in (
+        (0, 8, BookingStatus.CONFIRMED),
+        (0, 9, BookingStatus.CANCELLED),
+        (2, 9, BookingStatus.COMPLETED),
+        (8, 23, BookingStatus.COMPLETED),
+    ):
+        test_db.add(Booking(
+            id=uuid.uuid4(), user_id=fleet["user"].id, vehicle_id=fleet["idle"].id,
+            start_time=WINDOW_END, end_time=WINDOW_END + timedelta(hours=1), status=booking_status,
+            created_at=WINDOW_START + timedelta(days=day, hours=hour)
+        ))
+    test_db.commit()
+    window_end = WINDOW_START + timedelta(days=9)  # excludes the fixture's bookings, created now
+
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    stats = AnalyticsService.get_booking_statistics(test_db, WINDOW_START, window_end)
+    assert len(statements) == 1
+    assert (stats["total_bookings"], stats["confirmed_bookings"], stats["completed_bookings"],
+            stats["cancelled_bookings"], stats["completion_rate"]) == (4, 1, 2, 1, 50.0)
+    assert "series" not in stats
+
+    daily = AnalyticsService.get_booking_statistics(test_db, WINDOW_START, window_end, bucket="day")
+    assert len(statements) == 2
+    assert daily["total_bookings"] == 4
+    assert [point["bucket_start"] for point in daily["series"]] == [
+        WINDOW_START + timedelta(days=day) for day in range(10)
+    ]
+    assert [point["total_bookings"] for point in daily["series"]] == [2, 0, 1, 0, 0, 0, 0, 0, 1, 0]
+    assert daily["series"][0]["completion_rate"] == 0
+    assert daily["series"][2]["completion_rate"] == 100.0
+
+    # 2026-03-01 is a Sunday, so the window spans weeks starting 2026-02-23, 03-02 and 03-09
+    weekly = AnalyticsService.get_booking_statistics(test_db, WINDOW_START, window_end, bucket="week")
+    assert [(point["bucket_start"], point["total_bookings"], point["cancelled_bookings"])
+            for point in weekly["series"]] == [
+        (datetime(2026, 2, 23), 2, 1), (datetime(2026, 3, 2), 1, 0), (datetime(2026, 3, 9), 1, 0)
+    ]
+
+    hourly = AnalyticsService.get_booking_statistics(test_db, WINDOW_START, WINDOW_START + timedelta(hours=10), bucket="hour")
+    assert [point["total_bookings"] for point in hourly["series"]] == [0] * 8 + [1, 1, 0]
+
+    with pytest.raises(ValueError):
+        AnalyticsService.get_booking_statistics(test_db, WINDOW_START, window_end, bucket="month")
+
+
+def test_booking_statistics_series_is_capped(test_db):
+    """Test a series longer than MAX_SERIES_BUCKETS is refused with a 400 instead of being built"""
+    end = WINDOW_START + timedelta(hours=MAX_SERIES_BUCKETS - 1)
+    assert len(AnalyticsService.get_booking_statistics(test_db, WINDOW_START, end, bucket="hour")["series"]) == MAX_SERIES_BUCKETS
+    with pytest.raises(ValueError):
+        AnalyticsService.get_booking_statistics(test_db, WINDOW_START, end + timedelta(hours=1), bucket="hour")
+
+    with pytest.raises(HTTPException) as exc_info:
+        get_booking_statistics(
+            start_date="2000-01-01", end_date="2026-01-01", bucket="hour", db=test_db, current_user=None
+        )
+    assert exc_info.value.status_code == 400
+    assert AnalyticsService.get_booking_statistics(test_db, datetime(2000, 1, 1), datetime(2026, 1, 1), bucket="week")
+
+
+def test_weekly_occupancy_clips_intervals_to_hours():
+    """Test intervals are split at hour boundaries, including across the Sunday/Monday wrap"""
+    monday = hours_since_reference(datetime(2026, 3, 2))
+    grid = weekly_occupancy(
+        np.array([monday + 9.5, monday - 0.5, monday + 12]),
+        np.array([monday + 11.25, monday + 1, monday + 12])  # the last interval is empty
+    )[0]
+
+    assert grid[0, 9] == 0.5 and grid[0, 10] == 1.0 and grid[0, 11] == 0.25
+    assert grid[6, 23] == 0.5 and grid[0, 0] == 1.0
+    assert grid.sum() == 3.25
+
+
+def test_usage_heatmap_counts_every_hour_of_a_trip(test_db, fleet):
+    """Test the heatmap spreads trips over the hours they span, per location and overall"""
+    heatmap = AnalyticsService.get_usage_heatmap(test_db, WINDOW_START, WINDOW_END, by_location=True, top_k=3)
+
+    vehicle_hours = np.array(heatmap["vehicle_hours"])
+    assert vehicle_hours.shape == (7, 24)
+    # 120h of completed trips plus the in-progress trip clipped at the window end (5 days)
+    assert round(vehicle_hours.sum(), 6) == 240.0
+    assert heatmap["total_trips"] == 7
+
+    # The 24h Airport trip from Monday 09:00 covers Monday 09:00-24:00 and Tuesday 00:00-09:00
+    airport = np.array(heatmap["locations"]["Airport"]["vehicle_hours"])
+    assert airport[0, 9:].tolist() == [1.0] * 15 and airport[1, :9].tolist() == [1.0] * 9
+    assert airport.sum() == 36.0
+    assert round(sum(np.array(by["vehicle_hours"]).sum() for by in heatmap["locations"].values()), 6) == 240.0
+
+    # The window holds two Sundays: light and busy at 17:00 on Mar 1, the in-progress trip on Mar 8
+    assert heatmap["average_vehicles_in_use"][6][17] == 1.5
+    # Mar 4 is the only Wednesday, with the Airport and busy vehicles both out from 09:00 to 17:00
+    assert [peak["label"] for peak in heatmap["peaks"]] == [
+        "Wednesday 09:00-10:00", "Wednesday 10:00-11:00", "Wednesday 11:00-12:00"
+    ]
+    assert heatmap["peaks"][0]["average_vehicles_in_use"] == 2.0
+
+    airport_only = AnalyticsService.get_usage_heatmap(test_db, WINDOW_START, WINDOW_END, location="Airport")
+    assert airport_only["vehicle_hours"] == heatmap["locations"]["Airport"]["vehicle_hours"]
+    assert "locations" not in airport_only
+
+
+def test_usage_heatmap_empty_window(test_db, fleet):
+    """Test a window without trips returns an all-zero float grid instead of failing"""
+    start = WINDOW_START - timedelta(days=30)
+    heatmap = AnalyticsService.get_usage_heatmap(test_db, start, start + timedelta(days=7), by_location=True)
+
+    assert heatmap["total_trips"] == 0
+    assert heatmap["vehicle_hours"] == [[0.0] * 24] * 7
+    assert heatmap["average_vehicles_in_use"] == [[0.0] * 24] * 7
+    assert heatmap["peaks"] == [] and heatmap["locations"] == {}
+    assert weekly_occupancy(np.array([]), np.array([])).dtype == np.float64
+
+
+def test_vehicles_utilization_batch_matches_single_vehicle(test_db, fleet):
+    """Test the batch variant runs one grouped query and matches get_vehicle_utilization"""
+    vehicle_ids = [fleet[name].id for name in ("idle", "light", "medium", "busy")] + [fleet["light"].id]
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    batch = AnalyticsService.get_vehicles_utilization(test_db, vehicle_ids, WINDOW_START, WINDOW_END)
+
+    assert len(statements) == 1
+    assert list(batch) == [str(vehicle_id) for vehicle_id in vehicle_ids[:4]]
+    for vehicle_id in vehicle_ids[:4]:
+        assert batch[str(vehicle_id)] == AnalyticsService.get_vehicle_utilization(
+            test_db, vehicle_id, WINDOW_START, WINDOW_END
+        )
+    assert batch[str(fleet["medium"].id)]["total_trips"] == 2
+    assert batch[str(fleet["medium"].id)]["average_trip_duration_hours"] == 18.0
+    assert batch[str(fleet["idle"].id)]["utilization_percentage"] == 0.0
+
+
+def test_quantile_sketch_accuracy_and_merge():
+    """Test sketch quantiles stay within the relative accuracy and merged sketches match one sketch"""
+    values = [0.1 * 1.07 ** i for i in range(500)] + [0.0] * 10
+    whole = QuantileSketch(0.01)
+    left, right = QuantileSketch(0.01), QuantileSketch(0.01)
+    for i, value in enumerate(values):
+        whole.add(value)
+        (left if i % 2 else right).add(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.95, 0.99):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(whole.quantile(q) - exact) <= 0.01 * exact
+
+    left.merge_bins(right.bins.items())
+    assert left.bins == whole.bins
+    assert whole.quantile(0.0) == 0.0
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_trip_distribution_from_sketches_matches_raw(test_db, fleet, monkeypatch):
+    """Test percentiles merged from per-day sketches (plus raw edges) agree with raw trips"""
+    window_start = WINDOW_START + timedelta(hours=9, minutes=30)
+    window_end = WINDOW_END - timedelta(minutes=15)
+    scopes = ({}, {"vehicle_id": fleet["medium"].id}, {"location": "Downtown"})
+    raw = [AnalyticsService.get_trip_distribution(test_db, window_start, window_end, **scope) for scope in scopes]
+
+    fleet_wide = raw[0]
+    assert fleet_wide["total_trips"] == 5  # the light trip starts before window_start
+    assert abs(fleet_wide["duration_hours"]["p50"] - 24.0) <= 0.24
+    assert abs(fleet_wide["distance_km"]["p99"] - 500.0) <= 5.0
+    assert raw[1]["total_trips"] == 2 and abs(raw[1]["duration_hours"]["p50"] - 12.0) <= 0.12
+    assert raw[2]["total_trips"] == 3
+
+    counts = RollupService.rebuild(test_db)
+    test_db.commit()
+    assert counts["trip_metric_sketches"] > 0
+
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    assert [
+        AnalyticsService.get_trip_distribution(test_db, window_start, window_end, **scope) for scope in scopes
+    ] == raw
+
+
+def test_trip_sketches_updated_incrementally(test_db, fleet, monkeypatch):
+    """Test ending a trip adds its bins exactly as a rebuild would"""
+    monkeypatch.setattr(settings, "ANALYTICS_ROLLUPS_ENABLED", True)
+    RollupService.rebuild(test_db)
+    test_db.commit()
+
+    trip = test_db.query(Trip).filter(Trip.end_time.is_(None)).one()
+    TripService.end_trip(test_db, trip.id, mileage_end=42.0)
+    test_db.commit()
+
+    def snapshot():
+        return sorted(
+            (row.scope, row.key, row.metric, row.day, row.bin, row.count)
+            for row in test_db.query(TripMetricSketch)
+        )
+
+    incremental = snapshot()
+    assert ("vehicle", str(fleet["idle"].id), "distance_km", trip.start_time.date(),
+            QuantileSketch(TRIP_SKETCH_ACCURACY).bin_for(42.0), 1) in incremental
+
+    RollupService.rebuild(test_db)
+    test_db.commit()
+    assert snapshot() == incremental
@@ -27,3 +27,22 @@ def test_token_creation_and_verification():
     assert decoded["username"] == username
     assert decoded["role"] == role
     assert decoded["type"] == "access"
+
+
+def test_malformed_subject_is_unauthorized():
+    """Test a validly signed token whose user_id is not a UUID is rejected with 401"""
+    from fastapi import HTTPException
+    from app.auth import create_refresh_token, get_current_user
+    from app.routes.auth import refresh
+    
+    with pytest.raises(HTTPException) as exc:
+        get_current_user({"user_id": "not-a-uuid", "type": "access"}, db=None)
+    assert exc.value.status_code == 401
+    
+    with pytest.raises(HTTPException) as exc:
+        get_current_user({"type": "access"}, db=None)
+    assert exc.value.status_code == 401
+    
+    with pytest.raises(HTTPException) as exc:
+        refresh(create_refresh_token("not-a-uuid", "testuser"), db=None)
+    assert exc.value.status_code == 401
@@ -0,0 +1,83 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_booking_contention_benchmark_smoke(tmp_path):
+    """Run a small booking contention benchmark end to end on SQLite"""
+    output = tmp_path / "results.jsonl"
+    completed = subprocess.run(
+        [
+            sys.executable, "-m", "benchmarks.booking_contention",
+            "--database-url", f"sqlite:///{tmp_path / 'bench.db'}",
+            "--vehicles", "10", "--users", "3", "--hot-vehicles", "2",
+            "--requests", "60", "--concurrency", "8",
+            "--output", str(output),
+        ],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+    
+    report = json.loads(output.read_text().splitlines()[-1])
+    results = report["results"]
+    assert report["database"] == "sqlite"
+    assert results["double_bookings"] == 0
+    assert results["created"] + results["conflicts"] + results["errors"] == 60
+    assert results["created"] > 0 and results["errors"] == 0
+    assert results["lock_wait"]["lock_vehicles"]["calls"] > 0
+
+
+def test_list_projection_benchmark_smoke(tmp_path):
+    """Run a small list projection benchmark; both read paths must produce the same JSON"""
+    output = tmp_path / "results.jsonl"
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.list_projection", "--rows", "200", "--repeat", "1", "--output", str(output)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    results = json.loads(output.read_text().splitlines()[-1])["results"]
+    assert set(results) == {"vehicles", "bookings", "trips"}
+    for entry in results.values():
+        assert entry["rows"] == 200 and entry["same_body"]
+        assert entry["projection"]["cpu_us_per_row"] > 0
+
+
+def test_occupancy_calendar_benchmark_smoke(tmp_path):
+    """Run a small occupancy calendar benchmark; both layouts must return the same vehicles"""
+    output = tmp_path / "results.jsonl"
+    completed = subprocess.run(
+        [sys.executable, "-m", "benchmarks.occupancy_calendar", "--vehicles", "300", "--queries", "20",
+         "--output", str(output)],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    assert completed.returncode == 0, completed.stderr[-2000:]
+
+    results = json.loads(output.read_text().splitlines()[-1])["results"]
+    assert results["vehicles"] == 300 and results["bookings"] > 0
+    assert results["page"]["same_vehicles"] and results["fleet"]["same_vehicles"]
+
+
+def test_percentile_uses_nearest_rank():
+    """Test the contention benchmark's percentile picks the ceil(p * n)-th smallest value"""
+    from benchmarks.booking_contention import percentile
+
+    values = list(range(1, 11))
+    assert percentile(values, 50) == 5
+    assert percentile(values, 95) == 10
+    assert percentile(values, 10) == 1
+    assert percentile(values, 0) == 1
+    assert percentile([], 99) == 0.0
@@ -0,0 +1,116 @@
+import pytest
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+import uuid
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Vehicle, Booking, User
+from app.services import BookingService, BookingConflictError
+from app.schemas import VehicleStatus, BookingStatus, UserRole
+
+
+THREADS = 8
+ATTEMPTS_PER_THREAD = 25
+
+
+@pytest.fixture
+def sqlite_file_sessions(tmp_path):
+    """Session factory over a file-backed SQLite database shared by threads"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'stress.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragma(dbapi_conn, connection_record):
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+    
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def test_sqlite_concurrent_bookings_never_overlap(sqlite_file_sessions):
+    """Stress concurrent bookings of hot vehicles on SQLite and check for double-bookings"""
+    SessionLocal = sqlite_file_sessions
+    
+    setup = SessionLocal()
+    user = User(id=uuid.uuid4(), username="stress", email="stress@example.com",
+                hashed_password="hashed", role=UserRole.USER)
+    vehicles = [
+        Vehicle(id=uuid.uuid4(), license_plate=f"HOT{i}", make="Tesla", model="3",
+                year=2024, status=VehicleStatus.AVAILABLE)
+        for i in range(2)
+    ]
+    setup.add(user)
+    setup.add_all(vehicles)
+    setup.commit()
+    user_id, vehicle_ids = user.id, [v.id for v in vehicles]
+    setup.close()
+    
+    base = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    created, conflicts, errors = [], [], []
+    barrier = threading.Barrier(THREADS)
+    
+    def worker(seed):
+        rng = random.Random(seed)
+        barrier.wait()
+        for _ in range(ATTEMPTS_PER_THREAD):
+            start = base + timedelta(hours=rng.randrange(48))
+            db = SessionLocal()
+            try:
+                BookingService.create_booking(
+                    db, user_id, rng.choice(vehicle_ids), start, start + timedelta(hours=rng.randint(1, 3))
+                )
+                db.commit()
+                created.append(1)
+            except BookingConflictError:
+                db.rollback()
+                conflicts.append(1)
+            except Exception as e:  # surfaced below
+                db.rollback()
+                errors.append(e)
+            finally:
+                db.close()
+    
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    
+    attempts = THREADS * ATTEMPTS_PER_THREAD
+    print(
+        f"\nSQLite booking stress: {attempts} attempts in {elapsed:.2f}s "
+        f"({attempts / elapsed:.0f} attempts/s, {len(created) / elapsed:.0f} bookings/s), "
+        f"{len(created)} created, {len(conflicts)} conflicts"
+    )
+    
+    assert not errors, errors[:3]
+    assert created and conflicts
+    
+    db = SessionLocal()
+    try:
+        for vehicle_id in vehicle_ids:
+            windows = sorted(
+                (b.start_time, b.end_time)
+                for b in db.query(Booking).filter(
+                    Booking.vehicle_id == vehicle_id,
+                    Booking.status == BookingStatus.CONFIRMED
+                )
+            )
+            double_bookings = sum(
+                1 for (_, prev_end), (next_start, _) in zip(windows, windows[1:]) if next_start < prev_end
+            )
+            assert double_bookings == 0
+        assert db.query(Booking).count() == len(created)
+    finally:
+        db.close()
@@ -1,11 +1,14 @@
 import pytest
+import time
 from datetime import datetime, timedelta
 import uuid
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from app.database import Base
-from app.models import Vehicle, Booking, User
-from app.services import BookingService, BookingConflictError
+from app.models import Vehicle, Booking, Trip, User
+from app.services import BookingService, BookingConflictError, BookingConcurrencyError, BookingIntervalIndex, booking_index
+from app.services import OccupancyCalendar, TripService, occupancy_calendar
+from app.services import pagination
 from app.schemas import VehicleStatus, BookingStatus, UserRole
 
 
@@ -82,3 +85,485 @@ def test_booking_conflict_detection(test_db):
     
     is_available = BookingService.check_availability(test_db, vehicle_id, start3, end3)
     assert is_available is True
+
+
+def _create_user_and_vehicle(db, license_plate="IDX123"):
+    """Insert a user and an available vehicle"""
+    user = User(
+        id=uuid.uuid4(),
+        username=f"user-{license_plate}",
+        email=f"{license_plate.lower()}@example.com",
+        hashed_password="hashed",
+        role=UserRole.USER
+    )
+    vehicle = Vehicle(
+        id=uuid.uuid4(),
+        license_plate=license_plate,
+        make="Toyota",
+        model="Corolla",
+        year=2024,
+        status=VehicleStatus.AVAILABLE
+    )
+    db.add_all([user, vehicle])
+    db.commit()
+    return user, vehicle
+
+
+@pytest.fixture
+def warm_index(test_db):
+    """Warm the shared booking index against the test database"""
+    booking_index.warm(test_db)
+    yield booking_index
+    booking_index.reset()
+
+
+def test_interval_index_overlap_counts():
+    """Test overlap counting on the sorted-interval index"""
+    index = BookingIntervalIndex()
+    vehicle_id = uuid.uuid4()
+    base = datetime(2026, 1, 20, 8, 0)
+    
+    first, second = uuid.uuid4(), uuid.uuid4()
+    index.add(first, vehicle_id, base, base + timedelta(hours=2))
+    index.add(second, vehicle_id, base + timedelta(hours=4), base + timedelta(hours=6))
+    
+    assert index.count_overlaps(vehicle_id, base + timedelta(hours=1), base + timedelta(hours=5)) == 2
+    assert index.count_overlaps(vehicle_id, base + timedelta(hours=2), base + timedelta(hours=4)) == 0
+    assert index.count_overlaps(vehicle_id, base - timedelta(hours=1), base + timedelta(minutes=1)) == 1
+    assert index.count_overlaps(vehicle_id, base, base + timedelta(hours=3), exclude_booking_id=first) == 0
+    assert index.get_conflicting_ids(vehicle_id, base + timedelta(hours=5), base + timedelta(hours=7)) == [second]
+    
+    index.remove(first)
+    assert index.count_overlaps(vehicle_id, base, base + timedelta(hours=3)) == 0
+    assert index.count_overlaps(uuid.uuid4(), base, base + timedelta(hours=3)) == 0
+
+
+def test_index_follows_booking_lifecycle(test_db, warm_index):
+    """Test that create/cancel/rollback keep the booking index in sync"""
+    user, vehicle = _create_user_and_vehicle(test_db)
+    start = datetime.utcnow() + timedelta(days=1)
+    end = start + timedelta(hours=2)
+    
+    booking = BookingService.create_booking(test_db, user.id, vehicle.id, start, end)
+    test_db.commit()
+    assert BookingService.check_availability(test_db, vehicle.id, start, end) is False
+    assert [b.id for b in BookingService.get_conflicting_bookings(test_db, vehicle.id, start, end)] == [booking.id]
+    
+    with pytest.raises(BookingConflictError):
+        BookingService.create_booking(test_db, user.id, vehicle.id, start, end)
+    test_db.rollback()
+    
+    # A rolled-back booking must not linger in the index
+    later = end + timedelta(hours=1)
+    BookingService.create_booking(test_db, user.id, vehicle.id, later, later + timedelta(hours=1))
+    test_db.rollback()
+    assert BookingService.check_availability(test_db, vehicle.id, later, later + timedelta(hours=1)) is True
+    
+    # Cancellation frees the slot only once committed
+    BookingService.cancel_booking(test_db, booking.id)
+    assert BookingService.check_availability(test_db, vehicle.id, start, end) is False
+    test_db.commit()
+    assert BookingService.check_availability(test_db, vehicle.id, start, end) is True
+    
+    assert warm_index.verify(test_db)["consistent"] is True
+
+
+def test_index_verify_detects_and_repairs_drift(test_db, warm_index):
+    """Test the index consistency check against the database"""
+    user, vehicle = _create_user_and_vehicle(test_db)
+    start = datetime.utcnow() + timedelta(days=2)
+    
+    # Written behind the index's back
+    test_db.add(Booking(
+        id=uuid.uuid4(),
+        user_id=user.id,
+        vehicle_id=vehicle.id,
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+        status=BookingStatus.CONFIRMED
+    ))
+    test_db.commit()
+    
+    report = warm_index.verify(test_db, repair=True)
+    assert report["consistent"] is False
+    assert len(report["missing"]) == 1
+    assert report["repaired"] is True
+    assert warm_index.verify(test_db)["consistent"] is True
+
+
+def test_occupancy_calendar_edge_slots():
+    """Test bitmap checks stay exact for windows that are not slot-aligned"""
+    calendar = OccupancyCalendar(slot_minutes=15, horizon_days=2)
+    calendar._epoch = calendar._current_epoch()
+    calendar._ready = True
+    vehicle_id = uuid.uuid4()
+    base = calendar._epoch + timedelta(days=1, hours=8)
+    
+    calendar.add(uuid.uuid4(), vehicle_id, base + timedelta(minutes=5), base + timedelta(minutes=50))
+    
+    assert calendar.is_free(vehicle_id, base, base + timedelta(minutes=5)) is True
+    assert calendar.is_free(vehicle_id, base + timedelta(minutes=50), base + timedelta(hours=1)) is True
+    assert calendar.is_free(vehicle_id, base + timedelta(minutes=40), base + timedelta(hours=2)) is False
+    assert calendar.is_free(vehicle_id, base + timedelta(minutes=15), base + timedelta(minutes=30)) is False
+    assert calendar.is_free(vehicle_id, base + timedelta(days=3), base + timedelta(days=3, hours=1)) is None
+    other_id = uuid.uuid4()
+    assert calendar.free_vehicles([vehicle_id, other_id], base, base + timedelta(hours=1)) == [other_id]
+
+
+def test_occupancy_calendar_follows_booking_lifecycle(test_db):
+    """Test availability searches served from the warmed occupancy calendar"""
+    user, vehicle = _create_user_and_vehicle(test_db)
+    occupancy_calendar.warm(test_db)
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        end = start + timedelta(hours=2)
+        
+        booking = BookingService.create_booking(test_db, user.id, vehicle.id, start, end)
+        test_db.commit()
+        assert BookingService.check_availability(test_db, vehicle.id, start, end) is False
+        assert BookingService.find_available_vehicles(test_db, start, end) == []
+        assert [v.id for v in BookingService.find_available_vehicles(test_db, end, end + timedelta(hours=1))] == [vehicle.id]
+        
+        BookingService.cancel_booking(test_db, booking.id)
+        test_db.commit()
+        assert BookingService.check_availability(test_db, vehicle.id, start, end) is True
+    finally:
+        occupancy_calendar.reset()
+
+
+def test_calendar_search_streams_candidates_until_limit(test_db, monkeypatch):
+    """Test the calendar search reads candidate IDs lazily and stops once the limit is met"""
+    user, _ = _create_user_and_vehicle(test_db, "STREAM00")
+    created = datetime.utcnow()
+    test_db.add_all([
+        Vehicle(
+            id=uuid.uuid4(), license_plate=f"STREAM{i:02d}", make="Toyota", model="Corolla", year=2024,
+            status=VehicleStatus.AVAILABLE, created_at=created - timedelta(minutes=i)
+        )
+        for i in range(1, 21)
+    ])
+    test_db.commit()
+    newest_first = [vid for (vid,) in test_db.query(Vehicle.id).order_by(Vehicle.created_at.desc())]
+    
+    consumed = []
+    free_vehicles = occupancy_calendar.free_vehicles
+    
+    def counting_free_vehicles(vehicle_ids, *args):
+        assert not isinstance(vehicle_ids, (list, tuple))
+        
+        def tap():
+            for vehicle_id in vehicle_ids:
+                consumed.append(vehicle_id)
+                yield vehicle_id
+        return free_vehicles(tap(), *args)
+    
+    monkeypatch.setattr(BookingService, "CANDIDATE_BATCH_SIZE", 4)
+    monkeypatch.setattr(occupancy_calendar, "free_vehicles", counting_free_vehicles)
+    occupancy_calendar.warm(test_db)
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        end = start + timedelta(hours=2)
+        BookingService.create_booking(test_db, user.id, newest_first[0], start, end)
+        test_db.commit()
+        
+        found = BookingService.find_available_vehicles(test_db, start, end, limit=3)
+        assert [v.id for v in found] == newest_first[1:4]
+        assert len(consumed) == 4
+    finally:
+        occupancy_calendar.reset()
+
+
+def test_find_available_vehicles_excludes_booked(test_db):
+    """Test fleet-wide availability search in one anti-join query"""
+    user, booked = _create_user_and_vehicle(test_db, "FREE001")
+    free = Vehicle(
+        id=uuid.uuid4(),
+        license_plate="FREE002",
+        make="Honda",
+        model="Civic",
+        year=2023,
+        location="Downtown",
+        status=VehicleStatus.AVAILABLE
+    )
+    test_db.add(free)
+    booked.location = "Downtown"
+    test_db.commit()
+    
+    start = datetime.utcnow() + timedelta(days=1)
+    end = start + timedelta(hours=3)
+    BookingService.create_booking(test_db, user.id, booked.id, start, end)
+    test_db.commit()
+    
+    vehicles = BookingService.find_available_vehicles(test_db, start, end, location="Downtown")
+    assert [v.id for v in vehicles] == [free.id]
+    
+    later = BookingService.find_available_vehicles(test_db, end, end + timedelta(hours=1), location="Downtown")
+    assert {v.id for v in later} == {free.id, booked.id}
+    assert len(BookingService.find_available_vehicles(test_db, end, end + timedelta(hours=1), limit=1)) == 1
+
+
+def test_bulk_booking_reports_per_item_results(test_db):
+    """Test bulk creation detects conflicts against the DB and within the batch"""
+    user, vehicle = _create_user_and_vehicle(test_db, "BULK001")
+    _, other = _create_user_and_vehicle(test_db, "BULK002")
+    start = datetime.utcnow() + timedelta(days=1)
+    
+    BookingService.create_booking(test_db, user.id, vehicle.id, start, start + timedelta(hours=2))
+    test_db.commit()
+    
+    results = BookingService.create_bookings_bulk(test_db, user.id, [
+        (vehicle.id, start + timedelta(hours=1), start + timedelta(hours=3)),   # conflicts with DB
+        (other.id, start, start + timedelta(hours=2)),                           # created
+        (other.id, start + timedelta(hours=1), start + timedelta(hours=4)),      # conflicts within batch
+        (vehicle.id, start + timedelta(hours=2), start + timedelta(hours=4)),    # created (touches existing)
+        (uuid.uuid4(), start, start + timedelta(hours=1)),                       # unknown vehicle
+        (other.id, start + timedelta(hours=5), start + timedelta(hours=5)),      # empty window
+    ])
+    test_db.commit()
+    
+    assert [r["status"] for r in results] == ["conflict", "created", "conflict", "created", "invalid", "invalid"]
+    assert [r["index"] for r in results] == list(range(6))
+    assert test_db.query(Booking).count() == 3
+
+
+def test_find_free_slots_scans_timeline_once(test_db):
+    """Test the earliest fitting gaps are found between active bookings"""
+    user, vehicle = _create_user_and_vehicle(test_db, "SLOT001")
+    horizon_start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    horizon_end = horizon_start + timedelta(hours=12)
+    
+    # Busy 0-2h and 3-6h; cancelled booking at 6-8h must be ignored
+    for offset, hours, booking_status in [(0, 2, BookingStatus.CONFIRMED), (3, 3, BookingStatus.PENDING),
+                                          (6, 2, BookingStatus.CANCELLED)]:
+        test_db.add(Booking(
+            id=uuid.uuid4(),
+            user_id=user.id,
+            vehicle_id=vehicle.id,
+            start_time=horizon_start + timedelta(hours=offset),
+            end_time=horizon_start + timedelta(hours=offset + hours),
+            status=booking_status
+        ))
+    test_db.commit()
+    
+    slots = BookingService.find_free_slots(
+        test_db, timedelta(hours=1), horizon_start, horizon_end, vehicle_id=vehicle.id
+    )
+    assert [(s["start_time"] - horizon_start, s["end_time"] - horizon_start) for s in slots] == [
+        (timedelta(hours=2), timedelta(hours=3)),
+        (timedelta(hours=6), timedelta(hours=12)),
+    ]
+    
+    long_slots = BookingService.find_free_slots(
+        test_db, timedelta(hours=2), horizon_start, horizon_end, vehicle_id=vehicle.id, limit=1
+    )
+    assert [s["start_time"] for s in long_slots] == [horizon_start + timedelta(hours=6)]
+    
+    vehicle.status = VehicleStatus.MAINTENANCE
+    test_db.commit()
+    assert BookingService.find_free_slots(
+        test_db, timedelta(hours=1), horizon_start, horizon_end, vehicle_id=vehicle.id
+    ) == []
+
+
+def test_optimistic_booking_retries_and_detects_conflict(test_db, monkeypatch):
+    """Test the optimistic path retries a lost compare-and-swap and then sees the winner"""
+    user, vehicle = _create_user_and_vehicle(test_db, "OPT001")
+    start = datetime.utcnow() + timedelta(days=1)
+    end = start + timedelta(hours=2)
+    
+    booking = BookingService.create_booking(test_db, user.id, vehicle.id, start, end, optimistic=True)
+    test_db.commit()
+    assert booking.status == BookingStatus.CONFIRMED
+    
+    # Simulate a concurrent writer bumping the vehicle version between check and swap
+    monkeypatch.setattr(BookingService, "_backoff", staticmethod(lambda attempt: None))
+    original_check = BookingService.check_availability
+    calls = []
+    
+    def racing_check(db, *args, **kwargs):
+        result = original_check(db, *args, **kwargs)
+        if not calls:
+            db.execute(Vehicle.__table__.update().values(updated_at=datetime.utcnow() + timedelta(seconds=1)))
+        calls.append(result)
+        return result
+    
+    monkeypatch.setattr(BookingService, "check_availability", staticmethod(racing_check))
+    later = end + timedelta(hours=1)
+    second = BookingService.create_booking(test_db, user.id, vehicle.id, later, later + timedelta(hours=1), optimistic=True)
+    test_db.commit()
+    assert len(calls) == 2
+    assert test_db.query(Booking).filter(Booking.id == second.id).count() == 1
+    
+    with pytest.raises(BookingConflictError):
+        BookingService.create_booking(test_db, user.id, vehicle.id, start, end, optimistic=True)
+    test_db.rollback()
+
+
+def test_optimistic_status_change_rejects_stale_version(test_db):
+    """Test cancel/complete compare-and-swap on Booking.version"""
+    user, vehicle = _create_user_and_vehicle(test_db, "OPT002")
+    start = datetime.utcnow() + timedelta(days=1)
+    booking = BookingService.create_booking(test_db, user.id, vehicle.id, start, start + timedelta(hours=1))
+    test_db.commit()
+    
+    first_version = booking.version
+    BookingService.cancel_booking(test_db, booking.id, optimistic=True)
+    test_db.commit()
+    assert booking.status == BookingStatus.CANCELLED
+    assert booking.version != first_version
+    
+    other = BookingService.create_booking(test_db, user.id, vehicle.id, start, start + timedelta(hours=1))
+    test_db.commit()
+    stale_version = other.version  # loaded now; this is what the session will compare against
+    
+    # A concurrent writer changes the booking behind this session's back
+    test_db.execute(
+        Booking.__table__.update()
+        .where(Booking.__table__.c.id == other.id)
+        .values(version=datetime.utcnow() + timedelta(seconds=1))
+    )
+    stored_version = test_db.execute(
+        Booking.__table__.select().with_only_columns(Booking.__table__.c.version)
+        .where(Booking.__table__.c.id == other.id)
+    ).scalar_one()
+    assert other.version == stale_version and stored_version != stale_version
+    
+    with pytest.raises(BookingConcurrencyError):
+        BookingService.complete_booking(test_db, other.id, optimistic=True)
+    test_db.rollback()
+    test_db.refresh(other)
+    assert other.status != BookingStatus.COMPLETED and other.version == stale_version
+
+
+def test_booking_hold_confirm_and_expiry(test_db, monkeypatch):
+    """Test PENDING holds block the slot until they expire, confirm before expiry and are swept after"""
+    user, vehicle = _create_user_and_vehicle(test_db, "HOLD001")
+    start = datetime.utcnow() + timedelta(days=1)
+    end = start + timedelta(hours=2)
+    
+    hold = BookingService.create_hold(test_db, user.id, vehicle.id, start, end)
+    test_db.commit()
+    assert hold.status == BookingStatus.PENDING
+    assert BookingService.check_availability(test_db, vehicle.id, start, end) is False
+    
+    confirmed = BookingService.confirm_hold(test_db, hold.id)
+    test_db.commit()
+    assert confirmed.status == BookingStatus.CONFIRMED
+    with pytest.raises(ValueError):
+        BookingService.confirm_hold(test_db, hold.id)
+    test_db.rollback()
+    
+    later = end + timedelta(hours=1)
+    stale = BookingService.create_hold(test_db, user.id, vehicle.id, later, later + timedelta(hours=1))
+    test_db.commit()
+    
+    # Let every hold expire
+    monkeypatch.setattr("app.services.booking_service.settings.BOOKING_HOLD_TTL_SECONDS", -1)
+    with pytest.raises(ValueError, match="expired"):
+        BookingService.confirm_hold(test_db, stale.id)
+    test_db.rollback()
+    
+    # An expired hold stops blocking its slot before the sweeper cancels it
+    assert BookingService.check_availability(test_db, vehicle.id, later, later + timedelta(hours=1)) is True
+    assert vehicle.id in {v.id for v in BookingService.find_available_vehicles(
+        test_db, later, later + timedelta(hours=1)
+    )}
+    
+    assert BookingService.expire_stale_holds(test_db, batch_size=1) == 1
+    test_db.expire_all()
+    assert test_db.query(Booking).filter(Booking.id == stale.id).first().status == BookingStatus.CANCELLED
+    assert test_db.query(Booking).filter(Booking.id == hold.id).first().status == BookingStatus.CONFIRMED
+    assert BookingService.check_availability(test_db, vehicle.id, later, later + timedelta(hours=1)) is True
+
+
+def test_warm_views_release_expired_holds(test_db, monkeypatch):
+    """Test the booking index and occupancy calendar stop counting a hold once it expires"""
+    monkeypatch.setattr("app.config.settings.BOOKING_HOLD_TTL_SECONDS", 1)
+    user, vehicle = _create_user_and_vehicle(test_db, "HOLD002")
+    booking_index.warm(test_db)
+    occupancy_calendar.warm(test_db)
+    try:
+        start = occupancy_calendar._current_epoch() + timedelta(days=1, hours=8)
+        end = start + timedelta(hours=2)
+        later = end + timedelta(hours=1)
+        
+        kept = BookingService.create_hold(test_db, user.id, vehicle.id, start, end)
+        test_db.commit()
+        BookingService.confirm_hold(test_db, kept.id)
+        test_db.commit()
+        lapsing = BookingService.create_hold(test_db, user.id, vehicle.id, later, later + timedelta(hours=1))
+        test_db.commit()
+        assert booking_index.count_overlaps(vehicle.id, later, later + timedelta(hours=1)) == 1
+        assert occupancy_calendar.is_free(vehicle.id, later, later + timedelta(hours=1)) is False
+        assert occupancy_calendar.free_vehicles([vehicle.id], later, later + timedelta(hours=1)) == []
+        
+        time.sleep(1.1)
+        
+        assert BookingService.check_availability(test_db, vehicle.id, later, later + timedelta(hours=1)) is True
+        assert BookingService.get_conflicting_bookings(test_db, vehicle.id, later, later + timedelta(hours=1)) == []
+        assert occupancy_calendar.is_free(vehicle.id, later, later + timedelta(hours=1)) is True
+        assert occupancy_calendar.free_vehicles([vehicle.id], later, later + timedelta(hours=1)) == [vehicle.id]
+        assert [v.id for v in BookingService.find_available_vehicles(
+            test_db, later, later + timedelta(hours=1)
+        )] == [vehicle.id]
+        
+        # The confirmed hold keeps its slot
+        assert BookingService.check_availability(test_db, vehicle.id, start, end) is False
+        assert occupancy_calendar.is_free(vehicle.id, start, end) is False
+        assert occupancy_calendar.free_vehicles([vehicle.id], start, later + timedelta(hours=1)) == []
+        assert booking_index.verify(test_db)["consistent"] is True
+        
+        BookingService.expire_stale_holds(test_db)
+        assert test_db.query(Booking).filter(Booking.id == lapsing.id).first().status == BookingStatus.CANCELLED
+        assert booking_index.count_overlaps(vehicle.id, later, later + timedelta(hours=1)) == 0
+    finally:
+        booking_index.reset()
+        occupancy_calendar.reset()
+
+
+def test_booking_and_trip_lists_page_by_start_time(test_db, monkeypatch):
+    """Test booking and trip lists walk (start_time DESC, id DESC) pages without gaps, repeats or overflow"""
+    user, vehicle = _create_user_and_vehicle(test_db, "PAGE001")
+    start = datetime(2026, 3, 1, 8, 0)
+    for i in range(12):
+        moment = start + timedelta(hours=i // 3)  # three bookings/trips share each start time
+        booking = Booking(id=uuid.uuid4(), user_id=user.id, vehicle_id=vehicle.id, start_time=moment,
+                          end_time=moment + timedelta(minutes=30),
+                          status=BookingStatus.CANCELLED if i % 4 == 0 else BookingStatus.COMPLETED)
+        test_db.add_all([booking, Trip(id=uuid.uuid4(), booking_id=booking.id, vehicle_id=vehicle.id,
+                                       user_id=user.id, start_time=moment, mileage_start=0.0)])
+    test_db.commit()
+
+    def walk(fetch, limit):
+        items, cursor = [], None
+        while True:
+            page, cursor = fetch(cursor, limit)
+            assert len(page) <= limit
+            items.extend(page)
+            if cursor is None:
+                return items
+
+    for fetch in (
+        lambda cursor, limit: BookingService.get_user_bookings(test_db, user.id, cursor=cursor, limit=limit),
+        lambda cursor, limit: BookingService.get_vehicle_bookings(test_db, vehicle.id, cursor=cursor, limit=limit),
+        lambda cursor, limit: BookingService.get_bookings(test_db, cursor=cursor, limit=limit),
+        lambda cursor, limit: TripService.get_user_trips(test_db, user.id, cursor=cursor, limit=limit),
+        lambda cursor, limit: TripService.get_vehicle_trips(test_db, vehicle.id, cursor=cursor, limit=limit),
+    ):
+        items = walk(fetch, 5)
+        assert len({item.id for item in items}) == 12
+        assert items == sorted(items, key=lambda item: (item.start_time, item.id), reverse=True)
+
+    cancelled = walk(lambda cursor, limit: BookingService.get_bookings(
+        test_db, BookingStatus.CANCELLED, cursor, limit
+    ), 2)
+    assert len(cancelled) == 3 and {booking.status for booking in cancelled} == {BookingStatus.CANCELLED}
+
+    windowed = walk(lambda cursor, limit: TripService.get_user_trips(
+        test_db, user.id, start + timedelta(hours=1), start + timedelta(hours=2), cursor, limit
+    ), 4)
+    assert len(windowed) == 6
+
+    monkeypatch.setattr(pagination, "MAX_PAGE_SIZE", 4)
+    page, cursor = BookingService.get_user_bookings(test_db, user.id, limit=1000)
+    assert len(page) == 4 and cursor is not None
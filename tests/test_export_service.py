@@ -0,0 +1,107 @@
+import pytest
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+import uuid
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Vehicle, Booking, Trip, User
+from app.services import ExportService
+from app.services.export_service import BOOKING_EXPORT_COLUMNS, TRIP_EXPORT_COLUMNS
+from app.schemas import VehicleStatus, BookingStatus, UserRole
+
+
+START = datetime(2026, 3, 1, 8, 0)
+
+
+@pytest.fixture
+def test_db():
+    """Create test database"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    return SessionLocal()
+
+
+@pytest.fixture
+def history(test_db):
+    """One vehicle with 25 hourly bookings and trips; the last trip is still in progress"""
+    user = User(id=uuid.uuid4(), username="driver", email="driver@example.com",
+                hashed_password="hashed", role=UserRole.USER)
+    vehicle = Vehicle(id=uuid.uuid4(), license_plate="EXP0001", make="Toyota", model="Corolla",
+                      year=2024, location="Downtown", status=VehicleStatus.AVAILABLE)
+    test_db.add_all([user, vehicle])
+
+    for i in range(25):
+        start = START + timedelta(hours=i)
+        booking = Booking(id=uuid.uuid4(), user_id=user.id, vehicle_id=vehicle.id, start_time=start,
+                          end_time=start + timedelta(hours=1),
+                          status=BookingStatus.CONFIRMED if i == 24 else BookingStatus.COMPLETED)
+        test_db.add(booking)
+        test_db.add(Trip(id=uuid.uuid4(), booking_id=booking.id, vehicle_id=vehicle.id, user_id=user.id,
+                         start_time=start, end_time=None if i == 24 else start + timedelta(minutes=50),
+                         start_location="Downtown, Main St", mileage_start=float(i),
+                         distance_traveled=0.0 if i == 24 else 12.5))
+    test_db.commit()
+
+    return {"user": user, "vehicle": vehicle}
+
+
+def test_trip_rows_are_plain_tuples_in_start_order(test_db, history):
+    """Test trips stream as column tuples, filtered and ordered by start time"""
+    rows = list(ExportService.trip_rows(test_db, vehicle_id=history["vehicle"].id, completed_only=True))
+
+    assert len(rows) == 24
+    assert all(type(row) is tuple and len(row) == len(TRIP_EXPORT_COLUMNS) for row in rows)
+    assert [row[4] for row in rows] == [START + timedelta(hours=i) for i in range(24)]
+
+    window = list(ExportService.trip_rows(test_db, start_date=START + timedelta(hours=20)))
+    assert len(window) == 5
+
+
+def test_encode_ndjson_and_csv(test_db, history):
+    """Test NDJSON objects and CSV rows carry the same plain values"""
+    names = ExportService.column_names(BOOKING_EXPORT_COLUMNS)
+
+    ndjson = b"".join(ExportService.encode(ExportService.booking_rows(test_db), names, "ndjson")).decode()
+    records = [json.loads(line) for line in ndjson.splitlines()]
+    assert len(records) == 25
+    assert records[0]["start_time"] == START.isoformat()
+    assert records[0]["status"] == "completed" and records[-1]["status"] == "confirmed"
+    assert records[0]["user_id"] == str(history["user"].id)
+
+    text = b"".join(ExportService.encode(
+        ExportService.booking_rows(test_db, status=BookingStatus.CONFIRMED), names, "csv"
+    )).decode()
+    table = list(csv.reader(io.StringIO(text)))
+    assert table[0] == names
+    assert len(table) == 2 and table[1][names.index("status")] == "confirmed"
+
+    trips = b"".join(ExportService.encode(
+        ExportService.trip_rows(test_db), ExportService.column_names(TRIP_EXPORT_COLUMNS), "csv"
+    )).decode()
+    last = list(csv.reader(io.StringIO(trips)))[-1]
+    assert last[5] == "" and last[6] == "Downtown, Main St"  # NULL end_time, quoted comma
+
+    with pytest.raises(ValueError):
+        list(ExportService.encode([], names, "xml"))
+
+
+def test_encode_streams_lazily_in_batches(test_db, history, monkeypatch):
+    """Test the first row is sent on its own and later rows in bounded chunks"""
+    monkeypatch.setattr(ExportService, "BATCH_SIZE", 10)
+    consumed = []
+
+    def rows():
+        for row in ExportService.trip_rows(test_db):
+            consumed.append(row)
+            yield row
+
+    chunks = ExportService.encode(rows(), ExportService.column_names(TRIP_EXPORT_COLUMNS), "ndjson")
+    first = next(chunks)
+    assert len(consumed) == 1 and first.count(b"\n") == 1
+
+    sizes = [chunk.count(b"\n") for chunk in chunks]
+    assert sizes == [10, 10, 4]
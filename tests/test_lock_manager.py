@@ -0,0 +1,323 @@
+import gc
+import pytest
+import threading
+import time
+from datetime import datetime, timedelta
+import uuid
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from app.auth import get_access_token_data
+from app.config import settings
+from app.database import Base, get_db
+from app.main import create_app
+from app.models import Booking, Vehicle, User
+from app.services import (
+    BookingConcurrencyError,
+    BookingService,
+    InProcessLockManager,
+    LockManager,
+    RedisLockManager,
+    set_lock_manager,
+)
+from app.schemas import VehicleStatus, UserRole
+
+
+class FakeRedis:
+    """In-memory stand-in for the Redis commands used by RedisLockManager"""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # name -> (value, expires_at or None)
+    
+    def _live(self, name):
+        entry = self._data.get(name)
+        if entry and entry[1] is not None and entry[1] <= time.monotonic():
+            del self._data[name]
+            return None
+        return entry
+    
+    def set(self, name, value, nx=False, px=None):
+        with self._lock:
+            if nx and self._live(name):
+                return None
+            self._data[name] = (value.encode(), time.monotonic() + px / 1000 if px else None)
+            return True
+    
+    def get(self, name):
+        with self._lock:
+            entry = self._live(name)
+            return entry[0] if entry else None
+    
+    def incr(self, name):
+        with self._lock:
+            entry = self._live(name)
+            value = int(entry[0]) + 1 if entry else 1
+            self._data[name] = (str(value).encode(), None)
+            return value
+    
+    def eval(self, script, numkeys, *args):
+        name, value = args
+        with self._lock:
+            entry = self._live(name)
+            if script == RedisLockManager.ADVANCE_SCRIPT:
+                if int(entry[0] if entry else 0) < int(value):
+                    self._data[name] = (value.encode(), None)
+                return 0
+            assert script == RedisLockManager.RELEASE_SCRIPT
+            if entry and entry[0] == value.encode():
+                del self._data[name]
+                return 1
+            return 0
+    
+    def flushall(self):
+        with self._lock:
+            self._data.clear()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def manager(request):
+    if request.param == "memory":
+        return InProcessLockManager()
+    return RedisLockManager(FakeRedis())
+
+
+def test_lease_excludes_and_fences(manager):
+    """Test mutual exclusion, release ownership and increasing fencing tokens"""
+    first = manager.acquire("vehicle:1", ttl=5)
+    assert first is not None
+    assert manager.acquire("vehicle:1", ttl=5, timeout=0.05) is None
+    assert manager.acquire("vehicle:2", ttl=5) is not None
+    
+    assert manager.release(first) is True
+    assert manager.release(first) is False
+    
+    second = manager.acquire("vehicle:1", ttl=5)
+    assert second.token > first.token
+    assert manager.is_held(second) and not manager.is_held(first)
+
+
+def test_advance_tokens(manager):
+    """Test tokens issued after advance_tokens exceed the floor and never move backwards"""
+    manager.advance_tokens(1000)
+    first = manager.acquire("vehicle:1", ttl=5)
+    assert first.token > 1000
+    
+    manager.advance_tokens(10)
+    assert manager.acquire("vehicle:2", ttl=5).token > first.token
+
+
+def test_expired_lease_is_taken_over(manager):
+    """Test that a lease stops blocking after its TTL and cannot be released by its old holder"""
+    stale = manager.acquire("vehicle:1", ttl=0.05)
+    fresh = manager.acquire("vehicle:1", ttl=5, timeout=1)
+    
+    assert fresh is not None and fresh.token > stale.token
+    assert manager.is_held(stale) is False
+    assert manager.release(stale) is False
+    assert manager.is_held(fresh) is True
+
+
+def test_create_booking_holds_lease_until_commit():
+    """Test that create_booking leases the vehicle for the duration of the transaction"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    
+    user = User(id=uuid.uuid4(), username="lease", email="lease@example.com",
+                hashed_password="hashed", role=UserRole.USER)
+    vehicle = Vehicle(id=uuid.uuid4(), license_plate="LEASE1", make="Kia", model="Niro",
+                      year=2024, status=VehicleStatus.AVAILABLE)
+    db.add_all([user, vehicle])
+    db.commit()
+    
+    manager = InProcessLockManager()
+    set_lock_manager(manager)
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        BookingService.create_booking(db, user.id, vehicle.id, start, start + timedelta(hours=1))
+        assert manager.acquire(f"vehicle:{vehicle.id}", ttl=5, timeout=0.05) is None
+        
+        db.commit()
+        assert manager.acquire(f"vehicle:{vehicle.id}", ttl=5, timeout=0.05) is not None
+    finally:
+        set_lock_manager(None)
+        db.close()
+        engine.dispose()
+
+
+@pytest.fixture
+def booking_db():
+    """Shared in-memory database with one user and one available vehicle"""
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    
+    db = SessionLocal()
+    user = User(id=uuid.uuid4(), username="fence", email="fence@example.com",
+                hashed_password="hashed", role=UserRole.USER)
+    vehicle = Vehicle(id=uuid.uuid4(), license_plate="FENCE1", make="Kia", model="Niro",
+                      year=2024, status=VehicleStatus.AVAILABLE)
+    db.add_all([user, vehicle])
+    db.commit()
+    ids = (user.id, vehicle.id)
+    db.close()
+    yield engine, SessionLocal, ids
+    engine.dispose()
+
+
+def test_expired_holder_is_fenced_by_the_database(booking_db, monkeypatch):
+    """Test that a booking write carrying an older fencing token than the vehicle's is refused"""
+    with pytest.raises(TypeError):
+        LockManager()
+    
+    _, SessionLocal, (user_id, vehicle_id) = booking_db
+    manager = InProcessLockManager()
+    set_lock_manager(manager)
+    stale, fresh = SessionLocal(), SessionLocal()
+    try:
+        monkeypatch.setattr(settings, "LOCK_TTL_SECONDS", 0.05)
+        BookingService.acquire_vehicle_leases(stale, [vehicle_id])
+        time.sleep(0.1)
+        
+        # The lease has lapsed; a second worker takes over and books first
+        monkeypatch.setattr(settings, "LOCK_TTL_SECONDS", 5)
+        start = datetime.utcnow() + timedelta(days=1)
+        BookingService.create_booking(fresh, user_id, vehicle_id, start, start + timedelta(hours=1))
+        fresh.commit()
+        
+        # The old holder resumes and tries to write with its smaller token
+        with pytest.raises(BookingConcurrencyError):
+            BookingService.create_booking(stale, user_id, vehicle_id, start + timedelta(days=1),
+                                          start + timedelta(days=1, hours=1))
+        stale.rollback()
+        assert stale.query(Booking).count() == 1
+    finally:
+        set_lock_manager(None)
+        stale.close()
+        fresh.close()
+
+
+def test_booking_route_leases_before_taking_a_connection(booking_db):
+    """Test the vehicle lease is taken before the user lookup checks out a connection"""
+    engine, SessionLocal, (user_id, vehicle_id) = booking_db
+    events = []
+    
+    class RecordingLockManager(InProcessLockManager):
+        def acquire(self, key, ttl, timeout=0):
+            events.append("lease")
+            return super().acquire(key, ttl, timeout)
+    
+    def get_test_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    # Finalize connections left by earlier tests here, not in the client's worker thread
+    gc.collect()
+    app = create_app()
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_access_token_data] = lambda: {"user_id": str(user_id), "type": "access"}
+    def record_checkout(*args):
+        events.append("checkout")
+    
+    event.listen(engine, "checkout", record_checkout)
+    set_lock_manager(RecordingLockManager())
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        response = TestClient(app).post("/api/bookings", json={
+            "vehicle_id": str(vehicle_id),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+        })
+    finally:
+        set_lock_manager(None)
+        event.remove(engine, "checkout", record_checkout)
+    
+    assert response.status_code == 201
+    assert events[0] == "lease" and "checkout" in events
+
+
+def test_bulk_route_returns_409_when_the_vehicle_lock_times_out(booking_db, monkeypatch):
+    """Test a bulk request that cannot lock its vehicles gets a 409 and writes nothing"""
+    from app.services.booking_lock import vehicle_locks
+    
+    _, SessionLocal, (user_id, vehicle_id) = booking_db
+    
+    def get_test_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+    
+    gc.collect()
+    app = create_app()
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_access_token_data] = lambda: {"user_id": str(user_id), "type": "access"}
+    monkeypatch.setattr(settings, "BOOKING_LOCK_TIMEOUT_SECONDS", 0.05)
+    
+    # Another booking transaction holds the vehicle's stripe
+    stripe = vehicle_locks._locks[vehicle_locks.stripe_for(vehicle_id)]
+    stripe.acquire()
+    try:
+        start = datetime.utcnow() + timedelta(days=1)
+        response = TestClient(app).post("/api/bookings/bulk", json={"bookings": [{
+            "vehicle_id": str(vehicle_id),
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat(),
+        }]})
+    finally:
+        stripe.release()
+    
+    assert response.status_code == 409
+    db = SessionLocal()
+    try:
+        assert db.query(Booking).count() == 0
+    finally:
+        db.close()
+
+
+def test_switching_lock_backends_keeps_bookings_writable(booking_db, monkeypatch):
+    """Test a new backend starts past the stored tokens and a lost Redis counter recovers on retry"""
+    import redis
+    import app.database
+    
+    _, SessionLocal, (user_id, vehicle_id) = booking_db
+    db = SessionLocal()
+    start = datetime.utcnow() + timedelta(days=1)
+    
+    def book(day):
+        BookingService.create_booking(db, user_id, vehicle_id, start + timedelta(days=day),
+                                      start + timedelta(days=day, hours=1))
+        db.commit()
+    
+    # Tokens from an in-process manager on a much larger scale than a fresh Redis counter
+    memory = InProcessLockManager()
+    memory.advance_tokens(time.time_ns() // 1000)
+    set_lock_manager(memory)
+    try:
+        book(0)
+        stored = db.get(Vehicle, vehicle_id).lease_token
+        
+        fake = FakeRedis()
+        monkeypatch.setattr(settings, "LOCK_BACKEND", "redis")
+        monkeypatch.setattr(redis.Redis, "from_url", lambda url: fake)
+        monkeypatch.setattr(app.database, "SessionLocal", SessionLocal)
+        set_lock_manager(None)
+        book(1)
+        assert db.get(Vehicle, vehicle_id).lease_token > stored
+        
+        # The counter is lost: the first write is refused, the retry is accepted
+        fake.flushall()
+        with pytest.raises(BookingConcurrencyError):
+            book(2)
+        db.rollback()
+        book(2)
+        assert db.query(Booking).count() == 3
+    finally:
+        set_lock_manager(None)
+        db.close()
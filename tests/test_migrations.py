@@ -0,0 +1,119 @@
+import pytest
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+from app.database import Base
+from app.models import Booking, Trip, User, Vehicle
+from app.schemas import BookingStatus, UserRole
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+
+
+# Indexes added to existing tables after the baseline, by table
+ADDED_INDEXES = {
+    "bookings": ["idx_booking_start_time", "idx_booking_user_start"],
+    "trips": ["idx_trip_start_time"],
+    "vehicles": [
+        "idx_vehicle_location_status",
+        "idx_vehicle_active_created",
+        "idx_vehicle_active_status_created",
+        "idx_vehicle_active_location_created",
+        "idx_vehicle_active_make_model_created",
+    ],
+}
+
+
+def alembic_config(url):
+    cfg = Config(str(ALEMBIC_INI))
+    cfg.set_main_option("sqlalchemy.url", url)
+    cfg.attributes["configure_logger"] = False
+    return cfg
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    return f"sqlite:///{tmp_path / 'fleet.db'}"
+
+
+def columns(engine, table):
+    return {c["name"] for c in inspect(engine).get_columns(table)}
+
+
+def indexes(engine, table):
+    return {i["name"] for i in inspect(engine).get_indexes(table)}
+
+
+def test_upgrade_creates_schema_on_an_empty_database(database_url):
+    command.upgrade(alembic_config(database_url), "head")
+
+    engine = create_engine(database_url)
+    assert set(Base.metadata.tables) <= set(inspect(engine).get_table_names())
+    assert "lease_token" in columns(engine, "vehicles")
+    engine.dispose()
+
+
+def test_upgrade_adds_new_columns_to_an_existing_database(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        # Simulate a database created before the column and indexes existed
+        conn.execute(text("ALTER TABLE vehicles DROP COLUMN lease_token"))
+        for names in ADDED_INDEXES.values():
+            for name in names:
+                conn.execute(text(f"DROP INDEX {name}"))
+    assert "lease_token" not in columns(engine, "vehicles")
+
+    command.upgrade(alembic_config(database_url), "head")
+
+    assert "lease_token" in columns(engine, "vehicles")
+    for table, names in ADDED_INDEXES.items():
+        assert set(names) <= indexes(engine, table)
+    engine.dispose()
+
+
+def test_upgrade_stamps_vehicle_location_on_existing_rows(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    vehicle_id, other_id = uuid.uuid4(), uuid.uuid4()
+    session = Session(bind=engine)
+    user = User(id=uuid.uuid4(), username="old", email="old@example.com", hashed_password="x", role=UserRole.USER)
+    session.add_all([
+        user,
+        Vehicle(id=vehicle_id, license_plate="OLD001", make="Ford", model="Focus", year=2020, location="Depot"),
+        Vehicle(id=other_id, license_plate="OLD002", make="Ford", model="Focus", year=2020),
+    ])
+    start = datetime(2026, 1, 1, 8, 0)
+    for vid in (vehicle_id, other_id):
+        booking = Booking(id=uuid.uuid4(), user_id=user.id, vehicle_id=vid, start_time=start,
+                          end_time=start + timedelta(hours=1), status=BookingStatus.COMPLETED)
+        session.add_all([booking, Trip(id=uuid.uuid4(), booking_id=booking.id, vehicle_id=vid, user_id=user.id,
+                                       start_time=start, end_time=start + timedelta(hours=1), mileage_start=0.0)])
+    session.commit()
+    session.close()
+    with engine.begin() as conn:
+        for table in ("bookings", "trips"):
+            conn.execute(text(f"ALTER TABLE {table} DROP COLUMN vehicle_location"))
+
+    command.upgrade(alembic_config(database_url), "head")
+
+    with engine.connect() as conn:
+        for table in ("bookings", "trips"):
+            stamped = dict(conn.execute(text(f"SELECT vehicle_id, vehicle_location FROM {table}")).all())
+            assert sorted(stamped.values()) == ["", "Depot"]
+    engine.dispose()
+
+
+def test_upgrade_is_a_no_op_on_a_create_all_database(database_url):
+    engine = create_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+
+    command.upgrade(alembic_config(database_url), "head")
+    command.downgrade(alembic_config(database_url), "base")
+    command.upgrade(alembic_config(database_url), "head")
+
+    assert "lease_token" in columns(engine, "vehicles")
+    engine.dispose()
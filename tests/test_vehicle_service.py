@@ -0,0 +1,201 @@
+import pytest
+import io
+import json
+from datetime import datetime, timedelta
+import uuid
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Vehicle
+from app.services import InvalidCursorError, VehicleImportService, VehicleService
+from app.schemas import VehicleStatus
+
+
+CREATED = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+def test_db():
+    """Create test database"""
+    engine = create_engine("sqlite:///:memory:")
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    return SessionLocal()
+
+
+@pytest.fixture
+def vehicles(test_db):
+    """30 vehicles; pairs share created_at so pages must break ties on id"""
+    fleet = []
+    for i in range(30):
+        vehicle = Vehicle(
+            id=uuid.uuid4(), license_plate=f"SRCH{i:03d}",
+            make="Toyota" if i % 3 else "Ford", model="Corolla" if i % 2 else "Focus", year=2024,
+            location="Airport" if i % 5 == 0 else "Downtown",
+            status=VehicleStatus.MAINTENANCE if i % 4 == 0 else VehicleStatus.AVAILABLE,
+            health_score=float(100 - i * 3), is_active=i != 29,
+            created_at=CREATED + timedelta(hours=i // 2)
+        )
+        test_db.add(vehicle)
+        fleet.append(vehicle)
+    test_db.commit()
+    return fleet
+
+
+def _all_pages(db, limit, **filters):
+    pages, cursor = [], None
+    while True:
+        page, cursor = VehicleService.search_vehicles(db, cursor=cursor, limit=limit, **filters)
+        pages.append(page)
+        if cursor is None:
+            return pages
+
+
+def test_search_vehicles_pages_cover_every_match_once(test_db, vehicles):
+    """Test keyset pages walk the filtered set newest first without gaps or repeats"""
+    pages = _all_pages(test_db, 4)
+    listed = [vehicle for page in pages for vehicle in page]
+
+    assert [len(page) for page in pages] == [4] * 7 + [1]
+    assert len({vehicle.id for vehicle in listed}) == 29  # the inactive vehicle is excluded
+    assert listed == sorted(listed, key=lambda vehicle: (vehicle.created_at, vehicle.id), reverse=True)
+
+    filtered = [vehicle for page in _all_pages(test_db, 3, status=VehicleStatus.AVAILABLE, location="Downtown",
+                                               make="Toyota", min_health_score=40.0) for vehicle in page]
+    expected = {
+        vehicle.id for vehicle in vehicles
+        if vehicle.is_active and vehicle.status == VehicleStatus.AVAILABLE and vehicle.location == "Downtown"
+        and vehicle.make == "Toyota" and vehicle.health_score >= 40.0
+    }
+    assert {vehicle.id for vehicle in filtered} == expected and len(filtered) == len(expected)
+
+    with pytest.raises(InvalidCursorError):
+        VehicleService.search_vehicles(test_db, cursor="not-a-cursor")
+
+
+def test_search_vehicles_filters_and_pages_in_sql(test_db, vehicles):
+    """Test a page is one bounded query served by a composite index"""
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, params, *args: statements.append((statement, params)))
+
+    _, cursor = VehicleService.search_vehicles(test_db, location="Downtown", limit=5)
+    VehicleService.search_vehicles(test_db, location="Downtown", cursor=cursor, limit=5)
+
+    assert len(statements) == 2
+    statement, params = statements[1]
+    assert "LIMIT" in statement and 6 in params
+    plan = " ".join(str(row) for row in test_db.connection().exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, params
+    ))
+    assert "idx_vehicle_active_location_created" in plan
+
+
+def test_import_vehicles_reports_row_errors_and_duplicates(test_db, vehicles, monkeypatch):
+    """Test CSV rows are validated and plates deduped within a chunk, across chunks and against the table"""
+    monkeypatch.setattr(VehicleImportService, "CHUNK_SIZE", 3)
+    upload = io.BytesIO((
+        "\ufefflicense_plate,make,model,year,location,mileage\n"
+        "IMP001,Toyota,Corolla,2024,Downtown,\n"
+        "IMP002,Ford,Focus,1800,Downtown,10\n"
+        "IMP001,Kia,Rio,2023,Airport,5\n"
+        "IMP003,Kia,Rio,2023,,12.5\n"
+        "SRCH000,Ford,Focus,2022,Airport,0\n"
+        "IMP001,Kia,Rio,2023,Airport,5\n"
+    ).encode())
+
+    summary = VehicleImportService.import_vehicles(test_db, VehicleImportService.read_records(upload, "csv"))
+    test_db.commit()
+
+    assert summary["created"] == 2 and summary["failed"] == 4 and not summary["errors_truncated"]
+    assert [(error["line"], error["license_plate"]) for error in summary["errors"]] == [
+        (3, "IMP002"), (4, "IMP001"), (6, "SRCH000"), (7, "IMP001")
+    ]
+    assert "year" in summary["errors"][0]["detail"]
+
+    imported = test_db.query(Vehicle).filter(Vehicle.license_plate.like("IMP%")).order_by(Vehicle.license_plate).all()
+    assert [(vehicle.license_plate, vehicle.location, vehicle.mileage) for vehicle in imported] == [
+        ("IMP001", "Downtown", 0.0), ("IMP003", None, 12.5)
+    ]
+    assert all(vehicle.status == VehicleStatus.AVAILABLE and vehicle.health_score == 100.0 for vehicle in imported)
+
+
+def test_import_vehicles_ndjson_one_lookup_and_insert_per_chunk(test_db, monkeypatch):
+    """Test NDJSON imports issue one duplicate lookup and one insert per chunk"""
+    monkeypatch.setattr(VehicleImportService, "CHUNK_SIZE", 4)
+    lines = [json.dumps({"license_plate": f"ND{i:03d}", "make": "Kia", "model": "Niro", "year": 2025})
+             for i in range(10)]
+    lines[4:4] = ["", "[1, 2]", "{not json"]
+    upload = io.BytesIO("\n".join(lines).encode())
+
+    statements = []
+    event.listen(test_db.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    summary = VehicleImportService.import_vehicles(test_db, VehicleImportService.read_records(upload, "ndjson"))
+    test_db.commit()
+
+    assert summary["created"] == 10
+    assert [(error["line"], error["detail"]) for error in summary["errors"]][0] == (6, "Each line must be a JSON object")
+    assert summary["errors"][1]["line"] == 7 and summary["errors"][1]["detail"].startswith("Invalid JSON")
+    assert sum(statement.startswith("SELECT") for statement in statements) == 3
+    assert sum(statement.startswith("INSERT") for statement in statements) == 3
+    assert test_db.query(Vehicle).count() == 10
+
+
+def test_ingest_telemetry_coalesces_and_keeps_mileage_monotonic(test_db):
+    """Test readings collapse to the latest value per vehicle, decreasing mileage and unknown vehicles are rejected"""
+    moving = Vehicle(id=uuid.uuid4(), license_plate="TEL001", make="Kia", model="Niro", year=2024,
+                     location="Depot", mileage=1000.0)
+    rolled_back = Vehicle(id=uuid.uuid4(), license_plate="TEL002", make="Kia", model="Niro", year=2024,
+                          location="Depot", mileage=5000.0)
+    idle = Vehicle(id=uuid.uuid4(), license_plate="TEL003", make="Kia", model="Niro", year=2024,
+                   location="Depot", mileage=300.0, health_score=99.9)
+    test_db.add_all([moving, rolled_back, idle])
+    test_db.commit()
+    unknown = uuid.uuid4()
+
+    summary = VehicleService.ingest_telemetry(test_db, [
+        (moving.id, CREATED + timedelta(minutes=2), 250000.0, None),
+        (moving.id, CREATED, 1200.0, "Airport"),
+        (moving.id, CREATED + timedelta(minutes=1), 1100.0, "Downtown"),
+        (rolled_back.id, CREATED, 4000.0, "Airport"),
+        (idle.id, CREATED, 300.0, "Depot"),
+        (unknown, CREATED, 10.0, None),
+    ])
+    test_db.commit()
+
+    assert summary["received"] == 6 and summary["vehicles"] == 4 and summary["updated"] == 2
+    assert summary["rejected"] == [
+        {"vehicle_id": rolled_back.id, "detail": "Mileage cannot decrease"},
+        {"vehicle_id": unknown, "detail": "Vehicle not found"},
+    ]
+    test_db.refresh(moving)
+    test_db.refresh(rolled_back)
+    test_db.refresh(idle)
+    assert (moving.mileage, moving.health_score, moving.location) == (250000.0, 50.0, "Downtown")
+    assert (rolled_back.mileage, rolled_back.health_score, rolled_back.location) == (5000.0, 100.0, "Airport")
+    assert (idle.mileage, idle.health_score) == (300.0, 99.9)
+
+
+def test_ingest_telemetry_update_guards_against_concurrent_mileage(test_db):
+    """Test the UPDATE itself never lowers mileage written after the batch was read"""
+    vehicle = Vehicle(id=uuid.uuid4(), license_plate="TEL010", make="Kia", model="Niro", year=2024, mileage=100.0)
+    test_db.add(vehicle)
+    test_db.commit()
+    vehicle_id = vehicle.id
+
+    statements = []
+
+    def race(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        if statement.startswith("UPDATE"):
+            cursor.execute("UPDATE vehicles SET mileage = 900.0")
+
+    event.listen(test_db.get_bind(), "before_cursor_execute", race)
+    summary = VehicleService.ingest_telemetry(test_db, [(vehicle_id, CREATED, 500.0, "Airport")])
+    test_db.commit()
+
+    assert [statement.split()[0] for statement in statements] == ["SELECT", "UPDATE"]
+    assert summary["updated"] == 1
+    test_db.refresh(vehicle)
+    assert (vehicle.mileage, vehicle.location) == (900.0, "Airport")